@@ -1,26 +1,146 @@
 from django.contrib import admin
-from .models import Customer, DailyMeal
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from .models import Customer, DailyMeal, Invoice
+
+# Unfiltered changelists of tables estimated above this size show the
+# estimate instead of running COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 50000
+
+
+def estimated_row_count(model, using):
+    """The database's own row estimate for a model's table, or None"""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "mysql":
+                cursor.execute(
+                    "SELECT table_rows FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE() AND table_name = %s",
+                    [table],
+                )
+            elif connection.vendor == "sqlite":
+                # Written by ANALYZE; a stat string starts with the table's row count
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for tables never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that skips COUNT(*) on large unfiltered tables.
+
+    Filtered changelists still count exactly; they narrow through an index.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """Foreign key filter with a search box instead of a list of every related row.
+
+    Uses the admin's own autocomplete view, so the related model's admin
+    needs ``search_fields``, and the ModelAdmin needs the widget's media
+    (see ScaledModelAdmin).
+    """
+    template = "admin/api/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = "%s__%s__exact" % (field_path, field.target_field.name)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.admin_site = model_admin.admin_site
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def choices(self, changelist):
+        # Just "All"; the widget stands in for the list of related rows
+        yield {
+            "selected": self.lookup_kwarg not in self.used_parameters,
+            "query_string": changelist.get_query_string(remove=[self.lookup_kwarg, "p"]),
+            "display": _("All"),
+        }
+
+    def widget(self):
+        value = self.used_parameters.get(self.lookup_kwarg)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        # The form field gives the widget its choices, which only ever
+        # load the selected row
+        form_field = self.field.formfield(
+            widget=AutocompleteSelect(self.field, self.admin_site), required=False
+        )
+        return form_field.widget.render(
+            self.lookup_kwarg,
+            value,
+            attrs={"id": "autocomplete-filter-%s" % self.field_path, "data-filter": self.lookup_kwarg},
+        )
+
+
+class ScaledModelAdmin(admin.ModelAdmin):
+    """ModelAdmin defaults for tables too large to count or list in full"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    @property
+    def media(self):
+        # AutocompleteFilter renders the autocomplete widget on the changelist;
+        # the widget's media doesn't depend on the field
+        return super().media + AutocompleteSelect(None, self.admin_site).media
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(ScaledModelAdmin):
     list_display = (
         "id",
         "name",
         "user",
         "joining_date",
         "fee",
-        "current_month",
-        "lunches_this_month",
-        "dinners_this_month",
+        "counted_through",
+        "lunches_missed_this_month",
+        "dinners_missed_this_month",
     )
-    list_filter = ("joining_date", "user")
+    list_filter = ("joining_date", ("user", AutocompleteFilter))
+    list_select_related = ("user",)
+    autocomplete_fields = ("user",)
     search_fields = ("name", "user__username")
     ordering = ("name",)
 
 
 @admin.register(DailyMeal)
-class DailyMealAdmin(admin.ModelAdmin):
+class DailyMealAdmin(ScaledModelAdmin):
+    """Read-only view of the meal rows.
+
+    Saving a row here would skip api.meals.store_meal, leaving the MealMonth
+    bits, KitchenDay counters, sync tombstones and cached responses out of
+    step with it.
+    """
     list_display = (
         "id",
         "customer",
@@ -33,9 +153,11 @@ class DailyMealAdmin(admin.ModelAdmin):
     list_filter = (
         "meal_type",
         "is_taken",
-        "date",
-        "customer",
+        ("customer", AutocompleteFilter),
     )
+    list_select_related = ("customer",)
+    autocomplete_fields = ("customer",)
+    date_hierarchy = "date"
 
     search_fields = (
         "customer__name",
@@ -44,6 +166,15 @@ class DailyMealAdmin(admin.ModelAdmin):
 
     ordering = ("-date",)
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
     # --- Custom fields for readability ---
 
     def is_taken_display(self, obj):
@@ -53,3 +184,22 @@ class DailyMealAdmin(admin.ModelAdmin):
     def created_display(self, obj):
         return obj.date.strftime("%d %b %Y")
     created_display.short_description = "Day"
+
+
+@admin.register(Invoice)
+class InvoiceAdmin(ScaledModelAdmin):
+    list_display = (
+        "id",
+        "customer",
+        "month",
+        "active_days",
+        "lunches_taken",
+        "dinners_taken",
+        "fee",
+        "amount_payable",
+    )
+    list_filter = ("month", ("customer", AutocompleteFilter))
+    list_select_related = ("customer",)
+    autocomplete_fields = ("customer",)
+    search_fields = ("customer__name", "customer__user__username")
+    ordering = ("-month",)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connect the token revocation hooks to User saves and deletes
+        from . import authentication  # noqa: F401
+        # Apply the DB_PROFILE connection pragmas
+        from . import db  # noqa: F401
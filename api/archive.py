@@ -0,0 +1,236 @@
+# api/archive.py
+"""Cold storage for closed months of meal data.
+
+``archive_meals`` moves every miss dated before a cutoff out of DailyMeal
+into one gzipped JSON file per owner under ``MEDIA_ROOT/meal_archive``,
+then records the cutoff in MealArchive. The file maps customer ids to
+months, each month packed into the same 62-bit layout MealMonth uses::
+
+    {"format": 1, "owner": 7, "customers": {"12": {"2025-03": 4098}}}
+
+Reads of dates before an owner's cutoff come from the file instead of
+DailyMeal, so results don't change when a month is archived. Only closed
+months are ever archived, so current dates never pay for the lookup.
+Archived months are read-only: writes to them are rejected.
+
+Parsed files are kept in a small per-process cache keyed on the file's
+mtime and size; the file is replaced atomically, so a reader sees either
+the old archive or the new one.
+"""
+import gzip
+import json
+import os
+import tempfile
+from calendar import monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Customer, DailyMeal, MealArchive, MealMonth
+
+FORMAT = 1
+ARCHIVE_DIR = 'meal_archive'
+
+
+def archive_path(user_id):
+    return Path(settings.MEDIA_ROOT) / ARCHIVE_DIR / f'owner-{user_id}.json.gz'
+
+
+def may_be_archived(day, today=None):
+    """False for dates in the current month or later, which are never archived"""
+    return day < (today or date.today()).replace(day=1)
+
+
+def archived_before(user_id):
+    """The owner's cutoff: dates before it are archived (None if nothing is)"""
+    return MealArchive.objects.filter(user_id=user_id).values_list('before', flat=True).first()
+
+
+def archive_cutoff(user_id, days):
+    """archived_before(), skipping the query when none of ``days`` can be archived"""
+    if not any(may_be_archived(day) for day in days):
+        return None
+    return archived_before(user_id)
+
+
+def check_writable(user_id, day):
+    before = archive_cutoff(user_id, [day])
+    if before is not None and day < before:
+        raise ValueError(f"{day.strftime('%Y-%m')} is archived and can no longer be changed")
+
+
+@lru_cache(maxsize=32)
+def _read_archive(path, mtime_ns, size):
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        data = json.load(archive)
+    if data.get('format') != FORMAT:
+        raise ValueError(f"Unsupported meal archive format in {path}")
+    return {
+        int(customer_id): {
+            date.fromisoformat(f'{month}-01'): missed for month, missed in months.items()
+        }
+        for customer_id, months in data['customers'].items()
+    }
+
+
+def load_archive(user_id):
+    """{customer_id: {month: missed bits}} for one owner; treat it as read-only"""
+    path = archive_path(user_id)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return {}
+    return _read_archive(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def write_archive(user_id, customers):
+    path = archive_path(user_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        'format': FORMAT,
+        'owner': user_id,
+        'customers': {
+            str(customer_id): {
+                month.strftime('%Y-%m'): missed for month, missed in sorted(months.items()) if missed
+            }
+            for customer_id, months in sorted(customers.items())
+        },
+    }
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as archive:
+                archive.write(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _archived(user_id, day):
+    """(cutoff, archive) when ``day`` is archived for the owner, else None"""
+    if not may_be_archived(day):
+        return None
+    before = archived_before(user_id)
+    if before is None or day >= before:
+        return None
+    return before, load_archive(user_id)
+
+
+def archived_day_statuses(user_id, day):
+    """{customer_id: (lunch_taken, dinner_taken)} for an archived day.
+
+    Returns None when ``day`` is not archived; customers missing from the
+    result took both meals.
+    """
+    archived = _archived(user_id, day)
+    if archived is None:
+        return None
+    month = day.replace(day=1)
+    statuses = {}
+    for customer_id, months in archived[1].items():
+        row = MealMonth(missed=months.get(month, 0))
+        statuses[customer_id] = (row.is_taken(day, 'L'), row.is_taken(day, 'D'))
+    return statuses
+
+
+def archived_day_status(customer, day):
+    """(lunch_taken, dinner_taken) for one customer, or None if ``day`` is not archived"""
+    statuses = archived_day_statuses(customer.user_id, day)
+    if statuses is None:
+        return None
+    return statuses.get(customer.id, (True, True))
+
+
+def count_misses(months, start_date, end_date):
+    """Missed lunches and dinners between two dates in packed {month: bits}"""
+    counts = {'lunches': 0, 'dinners': 0}
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        month_end = month.replace(day=monthrange(month.year, month.month)[1])
+        missed = months.get(month)
+        if missed:
+            row = MealMonth(missed=missed)
+            first_day = max(start_date, month).day
+            last_day = min(end_date, month_end).day
+            counts['lunches'] += row.missed_count('L', first_day, last_day)
+            counts['dinners'] += row.missed_count('D', first_day, last_day)
+        month = month_end + timedelta(days=1)
+    return counts
+
+
+def archived_miss_counts(customer, start_date, end_date):
+    """The part of a range's misses that lives in the archive, by meal"""
+    archived = _archived(customer.user_id, start_date)
+    if archived is None:
+        return {'lunches': 0, 'dinners': 0}
+    before, customers = archived
+    return count_misses(customers.get(customer.id, {}), start_date, min(end_date, before - timedelta(days=1)))
+
+
+def archived_month(month):
+    """{customer_id: missed bits} of one month, across every owner that archived it"""
+    missed = {}
+    for user_id in MealArchive.objects.filter(before__gt=month).values_list('user_id', flat=True):
+        for customer_id, months in load_archive(user_id).items():
+            if months.get(month):
+                missed[customer_id] = months[month]
+    return missed
+
+
+def archived_meal_rows(user_id):
+    """(customer_id, date, meal_type, False) for every archived miss of an owner"""
+    before = archived_before(user_id)
+    if before is None:
+        return
+    for customer_id, months in sorted(load_archive(user_id).items()):
+        for month, missed in sorted(months.items()):
+            if month >= before:
+                continue
+            for bit in range(2 * MealMonth.DINNER_OFFSET):
+                if missed >> bit & 1:
+                    meal_type = 'L' if bit < MealMonth.DINNER_OFFSET else 'D'
+                    day = month + timedelta(days=bit % MealMonth.DINNER_OFFSET)
+                    yield customer_id, day, meal_type, False
+
+
+def archive_owner(user_id, before, chunk_size=5000):
+    """Move one owner's misses dated before ``before`` into their archive.
+
+    The file is written before the rows are deleted, and the cutoff moves
+    in the same transaction as the delete, so readers see either the rows
+    or the archive. Returns the number of DailyMeal rows removed.
+    """
+    with transaction.atomic():
+        current = MealArchive.objects.select_for_update().filter(
+            user_id=user_id
+        ).values_list('before', flat=True).first()
+        if current is not None and current >= before:
+            return 0
+
+        # Months at or past the old cutoff are still authoritative in
+        # DailyMeal, and deleted customers need no archive
+        existing = set(Customer.objects.filter(user_id=user_id).values_list('id', flat=True))
+        customers = {
+            customer_id: {month: missed for month, missed in months.items() if current and month < current}
+            for customer_id, months in load_archive(user_id).items()
+            if customer_id in existing
+        }
+
+        rows = DailyMeal.objects.filter(customer__user_id=user_id, date__lt=before)
+        misses = rows.filter(is_taken=False).values_list('customer_id', 'date', 'meal_type')
+        for customer_id, day, meal_type in misses.iterator(chunk_size=chunk_size):
+            months = customers.setdefault(customer_id, {})
+            month = day.replace(day=1)
+            months[month] = months.get(month, 0) | MealMonth.bit(day, meal_type)
+
+        write_archive(user_id, customers)
+        MealArchive.objects.update_or_create(user_id=user_id, defaults={'before': before})
+        deleted, _ = rows.delete()
+    return deleted
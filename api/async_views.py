@@ -0,0 +1,247 @@
+# api/async_views.py
+"""Native async versions of the read-heavy endpoints, for ASGI deployments.
+
+Under ASGI every sync DRF view costs a thread hand-off per request. These
+views run on the event loop instead: authentication trusts the signed
+token (``FastJWTAuthentication.aauthenticate``), caching goes through the
+async cache API and queries use the async ORM. Responses match the DRF
+views field for field, and the shared helpers in api.views keep the two
+in step. api.urls serves these when ``ASYNC_READ_VIEWS`` is enabled.
+"""
+import json
+from datetime import date, datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import AUTH_HEADER_TYPES
+
+from . import archive
+from .authentication import FastJWTAuthentication
+from .caching import owner_cached, owner_conditional
+from .models import Customer, DailyMeal, MealMonth
+from .views import (
+    add_misses, annotate_meal_status, calendar_months, calendar_payload, customer_stats_payload,
+    history_misses, history_page, meal_status, missed_by_meal, parse_calendar_range,
+    parse_history_range, serialize_customer,
+    serialize_day_status, serialize_history_day, summarize_history, wants_history_stream,
+)
+
+
+def async_jwt_required(view_func):
+    """Authenticate an async view the way IsAuthenticated + JWT does for DRF views"""
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        try:
+            result = await FastJWTAuthentication().aauthenticate(request)
+        except APIException as e:
+            data = e.detail if isinstance(e.detail, dict) else {'detail': e.detail}
+            response = JsonResponse(data, status=e.status_code)
+        else:
+            if result is not None:
+                request.user, request.auth = result
+                return await view_func(request, *args, **kwargs)
+            response = JsonResponse(
+                {'detail': 'Authentication credentials were not provided.'}, status=401
+            )
+        response['WWW-Authenticate'] = '%s realm="api"' % AUTH_HEADER_TYPES[0]
+        return response
+
+    return _wrapped_view
+
+
+# ----------------------------
+# Home & Customer List
+# ----------------------------
+
+@require_GET
+@async_jwt_required
+@owner_cached
+async def hello(request):
+    """Get all customers with their status for a date (defaults to today)"""
+    try:
+        date_str = request.GET.get('date')
+        if date_str:
+            target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        else:
+            target_date = date.today()
+
+        customers = Customer.objects.filter(user_id=request.user.id)
+        archived = None
+        if archive.may_be_archived(target_date):
+            archived = await sync_to_async(archive.archived_day_statuses)(request.user.id, target_date)
+
+        if archived is None:
+            result = [
+                serialize_day_status(customer, not customer.lunch_missed, not customer.dinner_missed)
+                async for customer in annotate_meal_status(customers, target_date).only('id', 'name')
+            ]
+        else:
+            result = [
+                serialize_day_status(customer, *archived.get(customer.id, (True, True)))
+                async for customer in customers.only('id', 'name')
+            ]
+
+        return JsonResponse({"customers": result, "date": target_date.isoformat()})
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+# ----------------------------
+# Customer Details & Stats
+# ----------------------------
+
+@require_GET
+@async_jwt_required
+@owner_cached
+async def customer_detail(request, id):
+    """Get customer details with today's status"""
+    try:
+        customer = await aget_object_or_404(Customer, id=id, user_id=request.user.id)
+        data = serialize_customer(customer)
+
+        today = date.today()
+        meals = [meal async for meal in DailyMeal.objects.filter(customer=customer, date=today)]
+        lunch, dinner = meal_status(meals)
+
+        data['today_status'] = {
+            'lunch': lunch,
+            'dinner': dinner,
+            'date': today.isoformat()
+        }
+
+        return JsonResponse(data)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+@require_GET
+@async_jwt_required
+@owner_cached
+async def customer_stats(request, id):
+    """Get customer statistics for current month"""
+    try:
+        customer = await aget_object_or_404(Customer, id=id, user_id=request.user.id)
+        last_invoice = await customer.invoices.order_by('-month').afirst()
+        await sync_to_async(customer.current_counters)()
+        return JsonResponse(customer_stats_payload(customer, last_invoice))
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+# ----------------------------
+# Meal Status & History
+# ----------------------------
+
+@require_GET
+@async_jwt_required
+@owner_cached
+async def get_date_status(request, customer_id):
+    """Get meal status for a specific date"""
+    try:
+        customer = await aget_object_or_404(Customer, id=customer_id, user_id=request.user.id)
+        date_str = request.GET.get('date')
+
+        if not date_str:
+            return JsonResponse({
+                'success': False,
+                'error': 'Date parameter is required'
+            }, status=400)
+
+        target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        archived = None
+        if archive.may_be_archived(target_date):
+            archived = await sync_to_async(archive.archived_day_status)(customer, target_date)
+        if archived is not None:
+            lunch, dinner = archived
+        else:
+            meals = [meal async for meal in DailyMeal.objects.filter(customer=customer, date=target_date)]
+            lunch, dinner = meal_status(meals)
+
+        return JsonResponse({
+            'success': True,
+            'customer_id': customer_id,
+            'customer_name': customer.name,
+            'date': date_str,
+            'status': {'lunch': lunch, 'dinner': dinner}
+        })
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+async def ameal_history_statistics(customer, start_date, end_date):
+    missed = await history_misses(customer, start_date, end_date).aaggregate(**missed_by_meal())
+    if archive.may_be_archived(start_date):
+        # The archive is a local file read plus one small query; run it off the loop
+        missed = add_misses(missed, await sync_to_async(archive.archived_miss_counts)(customer, start_date, end_date))
+    return summarize_history(missed, start_date, end_date)
+
+
+async def astream_meal_history(customer, start_date, end_date, statistics):
+    yield json.dumps({
+        'success': True,
+        'customer': serialize_customer(customer),
+        'statistics': statistics
+    }) + '\n'
+    async for day, lunch, dinner in MealMonth.aiter_days(customer, start_date, end_date):
+        yield json.dumps(serialize_history_day(day, lunch, dinner)) + '\n'
+
+
+@require_GET
+@async_jwt_required
+@owner_conditional
+async def customer_meal_history(request, customer_id):
+    """Get meal history for a customer, newest first (see views.customer_meal_history)"""
+    try:
+        customer = await aget_object_or_404(Customer, id=customer_id, user_id=request.user.id)
+
+        start_date, end_date = parse_history_range(request, customer)
+        statistics = await ameal_history_statistics(customer, start_date, end_date)
+
+        if wants_history_stream(request):
+            return StreamingHttpResponse(
+                astream_meal_history(customer, start_date, end_date, statistics),
+                content_type='application/x-ndjson'
+            )
+
+        limit, page_start, page_end, next_cursor = history_page(request, start_date, end_date)
+        daily_meals = [
+            serialize_history_day(day, lunch, dinner)
+            async for day, lunch, dinner in MealMonth.aiter_days(customer, page_start, page_end)
+        ]
+
+        return JsonResponse({
+            'success': True,
+            'customer': serialize_customer(customer),
+            'daily_meals': daily_meals,
+            'statistics': statistics,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor
+            }
+        })
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+
+@require_GET
+@async_jwt_required
+@owner_cached
+async def customer_calendar(request, customer_id):
+    """Lunch/dinner flags for a whole month or year (see views.customer_calendar)"""
+    try:
+        customer = await aget_object_or_404(Customer, id=customer_id, user_id=request.user.id)
+        first_month, last_month = parse_calendar_range(request)
+        missed = {month: bits async for month, bits in calendar_months(customer, first_month, last_month)}
+        return JsonResponse(calendar_payload(customer, first_month, last_month, missed))
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
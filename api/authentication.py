@@ -0,0 +1,175 @@
+# api/authentication.py
+"""JWT authentication without a per-request user lookup.
+
+Every request resolves the user through a small per-process LRU cache
+whose entries expire after ``JWT_USER_CACHE_TTL`` seconds; a miss loads
+the User and refuses an inactive or deleted one. Read requests
+(GET/HEAD/OPTIONS) then get a ``TokenUser`` built from the token claims,
+write requests the cached ``User``. So each process looks a user up at
+most once per TTL, and a deactivation, however it was saved (including
+``QuerySet.update()``), is seen by every process within the TTL.
+
+``revoke_user`` makes that immediate in the process that handles the
+change: it drops the cached user and marks the id as revoked in the
+default cache. It is wired to User saves and deletes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class UserCache:
+    """Bounded, thread-safe LRU of user objects with a per-entry TTL"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'JWT_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'JWT_USER_CACHE_TTL', 60),
+)
+
+
+def _revoked_key(user_id):
+    return f'auth:revoked:{user_id}'
+
+
+def revoke_user(user_id):
+    """Stop accepting tokens for a user until restore_user is called"""
+    user_cache.discard(user_id)
+    # Access tokens cannot outlive their lifetime, so neither must the mark
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    cache.set(_revoked_key(user_id), True, timeout)
+
+
+def restore_user(user_id):
+    user_cache.discard(user_id)
+    cache.delete(_revoked_key(user_id))
+
+
+def is_revoked(user_id):
+    return cache.get(_revoked_key(user_id), False)
+
+
+async def ais_revoked(user_id):
+    return await cache.aget(_revoked_key(user_id), False)
+
+
+@receiver(post_save, sender=get_user_model())
+def _user_saved(sender, instance, **kwargs):
+    if instance.is_active:
+        # Drop any stale cached copy; only hit the cache if a mark may exist
+        user_cache.discard(instance.pk)
+        if is_revoked(instance.pk):
+            restore_user(instance.pk)
+    else:
+        revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=get_user_model())
+def _user_deleted(sender, instance, **kwargs):
+    revoke_user(instance.pk)
+
+
+class FastJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that skips the User SELECT on most requests"""
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_user(validated_token, write=request.method not in SAFE_METHODS), validated_token
+
+    async def aauthenticate(self, request):
+        """authenticate() for async views; reads only touch the database once per TTL"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token, write=request.method not in SAFE_METHODS), validated_token
+
+    def user_id_from(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def get_user(self, validated_token, write=True):
+        user_id = self.user_id_from(validated_token)
+
+        if is_revoked(user_id):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        user = user_cache.get(user_id)
+        if user is None:
+            # Refuses inactive and deleted users
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+
+        if not write:
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return user
+
+    async def aget_user(self, validated_token, write=True):
+        user_id = self.user_id_from(validated_token)
+        if write or user_cache.get(user_id) is None:
+            return await sync_to_async(self.get_user)(validated_token, write=write)
+
+        if await ais_revoked(user_id):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return api_settings.TOKEN_USER_CLASS(validated_token)
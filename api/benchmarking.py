@@ -0,0 +1,10 @@
+# api/benchmarking.py
+"""Helpers shared by the benchmark management commands."""
+import statistics
+
+
+def percentile(sorted_values, pct):
+    """The ``pct``-th percentile (1-99) of an ascending, non-empty list"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    return statistics.quantiles(sorted_values, n=100, method='inclusive')[pct - 1]
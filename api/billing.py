@@ -0,0 +1,80 @@
+# api/billing.py
+"""Month-end billing: prorate every customer's fee and store it as an Invoice."""
+from calendar import monthrange
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .archive import archived_month
+from .caching import bump_owner_version
+from .db import upsert
+from .models import Customer, DailyMeal, Invoice, MealMonth
+
+
+def run_billing(year, month_num, batch_size=500):
+    """Write (or rewrite) the invoices of every customer for one month.
+
+    Misses for all customers come from a single grouped aggregate over
+    DailyMeal, plus the meal archive for owners who archived the month,
+    and all invoices are written with one chunked upsert. Returns the
+    number of invoices written. Only closed months can be billed; an
+    invoice for a month still running would freeze a partial total.
+    """
+    month_start = date(year, month_num, 1)
+    month_end = date(year, month_num, monthrange(year, month_num)[1])
+    if month_end >= date.today():
+        raise ValueError(f"{month_start.strftime('%Y-%m')} hasn't ended yet; only closed months can be billed")
+
+    missed = {
+        row['customer_id']: row
+        for row in DailyMeal.objects.filter(
+            date__gte=month_start,
+            date__lte=month_end,
+            is_taken=False
+        ).filter(
+            date__gte=F('customer__joining_date')
+        ).values('customer_id').annotate(
+            lunches=Count('id', filter=Q(meal_type='L')),
+            dinners=Count('id', filter=Q(meal_type='D'))
+        )
+    }
+    archived = archived_month(month_start)
+
+    invoices = []
+    customers = Customer.objects.filter(joining_date__lte=month_end).only('id', 'joining_date', 'fee')
+    for customer in customers.iterator(chunk_size=2000):
+        start_date = max(month_start, customer.joining_date)
+        active_days = (month_end - start_date).days + 1
+        customer_missed = missed.get(customer.id, {'lunches': 0, 'dinners': 0})
+        if customer.id in archived:
+            row = MealMonth(missed=archived[customer.id])
+            customer_missed = {
+                'lunches': customer_missed['lunches'] + row.missed_count('L', start_date.day, month_end.day),
+                'dinners': customer_missed['dinners'] + row.missed_count('D', start_date.day, month_end.day),
+            }
+
+        lunches_taken = active_days - customer_missed['lunches']
+        dinners_taken = active_days - customer_missed['dinners']
+        invoices.append(Invoice(
+            customer_id=customer.id,
+            month=month_start,
+            active_days=active_days,
+            lunches_taken=lunches_taken,
+            dinners_taken=dinners_taken,
+            fee=customer.fee,
+            amount_payable=Invoice.prorate(customer.fee, lunches_taken + dinners_taken, active_days * 2),
+        ))
+
+    with transaction.atomic():
+        upsert(
+            Invoice,
+            invoices,
+            batch_size=batch_size,
+            unique_fields=['customer', 'month'],
+            update_fields=['active_days', 'lunches_taken', 'dinners_taken', 'fee', 'amount_payable', 'updated_at'],
+        )
+        # customer_stats shows the latest invoice
+        for user_id in Customer.objects.values_list('user_id', flat=True).distinct():
+            bump_owner_version(user_id)
+    return len(invoices)
@@ -0,0 +1,195 @@
+# api/caching.py
+"""Per-owner read cache with versioned invalidation.
+
+Every owner has a version number in the "api" cache. Cached read
+responses include it in their key, and every write path calls
+``bump_owner_version``, so a write makes all of that owner's cached
+reads unreachable at once. They then age out through the backend's
+normal MAX_ENTRIES culling. The same key doubles as the response ETag.
+
+The versions are only correct if every worker process reads the same
+cache, so settings refuse the process-local "locmem" backend with more
+than one worker (WEB_CONCURRENCY). Should several workers run on it
+anyway, no ETag is derived from the versions, so a client revalidating
+on another worker than the one it wrote through never gets a 304 for
+data it just changed.
+"""
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework.response import Response
+
+API_CACHE_ALIAS = 'api'
+
+
+def _version_key(user_id):
+    return f'owner:{user_id}:version'
+
+
+def _fresh_version():
+    # Never reuse a small number after the version key itself was evicted,
+    # or entries cached under the old version could come back to life
+    return time.time_ns()
+
+
+def owner_version(user_id):
+    cache = caches[API_CACHE_ALIAS]
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _fresh_version()
+        cache.add(_version_key(user_id), version, None)
+        version = cache.get(_version_key(user_id), version)
+    return version
+
+
+async def aowner_version(user_id):
+    cache = caches[API_CACHE_ALIAS]
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        version = _fresh_version()
+        await cache.aadd(_version_key(user_id), version, None)
+        version = await cache.aget(_version_key(user_id), version)
+    return version
+
+
+def bump_owner_version(user_id):
+    """Invalidate every cached read of one owner once the transaction commits"""
+    def bump():
+        # A plain set, not incr(): the file backend's incr is a read and a
+        # write, so two bumps racing could both land on the same version
+        caches[API_CACHE_ALIAS].set(_version_key(user_id), _fresh_version(), None)
+
+    transaction.on_commit(bump)
+
+
+def _view_key(prefix, view_func, request, version):
+    # Views default to "today", so the date is part of every key
+    return ':'.join([
+        prefix,
+        view_func.__name__,
+        str(request.user.id),
+        str(version),
+        date.today().isoformat(),
+        hashlib.md5(request.get_full_path().encode()).hexdigest(),
+    ])
+
+
+def _shared_versions():
+    return settings.WEB_CONCURRENCY <= 1 or not isinstance(caches[API_CACHE_ALIAS], LocMemCache)
+
+
+def _etag(key):
+    """ETag for a cache key, or None when owner versions are process-local"""
+    if not _shared_versions():
+        return None
+    # The key already pins owner, data version, day and URL, so it is a
+    # valid strong validator without looking at the response body
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    """A 304 response when If-None-Match matches, else None"""
+    if etag is None:
+        return None
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        _set_validators(response, etag)
+    return response
+
+
+def _set_validators(response, etag):
+    if response.status_code in (200, 304):
+        if etag is not None:
+            response['ETag'] = etag
+        # Per-owner data: browsers may keep it but must revalidate
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def owner_cached(view_func):
+    """Cache a read view's successful response per owner, URL and day.
+
+    DRF views have their ``Response.data`` cached; async views (see
+    api.async_views) have their rendered JSON body cached instead. Both
+    get an ETag from the cache key, so a client holding the current
+    version gets a 304 before the cache or the view is touched.
+    """
+    if iscoroutinefunction(view_func):
+        return _owner_cached_async(view_func)
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        cache = caches[API_CACHE_ALIAS]
+        key = _view_key('view', view_func, request, owner_version(request.user.id))
+        etag = _etag(key)
+
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        data = cache.get(key)
+        if data is not None:
+            return _set_validators(Response(data), etag)
+
+        response = view_func(request, *args, **kwargs)
+        if response.status_code == 200 and isinstance(response, Response):
+            cache.set(key, response.data)
+        return _set_validators(response, etag)
+
+    return _wrapped_view
+
+
+def _owner_cached_async(view_func):
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        cache = caches[API_CACHE_ALIAS]
+        key = _view_key('aview', view_func, request, await aowner_version(request.user.id))
+        etag = _etag(key)
+
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        content = await cache.aget(key)
+        if content is not None:
+            return _set_validators(HttpResponse(content, content_type='application/json'), etag)
+
+        response = await view_func(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            await cache.aset(key, response.content)
+        return _set_validators(response, etag)
+
+    return _wrapped_view
+
+
+def owner_conditional(view_func):
+    """ETag/304 handling from the owner version, for reads too large to cache"""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _async_wrapped_view(request, *args, **kwargs):
+            etag = _etag(_view_key('aetag', view_func, request, await aowner_version(request.user.id)))
+            not_modified = _not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            return _set_validators(await view_func(request, *args, **kwargs), etag)
+
+        return _async_wrapped_view
+
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        etag = _etag(_view_key('etag', view_func, request, owner_version(request.user.id)))
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return _set_validators(view_func(request, *args, **kwargs), etag)
+
+    return _wrapped_view
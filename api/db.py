@@ -0,0 +1,79 @@
+# api/db.py
+"""Database helpers: per-connection tuning and portable upserts.
+
+SQLite pragmas are connection state, so ``settings.SQLITE_PRAGMAS`` is
+applied each time Django opens a connection. With ``CONN_MAX_AGE`` set
+that happens once per worker thread rather than once per request.
+"""
+from django.conf import settings
+from django.db import connections, router
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.dispatch import receiver
+
+# Rows matched per lookup query in upsert()'s fallback
+UPSERT_LOOKUP_SIZE = 500
+
+
+def apply_sqlite_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def _tune_connection(sender, connection, **kwargs):
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        apply_sqlite_pragmas(cursor, pragmas)
+
+
+def upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """Insert ``objs``, updating ``update_fields`` of rows that already exist.
+
+    Where the database can name the conflict target (SQLite, PostgreSQL)
+    this is bulk_create(update_conflicts=True). Elsewhere (MySQL) the
+    existing rows are looked up by ``unique_fields`` and bulk-updated and
+    the rest inserted; a row inserted concurrently in between makes that
+    fail with IntegrityError, so call it inside a transaction.
+    """
+    objs = list(objs)
+    connection = connections[router.db_for_write(model)]
+    if connection.features.supports_update_conflicts_with_target:
+        return model.objects.bulk_create(
+            objs,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields
+        )
+
+    attnames = [model._meta.get_field(name).attname for name in unique_fields]
+    existing = {}
+    for start in range(0, len(objs), UPSERT_LOOKUP_SIZE):
+        match = Q()
+        for obj in objs[start:start + UPSERT_LOOKUP_SIZE]:
+            match |= Q(**{attname: getattr(obj, attname) for attname in attnames})
+        for pk, *key in model.objects.filter(match).values_list('pk', *attnames):
+            existing[tuple(key)] = pk
+
+    updated = []
+    created = []
+    fields = [model._meta.get_field(name) for name in update_fields]
+    for obj in objs:
+        pk = existing.get(tuple(getattr(obj, attname) for attname in attnames))
+        if pk is None:
+            created.append(obj)
+            continue
+        obj.pk = pk
+        obj._state.adding = False
+        for field in fields:
+            # Sets auto_now fields such as updated_at, as a save would
+            field.pre_save(obj, False)
+        updated.append(obj)
+    if updated:
+        model.objects.bulk_update(updated, update_fields, batch_size=batch_size)
+    if created:
+        model.objects.bulk_create(created, batch_size=batch_size)
+    return objs
@@ -0,0 +1,110 @@
+# api/jobs.py
+"""Background report jobs backed by the ReportJob table.
+
+Jobs are claimed with a conditional UPDATE, so any number of workers
+(the ``run_report_worker`` command, or in-process threads when
+``REPORT_JOB_THREADS`` is set) can drain the same queue safely.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import ReportJob
+from .reports import cached_report
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def claim_next_job():
+    """Mark the oldest pending job as running and return it, or None"""
+    while True:
+        job_id = (
+            ReportJob.objects.filter(status=ReportJob.PENDING)
+            .order_by('created_at')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+
+        claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.PENDING).update(
+            status=ReportJob.RUNNING,
+            started_at=timezone.now()
+        )
+        if claimed:
+            return ReportJob.objects.select_related('customer').get(pk=job_id)
+        # Another worker got there first; try the next one
+
+
+def run_job(job):
+    """Render a claimed job and store the result bytes or the error"""
+    try:
+        year, month_num = map(int, job.month.split('-'))
+        job.result = cached_report(job.customer, year, month_num, 'pdf')
+        job.status = ReportJob.DONE
+    except Exception as e:
+        logger.exception("Report job %s failed", job.pk)
+        job.status = ReportJob.FAILED
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'status', 'error', 'finished_at'])
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """Process pending jobs until the queue is empty; return how many ran"""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+def requeue_stale_jobs(max_age):
+    """Put back jobs whose worker died while running them"""
+    return ReportJob.objects.filter(
+        status=ReportJob.RUNNING,
+        started_at__lt=timezone.now() - max_age
+    ).update(status=ReportJob.PENDING, started_at=None)
+
+
+def purge_finished_jobs(max_age):
+    """Delete finished jobs (and their stored bytes) older than max_age"""
+    deleted, _ = ReportJob.objects.filter(
+        status__in=[ReportJob.DONE, ReportJob.FAILED],
+        finished_at__lt=timezone.now() - max_age
+    ).delete()
+    return deleted
+
+
+def _drain_queue():
+    try:
+        run_pending_jobs()
+    finally:
+        connection.close()
+
+
+def dispatch():
+    """Wake an in-process worker thread if REPORT_JOB_THREADS is enabled"""
+    global _executor
+
+    threads = getattr(settings, 'REPORT_JOB_THREADS', 0)
+    if threads <= 0:
+        return
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='report-job')
+    _executor.submit(_drain_queue)
+
@@ -0,0 +1,98 @@
+# api/kitchen.py
+"""Kitchen production forecast: how many lunches and dinners to cook.
+
+Each day's count is the owner's active customers minus the expected
+misses. Misses already reported come from the KitchenDay counters. On
+top of that, the miss rate of each weekday over the last
+``HISTORY_WEEKS`` weeks, from one grouped query, estimates the misses
+nobody has reported yet. A future day expects the larger of the two;
+past days report what was recorded.
+"""
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import ExtractWeekDay
+
+from .models import Customer, KitchenDay
+
+HISTORY_WEEKS = 8
+FORECAST_DAYS = 3
+MAX_FORECAST_DAYS = 14
+
+
+def weekday_miss_rates(user_id, joining_dates, today):
+    """{weekday: (lunch rate, dinner rate)} over the weeks before ``today``"""
+    start = today - timedelta(weeks=HISTORY_WEEKS)
+    missed = KitchenDay.objects.filter(
+        user_id=user_id,
+        date__gte=start,
+        date__lt=today
+    ).annotate(
+        weekday=ExtractWeekDay('date')
+    ).values('weekday').annotate(
+        lunches=Sum('lunches_missed'),
+        dinners=Sum('dinners_missed')
+    )
+    # ExtractWeekDay counts from Sunday = 1; date.weekday() from Monday = 0
+    by_weekday = {(row['weekday'] + 5) % 7: row for row in missed}
+
+    # Meals that could have been missed: customers active on each day
+    possible = [0] * 7
+    day = start
+    while day < today:
+        possible[day.weekday()] += bisect_right(joining_dates, day)
+        day += timedelta(days=1)
+
+    rates = {}
+    for weekday in range(7):
+        row = by_weekday.get(weekday)
+        if row is None or not possible[weekday]:
+            rates[weekday] = (0.0, 0.0)
+        else:
+            rates[weekday] = (row['lunches'] / possible[weekday], row['dinners'] / possible[weekday])
+    return rates
+
+
+def forecast(user_id, start_date, days, today=None):
+    """Expected lunches and dinners to cook for ``days`` days from ``start_date``"""
+    today = today or date.today()
+    joining_dates = sorted(Customer.objects.filter(user_id=user_id).values_list('joining_date', flat=True))
+    recorded = {
+        row.date: row
+        for row in KitchenDay.objects.filter(
+            user_id=user_id,
+            date__gte=start_date,
+            date__lt=start_date + timedelta(days=days)
+        )
+    }
+    rates = weekday_miss_rates(user_id, joining_dates, today)
+
+    result = []
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        active = bisect_right(joining_dates, day)
+        row = recorded.get(day)
+        lunch_rate, dinner_rate = rates[day.weekday()]
+
+        entry = {
+            'date': day.isoformat(),
+            'weekday': day.strftime('%A'),
+            'active_customers': active,
+        }
+        for meal, recorded_missed, rate in (
+            ('lunch', row.lunches_missed if row else 0, lunch_rate),
+            ('dinner', row.dinners_missed if row else 0, dinner_rate),
+        ):
+            if day < today:
+                expected = recorded_missed
+            else:
+                expected = max(recorded_missed, round(rate * active))
+            entry[meal] = {
+                'recorded_missed': recorded_missed,
+                'miss_rate': round(rate, 4),
+                'expected_missed': expected,
+                'to_cook': max(0, active - expected),
+            }
+        result.append(entry)
+    return result
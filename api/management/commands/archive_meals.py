@@ -0,0 +1,62 @@
+import time
+from datetime import date, datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.archive import archive_owner
+from api.caching import bump_owner_version
+from api.models import DailyMeal
+
+
+class Command(BaseCommand):
+    help = (
+        "Move misses of closed months out of DailyMeal into compressed per-owner "
+        "files under MEDIA_ROOT; reads of those months go to the files and they become read-only"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="Archive months before this one (YYYY-MM)")
+        parser.add_argument("--owner", help="Only archive this owner's meals (username)")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows read per query (default 5000)")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the rows that would move")
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.strptime(options["before"], "%Y-%m").date()
+        except ValueError:
+            raise CommandError("--before must be YYYY-MM")
+        if before > date.today().replace(day=1):
+            raise CommandError("Only closed months can be archived; --before can't be after the current month")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        rows = DailyMeal.objects.filter(date__lt=before)
+        if options["owner"]:
+            try:
+                owner = User.objects.get(username=options["owner"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['owner']!r}")
+            rows = rows.filter(customer__user=owner)
+
+        if options["dry_run"]:
+            self.stdout.write(f"{rows.count()} rows before {before:%Y-%m} would be archived")
+            return
+
+        started = time.perf_counter()
+        owners = rows.values_list("customer__user_id", flat=True).distinct().order_by("customer__user_id")
+        moved = 0
+        archived_owners = 0
+        for user_id in list(owners):
+            count = archive_owner(user_id, before, chunk_size=options["chunk_size"])
+            if count:
+                bump_owner_version(user_id)
+                archived_owners += 1
+                moved += count
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Owner {user_id}: {count} rows archived")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {moved} rows of {archived_owners} owners before {before:%Y-%m} in {elapsed:.1f}s"
+        ))
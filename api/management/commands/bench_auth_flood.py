@@ -0,0 +1,170 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.benchmarking import percentile
+from api.models import Customer
+
+
+class Command(BaseCommand):
+    help = (
+        "Flood /api/login/ with failing logins while timing mark_tiffin, all served by one "
+        "pool of worker threads, with the auth throttling off and on"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", default="bench-owner-0", help="Owner to mark tiffins as (default bench-owner-0)")
+        parser.add_argument("--workers", type=int, default=4, help="Worker threads serving requests (default 4)")
+        parser.add_argument("--flood-rate", type=float, default=10, help="Logins sent per second (default 10)")
+        parser.add_argument("--seconds", type=float, default=5, help="Length of each phase (default 5)")
+        parser.add_argument("--probe-interval", type=float, default=0.05, help="Pause between mark_tiffin probes")
+        parser.add_argument(
+            "--single-source", action="store_true",
+            help="Flood from one IP with the owner's username instead of random IPs and usernames",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1")
+        if options["flood_rate"] <= 0:
+            raise CommandError("--flood-rate must be positive")
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No owner named {options['owner']}; run seed_benchmark_data first")
+        customer = Customer.objects.filter(user=owner).order_by("pk").first()
+        if customer is None:
+            raise CommandError(f"{owner.username} has no customers")
+
+        self.owner = owner
+        self.customer = customer
+        self.options = options
+        self.host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+        self.token = str(RefreshToken.for_user(owner).access_token)
+
+        report = {
+            "workers": options["workers"],
+            "flood_rate": options["flood_rate"],
+            "seconds": options["seconds"],
+            "single_source": options["single_source"],
+            "hash_slots": settings.AUTH_HASH_SLOTS,
+            "phases": {
+                "idle": self.run_phase(flood=False, protected=True),
+                "flood_unprotected": self.run_phase(flood=True, protected=False),
+                "flood_protected": self.run_phase(flood=True, protected=True),
+            },
+        }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'phase':20} {'probes':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+            f"{'logins':>7} {'hashed':>7} {'429':>6} {'unserved':>9}"
+        )
+        for name, phase in report["phases"].items():
+            probe = phase["mark_tiffin"]
+            flood = phase["login"]
+            self.stdout.write(
+                f"{name:20} {probe['count']:7d} {probe['p50_ms']:9.2f} {probe['p95_ms']:9.2f} {probe['p99_ms']:9.2f} "
+                f"{flood['sent']:7d} {flood['hashed']:7d} {flood['throttled']:6d} {flood['unserved']:9d}"
+            )
+
+    def run_phase(self, flood, protected):
+        """Time mark_tiffin through the worker pool, optionally under a login flood"""
+        caches["throttle"].clear()
+        caches["throttle_slots"].clear()
+        clients = threading.local()
+        statuses = Counter()
+        lock = threading.Lock()
+        stop = threading.Event()
+        sent = 0
+
+        def client():
+            # Test clients aren't thread-safe; each worker gets its own
+            if not hasattr(clients, "client"):
+                clients.client = Client(HTTP_HOST=self.host)
+            return clients.client
+
+        def login():
+            if self.options["single_source"]:
+                username, address = self.owner.username, "10.0.0.1"
+            else:
+                username = f"flood-{random.getrandbits(32):08x}"
+                address = f"10.{random.randrange(256)}.{random.randrange(256)}.{random.randrange(1, 255)}"
+            response = client().post(
+                "/api/login/", {"username": username, "password": "not-the-password"},
+                content_type="application/json", REMOTE_ADDR=address,
+            )
+            with lock:
+                statuses[response.status_code] += 1
+
+        def mark_tiffin(value):
+            return client().post(
+                "/api/mark_tiffin/", {"customer_id": self.customer.pk, "slot": "lunch", "value": value},
+                content_type="application/json", HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            )
+
+        def send_logins():
+            # Open loop: logins keep arriving whether or not earlier ones were served
+            nonlocal sent
+            interval = 1 / self.options["flood_rate"]
+            next_at = time.perf_counter()
+            while not stop.is_set():
+                pool.submit(login)
+                sent += 1
+                next_at += interval
+                stop.wait(max(0, next_at - time.perf_counter()))
+
+        with override_settings(AUTH_THROTTLE_ENABLED=protected):
+            pool = ThreadPoolExecutor(max_workers=self.options["workers"])
+            sender = threading.Thread(target=send_logins, daemon=True)
+            if flood:
+                sender.start()
+
+            # Probe latency includes waiting for a free worker, as a client would see it
+            latencies = []
+            started = time.perf_counter()
+            while time.perf_counter() - started < self.options["seconds"]:
+                submitted = time.perf_counter()
+                pool.submit(mark_tiffin, bool(len(latencies) % 2)).result()
+                latencies.append(time.perf_counter() - submitted)
+                time.sleep(self.options["probe_interval"])
+
+            stop.set()
+            if flood:
+                sender.join()
+            # Logins still queued when the phase ends were never served
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        latencies.sort()
+        served = sum(statuses.values())
+        return {
+            "mark_tiffin": {
+                "count": len(latencies),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            },
+            "login": {
+                "sent": sent,
+                # Everything served and not refused by the throttling ran a password hash
+                "hashed": served - statuses[429],
+                "throttled": statuses[429],
+                "unserved": sent - served,
+                "statuses": {str(code): count for code, count in sorted(statuses.items())},
+            },
+        }
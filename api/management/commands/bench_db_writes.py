@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.db import apply_sqlite_pragmas
+
+SCHEMA = [
+    "CREATE TABLE customer (id INTEGER PRIMARY KEY, lunches_missed INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE daily_meal (customer_id INTEGER, date TEXT, meal_type TEXT, is_taken INTEGER, "
+    "UNIQUE (customer_id, date, meal_type))",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent SQLite write throughput with Django's stock settings "
+        "and with the DB_PROFILE=tuned pragmas, on a scratch database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent writers (default 8)")
+        parser.add_argument("--writes", type=int, default=200, help="Writes per thread (default 200)")
+
+    def handle(self, *args, **options):
+        profiles = [
+            # Django's defaults: rollback journal, synchronous=FULL, 5s timeout, deferred BEGIN
+            ("default", {}, "DEFERRED", 5.0),
+            ("tuned", settings.SQLITE_TUNED_PRAGMAS, "IMMEDIATE",
+             settings.SQLITE_TUNED_PRAGMAS["busy_timeout"] / 1000),
+        ]
+        for name, pragmas, begin, timeout in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                result = self.run_profile(
+                    os.path.join(tmp, "bench.sqlite3"), pragmas, begin, timeout,
+                    options["threads"], options["writes"],
+                )
+            self.stdout.write(
+                f"{name:8} {result['writes']:6d} writes in {result['seconds']:.2f}s "
+                f"= {result['writes'] / result['seconds']:8.0f} writes/s, "
+                f"p95 {result['p95_ms']:.1f}ms, {result['locked']} 'database is locked' errors"
+            )
+
+    def run_profile(self, path, pragmas, begin, timeout, threads, writes):
+        setup = sqlite3.connect(path)
+        for statement in SCHEMA:
+            setup.execute(statement)
+        setup.executemany("INSERT INTO customer (id) VALUES (?)", [(i,) for i in range(threads)])
+        setup.commit()
+        setup.close()
+
+        latencies = []
+        locked = []
+        lock = threading.Lock()
+
+        def writer(customer_id):
+            conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+            apply_sqlite_pragmas(conn.cursor(), pragmas)
+            own_latencies, own_locked = [], 0
+            day = date(2000, 1, 1)
+            for i in range(writes):
+                # Same shape as mark_tiffin: upsert the meal, bump the counter
+                started = time.perf_counter()
+                try:
+                    conn.execute(f"BEGIN {begin}")
+                    conn.execute(
+                        "INSERT INTO daily_meal VALUES (?, ?, 'L', 0) "
+                        "ON CONFLICT (customer_id, date, meal_type) DO UPDATE SET is_taken = 0",
+                        (customer_id, (day + timedelta(days=i)).isoformat()),
+                    )
+                    conn.execute(
+                        "UPDATE customer SET lunches_missed = lunches_missed + 1 WHERE id = ?",
+                        (customer_id,),
+                    )
+                    conn.execute("COMMIT")
+                    own_latencies.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    own_locked += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with lock:
+                latencies.extend(own_latencies)
+                locked.append(own_locked)
+
+        workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        seconds = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "writes": len(latencies),
+            "seconds": seconds,
+            "p95_ms": statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else 0,
+            "locked": sum(locked),
+        }
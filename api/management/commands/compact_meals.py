@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import DailyMeal
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete explicit 'taken' DailyMeal rows, which mean the same as no row, "
+        "in small chunks so the table stays writable while it runs"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows deleted per transaction (default 5000)")
+        parser.add_argument("--sleep", type=float, default=0, help="Seconds to pause between chunks")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the redundant rows")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        redundant = DailyMeal.objects.filter(is_taken=True)
+        if options["dry_run"]:
+            self.stdout.write(f"{redundant.count()} redundant rows")
+            return
+
+        # Walk the primary key so every chunk is an index range scan
+        started = time.perf_counter()
+        deleted = 0
+        last_id = 0
+        while True:
+            ids = list(
+                redundant.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:options["chunk_size"]]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                # Recheck is_taken: a row may have become a miss since it was read
+                count, _ = DailyMeal.objects.filter(id__in=ids, is_taken=True).delete()
+            deleted += count
+            last_id = ids[-1]
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Deleted {deleted} rows (up to id {last_id})")
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} redundant rows in {elapsed:.1f}s"))
@@ -0,0 +1,52 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from api.caching import bump_owner_version
+from api.transfer import import_csv
+
+
+class Command(BaseCommand):
+    help = "Import customers and meals for an owner from a CSV in the /api/export/ format"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to import")
+        parser.add_argument("--owner", required=True, help="Username that receives the data")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Lines written per transaction (default 1000)")
+        parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['owner']!r}")
+
+        try:
+            with open(options["path"], newline="", encoding="utf-8-sig", errors="replace") as lines:
+                report = import_csv(owner.pk, lines, batch_size=options["batch_size"])
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if report.customers or report.meals:
+            bump_owner_version(owner.pk)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report.as_dict(), indent=2))
+            return
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"... and {report.error_count - len(report.errors)} more errors")
+
+        summary = report.as_dict()
+        message = (
+            f"Imported {report.customers} customers and {report.meals} meals from {report.lines} lines "
+            f"in {report.seconds:.1f}s ({summary['lines_per_second'] or 0} lines/s), {report.error_count} errors"
+        )
+        self.stdout.write(self.style.SUCCESS(message) if not report.error_count else self.style.WARNING(message))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.ops import purge_idempotency_keys
+
+
+class Command(BaseCommand):
+    help = "Delete offline-replay idempotency keys older than OPS_KEY_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        deleted = purge_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} idempotency keys"))
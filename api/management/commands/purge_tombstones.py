@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    # Retention is deliberately not overridable here: sync tokens younger than
+    # SYNC_TOMBSTONE_DAYS rely on every tombstone since then still existing
+    help = "Delete delta-sync tombstones older than SYNC_TOMBSTONE_DAYS"
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} tombstones"))
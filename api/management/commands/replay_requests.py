@@ -0,0 +1,141 @@
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmarking import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a request journal against a running server and report "
+        "p50/p95/p99 latency per endpoint"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "journal", nargs="?", default=settings.REQUEST_JOURNAL_PATH,
+            help="Journal file to replay (defaults to REQUEST_JOURNAL_PATH)",
+        )
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Server to replay against")
+        parser.add_argument("--concurrency", type=int, default=4, help="Parallel clients (default 4)")
+        parser.add_argument("--username", help="Log in as this user and send its token with every request")
+        parser.add_argument("--password", help="Password for --username")
+        parser.add_argument("--limit", type=int, help="Replay only the first N journal lines")
+        parser.add_argument("--reads-only", action="store_true", help="Skip everything but GET requests")
+        parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        records = self.load(options["journal"], options["limit"], options["reads_only"])
+        if not records:
+            raise CommandError("Nothing to replay")
+
+        base_url = options["base_url"].rstrip("/")
+        token = None
+        if options["username"]:
+            token = self.login(base_url, options["username"], options["password"] or "", options["timeout"])
+
+        def replay(record):
+            return self.send(base_url, record, token, options["timeout"])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(replay, records))
+        seconds = time.perf_counter() - started
+
+        endpoints = defaultdict(lambda: {"latencies": [], "errors": 0})
+        for record, (status, latency) in zip(records, results):
+            endpoint = endpoints[f"{record['method']} {record.get('view') or record['path']}"]
+            endpoint["latencies"].append(latency)
+            if status is None or status >= 400:
+                endpoint["errors"] += 1
+
+        report = {
+            "requests": len(records),
+            "seconds": round(seconds, 3),
+            "throughput": round(len(records) / seconds, 1),
+            "endpoints": {},
+        }
+        for name, endpoint in sorted(endpoints.items()):
+            latencies = sorted(endpoint["latencies"])
+            report["endpoints"][name] = {
+                "count": len(latencies),
+                "errors": endpoint["errors"],
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            }
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"{'endpoint':45} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, row in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:45} {row['count']:6d} {row['errors']:6d} "
+                f"{row['p50_ms']:9.2f} {row['p95_ms']:9.2f} {row['p99_ms']:9.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {report['requests']} requests in {report['seconds']}s ({report['throughput']} req/s)"
+        ))
+
+    def load(self, path, limit, reads_only):
+        records = []
+        try:
+            with open(path, encoding="utf-8") as journal:
+                for line in journal:
+                    if limit is not None and len(records) >= limit:
+                        break
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if reads_only and record["method"] != "GET":
+                        continue
+                    records.append(record)
+        except OSError as e:
+            raise CommandError(f"Cannot read journal: {e}")
+        except (ValueError, KeyError) as e:
+            raise CommandError(f"Malformed journal line {len(records) + 1}: {e}")
+        return records
+
+    def login(self, base_url, username, password, timeout):
+        body = json.dumps({"username": username, "password": password}).encode()
+        request = Request(f"{base_url}/api/login/", data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                return json.loads(response.read())["access"]
+        except (HTTPError, URLError, KeyError, ValueError) as e:
+            raise CommandError(f"Login failed: {e}")
+
+    def send(self, base_url, record, token, timeout):
+        """Replay one record; return (status or None on connection error, latency)"""
+        url = base_url + record["path"]
+        if record.get("query"):
+            url += "?" + record["query"]
+        headers = {}
+        data = None
+        if record.get("body") is not None:
+            data = json.dumps(record["body"]).encode()
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+
+        request = Request(url, data=data, headers=headers, method=record["method"])
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as e:
+            e.read()
+            status = e.code
+        except URLError:
+            status = None
+        return status, time.perf_counter() - started
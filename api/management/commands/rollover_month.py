@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Customer
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the cached meal counters of every customer not yet counted through a day "
+        "from the month's MealMonth rows; run it daily, just after midnight"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Day to count through as YYYY-MM-DD (defaults to today)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Customers recounted per transaction")
+
+    def handle(self, *args, **options):
+        today = None
+        if options["date"]:
+            try:
+                today = datetime.strptime(options["date"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--date must be in YYYY-MM-DD format")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be at least 1")
+
+        updated = Customer.roll_over_counters(today, chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rolled over {updated} customers"))
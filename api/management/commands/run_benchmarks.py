@@ -0,0 +1,171 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.models import Customer, DailyMeal
+
+# Bump when the set of cases or what they measure changes
+REPORT_FORMAT = 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints against seeded data (see seed_benchmark_data) "
+        "and write a JSON report of wall time, query count and peak memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", default="bench-owner-0", help="Owner to run as (default bench-owner-0)")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per endpoint (default 20)")
+        parser.add_argument(
+            "--warm", action="store_true",
+            help="Keep the API and report caches between runs instead of clearing them",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+        parser.add_argument("--compare", help="Earlier JSON report to print per-endpoint deltas against")
+
+    def handle(self, *args, **options):
+        if options["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+        try:
+            owner = User.objects.get(username=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No owner named {options['owner']}; run seed_benchmark_data first")
+
+        # The customer with the longest history makes the heaviest requests
+        customer = (
+            Customer.objects.filter(user=owner).order_by("joining_date", "pk").first()
+        )
+        if customer is None:
+            raise CommandError(f"{owner.username} has no customers")
+
+        client = Client(
+            HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost",
+            HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(owner).access_token}",
+        )
+        month = date.today().strftime("%Y-%m")
+        cases = [
+            ("hello", "get", "/api/hello/", None),
+            ("customer_stats", "get", f"/api/customer/{customer.pk}/stats/", None),
+            ("customer_meal_history", "get", f"/api/customer/{customer.pk}/meal-history/", None),
+            ("mark_tiffin", "post", "/api/mark_tiffin/", customer.pk),
+            ("generate_customer_pdf", "get", f"/api/customer/{customer.pk}/pdf/?month={month}", None),
+            ("download_customer_pdf", "get", f"/api/customer/{customer.pk}/download-pdf/?month={month}", None),
+        ]
+
+        results = {}
+        for name, method, url, customer_id in cases:
+            results[name] = self.run_case(client, method, url, customer_id, options["repeat"], options["warm"])
+
+        report = {
+            "format": REPORT_FORMAT,
+            "commit": self.git_commit(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "repeat": options["repeat"],
+            "warm": options["warm"],
+            "data": {
+                "owner_customers": Customer.objects.filter(user=owner).count(),
+                "customer_meals": DailyMeal.objects.filter(customer=customer).count(),
+            },
+            "endpoints": results,
+        }
+
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as report_file:
+                report_file.write(payload + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if options["compare"]:
+            self.compare(options["compare"], report)
+
+    def run_case(self, client, method, url, customer_id, repeat, warm):
+        timings = []
+        peak = 0
+        statuses = set()
+        queries = 0
+        for run in range(repeat):
+            if not warm:
+                caches["api"].clear()
+                caches["reports"].clear()
+
+            if method == "post":
+                # Alternate so every run is a real write
+                payload = {"customer_id": customer_id, "slot": "lunch", "value": bool(run % 2)}
+                send = lambda: client.post(url, payload, content_type="application/json")  # noqa: E731
+            else:
+                send = lambda: client.get(url)  # noqa: E731
+
+            tracemalloc.start()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = send()
+                if response.streaming:
+                    b"".join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            _, run_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            timings.append(elapsed)
+            peak = max(peak, run_peak)
+            statuses.add(response.status_code)
+            queries = max(queries, len(captured))
+
+        timings.sort()
+        return {
+            "url": url,
+            "status": sorted(statuses),
+            "wall_ms": {
+                "min": round(timings[0] * 1000, 3),
+                "median": round(statistics.median(timings) * 1000, 3),
+                "max": round(timings[-1] * 1000, 3),
+            },
+            "queries": queries,
+            "peak_memory_kb": round(peak / 1024, 1),
+        }
+
+    def compare(self, path, report):
+        try:
+            with open(path, encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read baseline report: {e}")
+
+        self.stdout.write(f"\nCompared with {baseline.get('commit') or path}:")
+        self.stdout.write(f"{'endpoint':24} {'median ms':>20} {'queries':>10} {'peak KiB':>20}")
+        for name, result in report["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name)
+            if before is None:
+                self.stdout.write(f"{name:24} (new)")
+                continue
+            self.stdout.write(
+                f"{name:24} "
+                f"{before['wall_ms']['median']:9.2f} -> {result['wall_ms']['median']:7.2f} "
+                f"{before['queries']:4d} -> {result['queries']:3d} "
+                f"{before['peak_memory_kb']:9.1f} -> {result['peak_memory_kb']:7.1f}"
+            )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,36 @@
+import time
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.billing import run_billing
+
+
+class Command(BaseCommand):
+    help = "Write prorated invoices for every customer for one month"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--month",
+            help="Month to bill as YYYY-MM (defaults to the previous month)",
+        )
+
+    def handle(self, *args, **options):
+        if options["month"]:
+            try:
+                month = datetime.strptime(options["month"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError("--month must be in YYYY-MM format")
+        else:
+            month = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+        started = time.perf_counter()
+        try:
+            written = run_billing(month.year, month.month)
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} invoices for {month.strftime('%Y-%m')} in {elapsed:.2f}s"
+        ))
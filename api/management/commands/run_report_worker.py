@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import purge_finished_jobs, requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued report jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit instead of polling",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the queue is empty (default: 2)",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=600,
+            help="Requeue running jobs older than this many seconds (default: 600)",
+        )
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=7,
+            help="Delete finished jobs older than this many days (default: 7)",
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(seconds=options["stale_after"])
+        keep = timedelta(days=options["keep_days"])
+
+        purged = purge_finished_jobs(keep)
+        if purged:
+            self.stdout.write(f"Purged {purged} old report jobs")
+
+        while True:
+            requeue_stale_jobs(stale_after)
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} report jobs")
+
+            if options["once"]:
+                self.stdout.write(self.style.SUCCESS("Queue drained"))
+                return
+
+            if not processed:
+                time.sleep(options["interval"])
@@ -0,0 +1,124 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Customer, DailyMeal, KitchenDay, MealMonth
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic owners, customers and meal history for benchmarks "
+        "(N owners x M customers x D days)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owners", type=int, default=10, help="Owners to create (default 10)")
+        parser.add_argument("--customers", type=int, default=50, help="Customers per owner (default 50)")
+        parser.add_argument("--days", type=int, default=365, help="Days of history per customer (default 365)")
+        parser.add_argument("--miss-rate", type=float, default=0.1, help="Share of meals missed (default 0.1)")
+        parser.add_argument("--prefix", default="bench-owner", help="Username prefix of generated owners")
+        parser.add_argument("--password", default="bench-password", help="Password of generated owners")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per bulk insert (default 5000)")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible data")
+        parser.add_argument(
+            "--clear", action="store_true",
+            help="Delete owners with this prefix (and their data) before seeding",
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options["miss_rate"] <= 1:
+            raise CommandError("--miss-rate must be between 0 and 1")
+
+        prefix = options["prefix"]
+        if options["clear"]:
+            deleted, _ = User.objects.filter(username__startswith=f"{prefix}-").delete()
+            self.stdout.write(f"Deleted {deleted} existing rows")
+        elif User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Owners named {prefix}-* already exist; pass --clear to replace them")
+
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+
+        # Hashing is deliberately slow, so every owner shares one hash
+        password = make_password(options["password"])
+        User.objects.bulk_create([
+            User(username=f"{prefix}-{n}", password=password)
+            for n in range(options["owners"])
+        ])
+        owners = User.objects.filter(username__startswith=f"{prefix}-")
+
+        today = date.today()
+        first_day = today - timedelta(days=options["days"] - 1)
+        Customer.objects.bulk_create(
+            [
+                Customer(
+                    user=owner,
+                    name=f"Customer {owner.pk}-{n}",
+                    joining_date=first_day,
+                    fee=Decimal(rng.randrange(1500, 4001, 100)),
+                    counted_through=today,
+                )
+                for owner in owners
+                for n in range(options["customers"])
+            ],
+            batch_size=options["batch_size"],
+        )
+        customer_ids = list(
+            Customer.objects.filter(user__in=owners).order_by("pk").values_list("pk", flat=True)
+        )
+
+        meals = 0
+        for offset in range(0, len(customer_ids), 100):
+            with transaction.atomic():
+                meals += self.seed_meals(
+                    customer_ids[offset:offset + 100], first_day, today,
+                    options["miss_rate"], options["batch_size"], rng,
+                )
+        KitchenDay.rebuild([owner.pk for owner in owners])
+
+        seconds = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(owners)} owners, {len(customer_ids)} customers and {meals} missed meals "
+            f"in {seconds:.1f}s ({meals / seconds:.0f} rows/s)"
+        ))
+
+    def seed_meals(self, customer_ids, first_day, last_day, miss_rate, batch_size, rng):
+        """Write the missed meals and matching MealMonth rows for some customers"""
+        batch = []
+        months = {}
+        written = 0
+        for customer_id in customer_ids:
+            day = first_day
+            while day <= last_day:
+                for meal_type in ("L", "D"):
+                    # Only misses are stored; a missing row means "taken"
+                    if rng.random() < miss_rate:
+                        batch.append(DailyMeal(
+                            customer_id=customer_id, date=day, meal_type=meal_type, is_taken=False
+                        ))
+                        key = (customer_id, day.replace(day=1))
+                        row = months.get(key)
+                        if row is None:
+                            row = months[key] = MealMonth(
+                                customer_id=customer_id, month=key[1],
+                                version=1, updated_at=timezone.now(),
+                            )
+                        row.missed |= MealMonth.bit(day, meal_type)
+                if len(batch) >= batch_size:
+                    DailyMeal.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+                day += timedelta(days=1)
+
+        DailyMeal.objects.bulk_create(batch)
+        written += len(batch)
+        MealMonth.objects.bulk_create(months.values(), batch_size=batch_size)
+        Customer.refresh_counters_from(months.values())
+        return written
@@ -0,0 +1,72 @@
+# api/meals.py
+"""The meal write path shared by the API views and the CSV import.
+
+Meals are stored exception-only: a DailyMeal row exists only for a miss.
+Every write also updates the packed MealMonth bitmap and the owner's
+KitchenDay counters, and tombstones deleted rows for delta sync.
+"""
+from django.db.models import Q
+
+from . import archive, sync
+from .db import upsert
+from .models import DailyMeal, KitchenDay, MealMonth
+
+
+def store_meal(customer, target_date, meal_type, is_taken):
+    """Write one meal under the exception-only rule: only misses get a row.
+
+    Returns the change in missed meals (-1, 0 or 1) for the counters.
+    Must run inside a transaction.
+    """
+    archive.check_writable(customer.user_id, target_date)
+    if is_taken:
+        deleted, _ = DailyMeal.objects.filter(
+            customer=customer,
+            date=target_date,
+            meal_type=meal_type
+        ).delete()
+        if deleted:
+            sync.record_meal_deletion(customer, target_date, meal_type)
+    else:
+        DailyMeal.objects.update_or_create(
+            customer=customer,
+            date=target_date,
+            meal_type=meal_type,
+            defaults={'is_taken': False},
+        )
+    delta = MealMonth.record(customer, target_date, meal_type, is_taken)
+    KitchenDay.record(customer.user_id, {target_date: [delta, 0] if meal_type == 'L' else [0, delta]})
+    return delta
+
+
+def store_meals(user_id, changes):
+    """store_meal for many {(customer_id, date, meal_type): is_taken} at once"""
+    missed = [key for key, is_taken in changes.items() if not is_taken]
+    taken = [key for key, is_taken in changes.items() if is_taken]
+
+    if missed:
+        upsert(
+            DailyMeal,
+            [
+                DailyMeal(customer_id=customer_id, date=target_date, meal_type=meal_type, is_taken=False)
+                for customer_id, target_date, meal_type in missed
+            ],
+            unique_fields=['customer', 'date', 'meal_type'],
+            update_fields=['is_taken', 'updated_at']
+        )
+
+    if taken:
+        match = Q()
+        for customer_id, target_date, meal_type in taken:
+            match |= Q(customer_id=customer_id, date=target_date, meal_type=meal_type)
+        rows = list(DailyMeal.objects.filter(match).values_list('id', 'customer_id', 'date', 'meal_type'))
+        if rows:
+            DailyMeal.objects.filter(id__in=[row[0] for row in rows]).delete()
+            sync.record_meal_deletions(user_id, [row[1:] for row in rows])
+
+    meal_months = MealMonth.record_many([
+        (customer_id, target_date, meal_type, is_taken)
+        for (customer_id, target_date, meal_type), is_taken in changes.items()
+    ])
+    KitchenDay.record_meal_months(user_id, meal_months)
+    return meal_months
@@ -0,0 +1,211 @@
+# api/middleware.py
+"""API middleware: response compression and the request journal.
+
+``ThresholdGZipMiddleware`` is Django's GZipMiddleware with a configurable
+minimum size, so small JSON bodies skip the compression overhead.
+
+The request journal writes one JSON line per request, off the request
+path. ``RequestJournalMiddleware`` measures each request (latency, DB query count
+and time, response size) and hands a record to ``JournalWriter``, whose
+background thread appends batches to ``REQUEST_JOURNAL_PATH``. Requests
+never wait on disk; if the queue is full the record is dropped and counted.
+
+Credentials are never journalled: the Authorization header is not read,
+and sensitive body fields and query parameters are replaced by
+``REDACTED``. ``replay_requests`` reads the resulting file.
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.middleware.gzip import GZipMiddleware
+
+logger = logging.getLogger(__name__)
+
+REDACTED = '[redacted]'
+SENSITIVE_FIELDS = {'password', 'password1', 'password2', 'token', 'access', 'refresh', 'secret'}
+# Bodies larger than this are journalled without their content
+MAX_BODY_BYTES = 16 * 1024
+
+
+def redact(value):
+    """Return a copy of a JSON value with sensitive fields blanked out"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if key.lower() in SENSITIVE_FIELDS else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def redact_query(query_string):
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode([
+        (key, REDACTED if key.lower() in SENSITIVE_FIELDS else item) for key, item in pairs
+    ])
+
+
+class ThresholdGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves responses under GZIP_MIN_LENGTH bytes alone"""
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_LENGTH:
+            return response
+        return super().process_response(request, response)
+
+
+class JournalWriter:
+    """Append JSON lines to a file from a single background thread"""
+
+    def __init__(self, path, max_queue=10000, batch_size=200, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='request-journal', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        batch = []
+        stopping = False
+        while not stopping:
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            if batch:
+                self._flush(batch)
+                batch = []
+
+    def _flush(self, batch):
+        try:
+            with open(self.path, 'a', encoding='utf-8') as journal:
+                journal.write(''.join(json.dumps(record, default=str) + '\n' for record in batch))
+        except OSError:
+            logger.exception("Could not write %d request journal records", len(batch))
+
+
+class QueryTimer:
+    """connection.execute_wrapper that counts queries and their total time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class RequestJournalMiddleware:
+    """Journal every request when REQUEST_JOURNAL_ENABLED is set"""
+
+    sync_capable = True
+    async_capable = True
+
+    writer = None
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_JOURNAL_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        if RequestJournalMiddleware.writer is None:
+            RequestJournalMiddleware.writer = JournalWriter(settings.REQUEST_JOURNAL_PATH)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        # Read the body now; views can still read request.body/request.data later
+        body = self.capture_body(request)
+
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        latency = time.perf_counter() - started
+
+        self.writer.write(self.record(request, response, body, latency, timer))
+        return response
+
+    async def __acall__(self, request):
+        body = self.capture_body(request)
+
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        latency = time.perf_counter() - started
+
+        # The async ORM runs queries on worker threads, out of reach of an
+        # execute_wrapper installed here, so query stats are not recorded
+        self.writer.write(self.record(request, response, body, latency, None))
+        return response
+
+    def record(self, request, response, body, latency, timer):
+        match = request.resolver_match
+        return {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'query': redact_query(request.META.get('QUERY_STRING', '')),
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'latency_ms': round(latency * 1000, 2),
+            'queries': timer.count if timer else None,
+            'db_ms': round(timer.seconds * 1000, 2) if timer else None,
+            # Streaming responses are sent after this point, so their size is unknown
+            'size': None if response.streaming else len(response.content),
+            'content_type': request.content_type,
+            'body': body,
+        }
+
+    def capture_body(self, request):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        if request.content_type != 'application/json':
+            return None
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return None
+        if not length or length > MAX_BODY_BYTES:
+            return None
+        try:
+            return redact(json.loads(request.body))
+        except ValueError:
+            return None
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_meal_months(apps, schema_editor):
+    """Pack existing missed DailyMeal rows into one MealMonth per customer-month"""
+    DailyMeal = apps.get_model('api', 'DailyMeal')
+    MealMonth = apps.get_model('api', 'MealMonth')
+
+    packed = {}
+    missed = DailyMeal.objects.filter(is_taken=False).values_list(
+        'customer_id', 'date', 'meal_type'
+    )
+    for customer_id, day, meal_type in missed.iterator(chunk_size=2000):
+        offset = 0 if meal_type == 'L' else 31
+        key = (customer_id, day.replace(day=1))
+        packed[key] = packed.get(key, 0) | (1 << (offset + day.day - 1))
+
+    MealMonth.objects.bulk_create(
+        [
+            MealMonth(customer_id=customer_id, month=month, missed=bits)
+            for (customer_id, month), bits in packed.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('missed', models.BigIntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meal_months', to='api.customer')),
+            ],
+            options={
+                'ordering': ['-month'],
+                'unique_together': {('customer', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_meal_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:17
+
+from datetime import date
+
+from django.db import migrations
+
+
+def recount_missed_counters(apps, schema_editor):
+    """The counters used to hold taken meals; refill them with this month's misses"""
+    Customer = apps.get_model('api', 'Customer')
+    MealMonth = apps.get_model('api', 'MealMonth')
+
+    month_start = date.today().replace(day=1)
+    packed = dict(
+        MealMonth.objects.filter(month=month_start).values_list('customer_id', 'missed')
+    )
+    lunch_mask = (1 << 31) - 1
+
+    customers = list(Customer.objects.only('id'))
+    for customer in customers:
+        missed = packed.get(customer.id, 0)
+        customer.current_month = month_start.strftime('%Y-%m')
+        customer.lunches_missed_this_month = (missed & lunch_mask).bit_count()
+        customer.dinners_missed_this_month = (missed >> 31).bit_count()
+    Customer.objects.bulk_update(
+        customers,
+        ['current_month', 'lunches_missed_this_month', 'dinners_missed_this_month'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_meal_month'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='customer',
+            old_name='dinners_this_month',
+            new_name='dinners_missed_this_month',
+        ),
+        migrations.RenameField(
+            model_name='customer',
+            old_name='lunches_this_month',
+            new_name='lunches_missed_this_month',
+        ),
+        migrations.RunPython(recount_missed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_report_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mealmonth',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mealmonth',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_meal_month_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('active_days', models.PositiveIntegerField()),
+                ('lunches_taken', models.PositiveIntegerField()),
+                ('dinners_taken', models.PositiveIntegerField()),
+                ('fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('amount_payable', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to='api.customer')),
+            ],
+            options={
+                'ordering': ['-month'],
+                'indexes': [models.Index(fields=['month'], name='api_invoice_month_8c0b56_idx')],
+                'unique_together': {('customer', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='dailymeal',
+            name='api_dailyme_custome_959a85_idx',
+        ),
+        migrations.AlterField(
+            model_name='dailymeal',
+            name='is_taken',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='dailymeal',
+            index=models.Index(fields=['customer', 'date', 'meal_type', 'is_taken'], name='api_dailymeal_covering_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:49
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def count_kitchen_days(apps, schema_editor):
+    """Fill the counters from the packed MealMonth bitmaps"""
+    KitchenDay = apps.get_model('api', 'KitchenDay')
+    MealMonth = apps.get_model('api', 'MealMonth')
+
+    counts = {}
+    rows = MealMonth.objects.values_list('customer__user_id', 'month', 'missed')
+    for user_id, month, missed in rows.iterator(chunk_size=2000):
+        for index in range(62):
+            if missed >> index & 1:
+                day_counts = counts.setdefault((user_id, month + timedelta(days=index % 31)), [0, 0])
+                day_counts[0 if index < 31 else 1] += 1
+
+    KitchenDay.objects.bulk_create(
+        [
+            KitchenDay(user_id=user_id, date=day, lunches_missed=lunch, dinners_missed=dinner)
+            for (user_id, day), (lunch, dinner) in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_meal_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KitchenDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('lunches_missed', models.IntegerField(default=0)),
+                ('dinners_missed', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='kitchen_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+        migrations.RunPython(count_kitchen_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_offline_replay'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='customer',
+            name='current_month',
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='counted_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
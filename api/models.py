@@ -1,7 +1,12 @@
 # models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import User
-from datetime import date
+from django.utils import timezone
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
 
 class Customer(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='customers')
@@ -9,10 +14,14 @@ class Customer(models.Model):
     joining_date = models.DateField(default=date.today)
     fee = models.DecimalField(max_digits=10, decimal_places=2)
     
-    # Cached statistics
-    current_month = models.CharField(max_length=7, default='0000-00')
-    lunches_this_month = models.IntegerField(default=0)
-    dinners_this_month = models.IntegerField(default=0)
+    # Cached statistics: this month's misses from the first counted day
+    # (the 1st, or the joining date) through counted_through. Write paths
+    # keep them current with F() deltas; once the date moves on they are
+    # recounted from the MealMonth row, so absences marked ahead of time
+    # are counted when their day comes (see recount_counters).
+    counted_through = models.DateField(null=True, blank=True)
+    lunches_missed_this_month = models.IntegerField(default=0)
+    dinners_missed_this_month = models.IntegerField(default=0)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -21,26 +30,100 @@ class Customer(models.Model):
         indexes = [
             models.Index(fields=['user', 'name']),
             models.Index(fields=['joining_date']),
+            models.Index(fields=['user', 'updated_at']),
         ]
     
     def __str__(self):
         return self.name
 
-class DailyMeal(models.Model):
-    MEAL_CHOICES = [
-        ('L', 'Lunch'),
-        ('D', 'Dinner'),
-    ]
+    @staticmethod
+    def counted_misses(missed, joining_date, today):
+        """(lunches, dinners) the counters hold on ``today`` for a month's MealMonth bits"""
+        first_day = max(joining_date, today.replace(day=1))
+        if first_day > today:
+            return 0, 0
+        row = MealMonth(missed=missed)
+        return row.missed_count('L', first_day.day, today.day), row.missed_count('D', first_day.day, today.day)
 
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='meals')
-    date = models.DateField()
-    meal_type = models.CharField(max_length=1, choices=MEAL_CHOICES)
-    is_taken = models.BooleanField(default=True)
+    @classmethod
+    def recount_counters(cls, customer_ids, today=None):
+        """Set some customers' counters from this month's MealMonth rows; returns them"""
+        today = today or date.today()
+        with transaction.atomic():
+            # Locked before the bits are read: a write committing meanwhile
+            # waits here, then adds its delta on top of the recount
+            customers = list(cls.objects.select_for_update().filter(pk__in=customer_ids).only('pk', 'joining_date'))
+            missed = dict(
+                MealMonth.objects.filter(
+                    customer_id__in=customer_ids,
+                    month=today.replace(day=1)
+                ).values_list('customer_id', 'missed')
+            )
+            for customer in customers:
+                customer.counted_through = today
+                customer.lunches_missed_this_month, customer.dinners_missed_this_month = cls.counted_misses(
+                    missed.get(customer.pk, 0), customer.joining_date, today
+                )
+            cls.objects.bulk_update(
+                customers,
+                ['counted_through', 'lunches_missed_this_month', 'dinners_missed_this_month']
+            )
+        return customers
 
-    class Meta:
-        unique_together = ['customer', 'date', 'meal_type']
-        ordering = ['-date', 'meal_type']
+    @classmethod
+    def roll_over_counters(cls, today=None, chunk_size=2000):
+        """Recount every customer not yet counted through ``today``; returns how many.
+
+        Seeds a new month (or day) from the bits already set for it, so
+        misses marked ahead of time are included and unmarking one later
+        can't take a counter below zero.
+        """
+        today = today or date.today()
+        stale = list(cls.objects.exclude(counted_through=today).order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(stale), chunk_size):
+            cls.recount_counters(stale[start:start + chunk_size], today)
+        return len(stale)
+
+    @classmethod
+    def refresh_counters_from(cls, meal_months):
+        """Recount the customers whose current-month MealMonth rows were just written"""
+        month_start = date.today().replace(day=1)
+        customer_ids = sorted({row.customer_id for row in meal_months if row.month == month_start})
+        for start in range(0, len(customer_ids), 2000):
+            cls.recount_counters(customer_ids[start:start + 2000])
+
+    def apply_missed_delta(self, day, lunch=0, dinner=0):
+        """Shift the cached missed counters after a meal on ``day`` changed"""
+        today = date.today()
+        if not (lunch or dinner) or not max(self.joining_date, today.replace(day=1)) <= day <= today:
+            return
+
+        updated = Customer.objects.filter(pk=self.pk, counted_through=today).update(
+            lunches_missed_this_month=Greatest(F('lunches_missed_this_month') + lunch, 0),
+            dinners_missed_this_month=Greatest(F('dinners_missed_this_month') + dinner, 0)
+        )
+        if not updated:
+            # Counted through an earlier day; the bitmap already includes
+            # this change, so recount from it
+            Customer.recount_counters([self.pk], today)
+
+    def current_counters(self):
+        """(lunches, dinners) missed this month so far, recounting them first if stale"""
+        today = date.today()
+        if self.counted_through != today:
+            for fresh in Customer.recount_counters([self.pk], today):
+                self.counted_through = fresh.counted_through
+                self.lunches_missed_this_month = fresh.lunches_missed_this_month
+                self.dinners_missed_this_month = fresh.dinners_missed_this_month
+        return self.lunches_missed_this_month, self.dinners_missed_this_month
 
+class DailyMeal(models.Model):
+    """A missed meal.
+
+    Storage is exception-only: a meal with no row was taken, so write paths
+    store misses and delete the row when a meal is marked taken again.
+    ``compact_meals`` removes explicit "taken" rows left by older versions.
+    """
     MEAL_CHOICES = [
         ('L', 'Lunch'),
         ('D', 'Dinner'),
@@ -49,15 +132,454 @@ class DailyMeal(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='meals')
     date = models.DateField()
     meal_type = models.CharField(max_length=1, choices=MEAL_CHOICES)
-    is_taken = models.BooleanField(default=True)
+    is_taken = models.BooleanField(default=False)
+    # Drives delta sync; bulk writes must list it in update_fields
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         unique_together = ['customer', 'date', 'meal_type']
         indexes = [
-            models.Index(fields=['customer', 'date']),
+            # Covers every per-customer lookup (day status, history ranges,
+            # miss counts) without touching the table
+            models.Index(fields=['customer', 'date', 'meal_type', 'is_taken'], name='api_dailymeal_covering_idx'),
             models.Index(fields=['date']),
         ]
         ordering = ['-date', 'meal_type']
     
     def __str__(self):
-        return f"{self.customer.name} - {self.date} - {self.meal_type}"
\ No newline at end of file
+        return f"{self.customer.name} - {self.date} - {self.meal_type}"
+
+class MealMonth(models.Model):
+    """Packed attendance for one customer-month.
+
+    ``missed`` holds two 31-bit bitmaps: bit ``day - 1`` marks a missed
+    lunch and bit ``31 + day - 1`` a missed dinner. A clear bit means the
+    meal was taken, the same default DailyMeal uses for a missing row.
+    ``version`` is bumped on every change and versions cached reports.
+    """
+    DINNER_OFFSET = 31
+
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='meal_months')
+    month = models.DateField()  # first day of the month
+    missed = models.BigIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['customer', 'month']
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.month.strftime('%Y-%m')}"
+
+    @classmethod
+    def bit(cls, day, meal_type):
+        offset = 0 if meal_type == 'L' else cls.DINNER_OFFSET
+        return 1 << (offset + day.day - 1)
+
+    @classmethod
+    def _range_rows(cls, customer, start_date, end_date):
+        return cls.objects.filter(
+            customer=customer,
+            month__gte=start_date.replace(day=1),
+            month__lte=end_date
+        ).order_by('-month')
+
+    @staticmethod
+    def walk_days(rows, start_date, end_date):
+        """Yield (day, lunch_taken, dinner_taken) from end_date back to start_date,
+        given the range's rows newest first"""
+        rows = iter(rows)
+        row = next(rows, None)
+
+        day = end_date
+        while day >= start_date:
+            month = day.replace(day=1)
+            while row is not None and row.month > month:
+                row = next(rows, None)
+            if row is not None and row.month == month:
+                yield day, row.is_taken(day, 'L'), row.is_taken(day, 'D')
+            else:
+                yield day, True, True
+            day -= timedelta(days=1)
+
+    @classmethod
+    def iter_days(cls, customer, start_date, end_date):
+        """Yield (day, lunch_taken, dinner_taken) from end_date back to start_date.
+
+        Month rows are streamed newest first, so memory stays flat however
+        long the range is.
+        """
+        rows = cls._range_rows(customer, start_date, end_date).iterator()
+        yield from cls.walk_days(rows, start_date, end_date)
+
+    @classmethod
+    async def aiter_days(cls, customer, start_date, end_date):
+        """Async version of iter_days, for the async read views.
+
+        The rows (one per month) are fetched up front, then walked by the
+        same code as iter_days.
+        """
+        rows = [row async for row in cls._range_rows(customer, start_date, end_date)]
+        for entry in cls.walk_days(rows, start_date, end_date):
+            yield entry
+
+    @classmethod
+    def record(cls, customer, day, meal_type, is_taken):
+        """Set or clear one meal's missed bit with an atomic UPDATE.
+
+        Returns the change in missed meals (-1, 0 or 1) so callers can
+        maintain counters without recounting the month.
+        """
+        bit = cls.bit(day, meal_type)
+        month = day.replace(day=1)
+        rows = cls.objects.filter(customer=customer, month=month)
+        bump = {'version': F('version') + 1, 'updated_at': timezone.now()}
+        bit_set = Exact(F('missed').bitand(bit), bit)
+
+        if is_taken:
+            return -rows.filter(bit_set).update(missed=F('missed').bitand(~bit), **bump)
+
+        bit_clear = Exact(F('missed').bitand(bit), 0)
+        if rows.filter(bit_clear).update(missed=F('missed').bitor(bit), **bump):
+            return 1
+
+        _, created = cls.objects.get_or_create(
+            customer=customer,
+            month=month,
+            defaults={'missed': bit, 'version': 1, 'updated_at': bump['updated_at']}
+        )
+        if created:
+            return 1
+        # Row appeared concurrently, or the bit was already set
+        return rows.filter(bit_clear).update(missed=F('missed').bitor(bit), **bump)
+
+    @classmethod
+    def record_many(cls, changes):
+        """Apply many (customer_id, day, meal_type, is_taken) changes at once.
+
+        Affected rows are locked and read in one query and written back
+        with one bulk UPDATE. Must run inside a transaction. Returns the
+        updated rows, each with ``previous_missed`` holding its bits
+        before the change.
+        """
+        def lock(keys):
+            return cls.objects.select_for_update().filter(
+                customer_id__in={customer_id for customer_id, _ in keys},
+                month__in={month for _, month in keys}
+            )
+
+        months = {
+            (row.customer_id, row.month): row
+            for row in lock({(customer_id, day.replace(day=1)) for customer_id, day, _, _ in changes})
+        }
+
+        # Months getting their first miss need a row. It is inserted empty
+        # (skipping any a concurrent transaction just created) and locked
+        # like the rest, so the change lands on the committed bits instead
+        # of overwriting them.
+        missing = {
+            (customer_id, day.replace(day=1))
+            for customer_id, day, _, is_taken in changes
+            if not is_taken
+        } - months.keys()
+        if missing:
+            cls.objects.bulk_create(
+                [cls(customer_id=customer_id, month=month) for customer_id, month in missing],
+                ignore_conflicts=True
+            )
+            for row in lock(missing):
+                months.setdefault((row.customer_id, row.month), row)
+
+        original = {key: row.missed for key, row in months.items()}
+        for customer_id, day, meal_type, is_taken in changes:
+            row = months.get((customer_id, day.replace(day=1)))
+            if row is None:
+                continue  # taken, in a month with nothing missed
+            bit = cls.bit(day, meal_type)
+            row.missed = row.missed & ~bit if is_taken else row.missed | bit
+
+        # Only write rows whose bits actually changed
+        now = timezone.now()
+        touched = {}
+        for key, row in months.items():
+            row.previous_missed = original[key]
+            if row.missed != row.previous_missed:
+                row.version += 1
+                row.updated_at = now
+                touched[key] = row
+
+        cls.objects.bulk_update(touched.values(), ['missed', 'version', 'updated_at'])
+        return list(touched.values())
+
+    def is_taken(self, day, meal_type):
+        return not self.missed & self.bit(day, meal_type)
+
+    @classmethod
+    def missed_deltas(cls, month, old, new, deltas=None):
+        """Accumulate {day: [lunch, dinner]} changes in misses between two bitmaps of a month"""
+        deltas = {} if deltas is None else deltas
+        changed = old ^ new
+        while changed:
+            bit = changed & -changed
+            index = bit.bit_length() - 1
+            day = month + timedelta(days=index % cls.DINNER_OFFSET)
+            counts = deltas.setdefault(day, [0, 0])
+            counts[0 if index < cls.DINNER_OFFSET else 1] += 1 if new & bit else -1
+            changed ^= bit
+        return deltas
+
+    def missed_count(self, meal_type, first_day, last_day):
+        """Count missed meals of one type between two days of this month"""
+        if last_day < first_day:
+            return 0
+        offset = 0 if meal_type == 'L' else self.DINNER_OFFSET
+        width = last_day - first_day + 1
+        mask = ((1 << width) - 1) << (offset + first_day - 1)
+        return (self.missed & mask).bit_count()
+
+
+class ReportJob(models.Model):
+    """A queued monthly report, rendered by a background worker"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='report_jobs')
+    month = models.CharField(max_length=7)  # YYYY-MM
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result = models.BinaryField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.month} - {self.status}"
+
+
+class Invoice(models.Model):
+    """A customer's bill for one closed month, written by run_billing"""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='invoices')
+    month = models.DateField()  # first day of the month
+    active_days = models.PositiveIntegerField()
+    lunches_taken = models.PositiveIntegerField()
+    dinners_taken = models.PositiveIntegerField()
+    fee = models.DecimalField(max_digits=10, decimal_places=2)
+    amount_payable = models.DecimalField(max_digits=10, decimal_places=2)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['customer', 'month']
+        indexes = [
+            models.Index(fields=['month']),
+        ]
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.month.strftime('%Y-%m')} - {self.amount_payable}"
+
+    @staticmethod
+    def prorate(fee, meals_taken, possible_meals):
+        """Fee scaled by the share of meals taken, rounded to paise"""
+        if possible_meals <= 0:
+            return Decimal('0.00')
+        amount = Decimal(fee) * meals_taken / possible_meals
+        return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+class Tombstone(models.Model):
+    """Marks a customer or meal row deleted through the API, for delta sync.
+
+    Meal tombstones carry the (customer_id, date, meal_type) key of the
+    deleted row; customer tombstones only the customer id. Tombstones are
+    kept for ``SYNC_TOMBSTONE_DAYS`` (see purge_tombstones).
+    """
+    CUSTOMER = 'customer'
+    MEAL = 'meal'
+    KIND_CHOICES = [
+        (CUSTOMER, 'Customer'),
+        (MEAL, 'Meal'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    customer_id = models.BigIntegerField()  # the row is gone, so no foreign key
+    date = models.DateField(null=True, blank=True)
+    meal_type = models.CharField(max_length=1, blank=True, default='')
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+            models.Index(fields=['deleted_at']),
+        ]
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        if self.kind == self.MEAL:
+            return f"{self.kind} {self.customer_id} - {self.date} - {self.meal_type}"
+        return f"{self.kind} {self.customer_id}"
+
+
+class MealArchive(models.Model):
+    """How far an owner's misses have been moved out of DailyMeal.
+
+    Misses dated before ``before`` (always the first of a month) live in
+    the owner's compressed archive file, see api.archive; those months
+    are read-only.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='meal_archive')
+    before = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - before {self.before.strftime('%Y-%m')}"
+
+
+class KitchenDay(models.Model):
+    """Misses recorded across one owner's customers for one day.
+
+    The meal write paths keep these counters current, so the kitchen
+    forecast (api.kitchen) reads one row per day instead of scanning
+    DailyMeal. Days without a row have no recorded misses.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='kitchen_days')
+    date = models.DateField()
+    lunches_missed = models.IntegerField(default=0)
+    dinners_missed = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'date']
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date} - {self.lunches_missed}/{self.dinners_missed}"
+
+    @classmethod
+    def record(cls, user_id, deltas):
+        """Add {day: [lunch, dinner]} miss deltas to an owner's counters.
+
+        Like MealMonth.record_many: missing rows are inserted first, then
+        every row is locked and read in one query and written back with
+        one bulk UPDATE. Must run inside a transaction.
+        """
+        deltas = {day: counts for day, counts in deltas.items() if any(counts)}
+        if not deltas:
+            return
+
+        def lock(days):
+            return {
+                row.date: row
+                for row in cls.objects.select_for_update().filter(user_id=user_id, date__in=days)
+            }
+
+        rows = lock(deltas)
+        missing = deltas.keys() - rows.keys()
+        if missing:
+            # A concurrent transaction may create the same rows; theirs win
+            # and this one's deltas are added to them after the lock
+            cls.objects.bulk_create(
+                [cls(user_id=user_id, date=day) for day in missing],
+                ignore_conflicts=True
+            )
+            rows.update(lock(missing))
+
+        for day, (lunch, dinner) in deltas.items():
+            rows[day].lunches_missed += lunch
+            rows[day].dinners_missed += dinner
+        cls.objects.bulk_update(rows.values(), ['lunches_missed', 'dinners_missed'])
+
+    @classmethod
+    def record_meal_months(cls, user_id, meal_months):
+        """record() the changes of rows returned by MealMonth.record_many"""
+        deltas = {}
+        for row in meal_months:
+            MealMonth.missed_deltas(row.month, row.previous_missed, row.missed, deltas)
+        cls.record(user_id, deltas)
+
+    @classmethod
+    def forget_customer(cls, customer):
+        """Take a customer's misses back out of the counters, before it is deleted"""
+        deltas = {}
+        for month, missed in customer.meal_months.values_list('month', 'missed'):
+            MealMonth.missed_deltas(month, missed, 0, deltas)
+        cls.record(customer.user_id, deltas)
+
+    @classmethod
+    def rebuild(cls, user_ids):
+        """Recount the owners' counters from their MealMonth rows"""
+        deltas = {}
+        rows = MealMonth.objects.filter(customer__user_id__in=user_ids).values_list(
+            'customer__user_id', 'month', 'missed'
+        )
+        for user_id, month, missed in rows.iterator(chunk_size=2000):
+            MealMonth.missed_deltas(month, 0, missed, deltas.setdefault(user_id, {}))
+        cls.objects.filter(user_id__in=user_ids).delete()
+        cls.objects.bulk_create(
+            [
+                cls(user_id=user_id, date=day, lunches_missed=lunch, dinners_missed=dinner)
+                for user_id, days in deltas.items()
+                for day, (lunch, dinner) in days.items()
+            ],
+            batch_size=1000
+        )
+
+
+class IdempotencyKey(models.Model):
+    """A replayed offline operation, by its client key, so it applies only once.
+
+    ``status`` is the outcome the first replay reported ('applied' or
+    'stale'); repeats of the key get it back without being re-applied.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=100)
+    status = models.CharField(max_length=10)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'key']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.key} - {self.status}"
+
+
+class MealClock(models.Model):
+    """When the last replayed write of one meal slot happened on the client.
+
+    ``written_at`` is the operation's client timestamp and ``applied_at``
+    when the server applied it. A later online write to the slot leaves a
+    newer DailyMeal.updated_at or meal Tombstone, which then takes over
+    as the slot's clock (see api.ops).
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='meal_clocks')
+    date = models.DateField()
+    meal_type = models.CharField(max_length=1)
+    written_at = models.DateTimeField()
+    applied_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['customer', 'date', 'meal_type']
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.date} - {self.meal_type} @ {self.written_at}"
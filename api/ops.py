@@ -0,0 +1,221 @@
+# api/ops.py
+"""Idempotent replay of meal writes queued by the mobile client offline.
+
+A batch is an ordered list of operations, each with a client
+idempotency ``key`` and the client timestamp ``ts`` of the action::
+
+    {"key": "6f1c...", "ts": "2026-10-18T08:30:00+05:30", "op": "mark_tiffin",
+     "customer_id": 12, "date": "2026-10-18", "slot": "lunch", "value": false}
+    {"key": "90ab...", "ts": "...", "op": "update_specific_date",
+     "customer_id": 12, "date": "2026-10-18", "lunch": true, "dinner": false}
+
+Keys already seen return their first outcome and change nothing. Every
+other write is resolved last-writer-wins per (customer, date, slot):
+within the batch the latest ``ts`` wins, and a write older than the
+slot's clock on the server is ``stale`` and skipped. The slot's clock is
+the timestamp of the last replayed write (MealClock), unless an online
+write came after it; then it is that write's server time
+(DailyMeal.updated_at or the meal Tombstone). Timestamps from the future
+are clamped to now, so a fast client clock can't pin a slot.
+
+Everything is applied in one transaction through store_meals.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .archive import archive_cutoff
+from .db import upsert
+from .meals import store_meals
+from .models import Customer, DailyMeal, IdempotencyKey, MealClock, Tombstone
+
+MAX_REPLAY_OPS = 500
+APPLIED = 'applied'
+STALE = 'stale'
+
+
+def parse_op(op, now):
+    """(key, ts, [(customer_id, date, meal_type, is_taken), ...]) for one operation"""
+    key = op.get('key')
+    if not isinstance(key, str) or not key or len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        raise ValueError('key must be a non-empty string of at most 100 characters')
+
+    ts = parse_datetime(str(op.get('ts') or ''))
+    if ts is None:
+        raise ValueError('ts must be an ISO 8601 timestamp')
+    if timezone.is_naive(ts):
+        ts = timezone.make_aware(ts, dt_timezone.utc)
+    ts = min(ts, now)
+
+    customer_id = int(op.get('customer_id'))
+    day = parse_date(str(op.get('date') or ''))
+    if day is None:
+        raise ValueError('date must be YYYY-MM-DD')
+
+    # Values are read the way the mark_tiffin view reads them
+    to_bool = DailyMeal._meta.get_field('is_taken').to_python
+    kind = op.get('op')
+    if kind == 'mark_tiffin':
+        slot = op.get('slot')
+        if slot not in ('lunch', 'dinner'):
+            raise ValueError("slot must be 'lunch' or 'dinner'")
+        writes = [(customer_id, day, 'L' if slot == 'lunch' else 'D', to_bool(op.get('value', True)))]
+    elif kind == 'update_specific_date':
+        writes = [
+            (customer_id, day, 'L', to_bool(op.get('lunch', True))),
+            (customer_id, day, 'D', to_bool(op.get('dinner', True))),
+        ]
+    else:
+        raise ValueError("op must be 'mark_tiffin' or 'update_specific_date'")
+    return key, ts, writes
+
+
+def op_error(index, op, message):
+    return {
+        'index': index,
+        'key': op.get('key') if isinstance(op, dict) else None,
+        'status': 'error',
+        'error': message,
+    }
+
+
+def slot_clocks(user_id, slots):
+    """{(customer_id, date, meal_type): time of the slot's last write} for some slots"""
+    customer_ids = {slot[0] for slot in slots}
+    days = {slot[1] for slot in slots}
+
+    # Server times of the last online writes: a miss row, or a deletion
+    server = {}
+    rows = DailyMeal.objects.filter(customer_id__in=customer_ids, date__in=days).values_list(
+        'customer_id', 'date', 'meal_type', 'updated_at'
+    )
+    tombstones = Tombstone.objects.filter(
+        user_id=user_id, kind=Tombstone.MEAL, customer_id__in=customer_ids, date__in=days
+    ).values_list('customer_id', 'date', 'meal_type', 'deleted_at')
+    for customer_id, day, meal_type, moment in [*rows, *tombstones]:
+        slot = (customer_id, day, meal_type)
+        if slot in slots and (slot not in server or moment > server[slot]):
+            server[slot] = moment
+
+    clocks = dict(server)
+    replayed = MealClock.objects.filter(customer_id__in=customer_ids, date__in=days)
+    for clock in replayed:
+        slot = (clock.customer_id, clock.date, clock.meal_type)
+        # The replay wrote the slot's row or tombstone itself, just before
+        # its clock; anything newer is an online write that came later
+        if slot in slots and (slot not in server or clock.applied_at >= server[slot]):
+            clocks[slot] = clock.written_at
+    return clocks
+
+
+def replay(user_id, ops):
+    """Apply a batch of queued operations; returns (results, updated MealMonth rows).
+
+    ``results`` has one entry per operation, in order, with its ``status``:
+    'applied', 'stale' (every write lost to a newer one), 'duplicate'
+    (key already replayed, with its ``original_status``) or 'error'.
+    Must run inside a transaction.
+    """
+    now = timezone.now()
+    results = [None] * len(ops)
+    parsed = []
+    seen = set()
+    repeats = []
+    for index, op in enumerate(ops):
+        try:
+            if not isinstance(op, dict):
+                raise ValueError('Each operation must be an object')
+            key, ts, writes = parse_op(op, now)
+        except ValidationError as e:
+            results[index] = op_error(index, op, '; '.join(e.messages))
+            continue
+        except (TypeError, ValueError) as e:
+            results[index] = op_error(index, op, str(e))
+            continue
+        if key in seen:
+            repeats.append((index, key))
+            continue
+        seen.add(key)
+        parsed.append((index, key, ts, writes))
+
+    # Keys replayed by an earlier batch
+    done = dict(
+        IdempotencyKey.objects.filter(user_id=user_id, key__in=seen).values_list('key', 'status')
+    )
+    owned = set(
+        Customer.objects.filter(
+            user_id=user_id, id__in={w[0] for _, _, _, writes in parsed for w in writes}
+        ).values_list('id', flat=True)
+    )
+    archived_before = archive_cutoff(user_id, {w[1] for _, _, _, writes in parsed for w in writes})
+
+    # Last writer per slot within the batch; equal timestamps keep batch order
+    latest = {}
+    pending = []
+    for index, key, ts, writes in parsed:
+        if key in done:
+            results[index] = {'index': index, 'key': key, 'status': 'duplicate', 'original_status': done[key]}
+            continue
+        if writes[0][0] not in owned:
+            results[index] = op_error(index, ops[index], 'Customer not found')
+            continue
+        if archived_before is not None and writes[0][1] < archived_before:
+            results[index] = op_error(index, ops[index], 'Month is archived')
+            continue
+        pending.append((index, key))
+        for customer_id, day, meal_type, is_taken in writes:
+            slot = (customer_id, day, meal_type)
+            if slot not in latest or ts >= latest[slot][0]:
+                latest[slot] = (ts, index, is_taken)
+
+    clocks = slot_clocks(user_id, set(latest))
+    winners = {
+        slot: (ts, index, is_taken)
+        for slot, (ts, index, is_taken) in latest.items()
+        if slot not in clocks or ts > clocks[slot]
+    }
+
+    meal_months = []
+    if winners:
+        meal_months = store_meals(user_id, {slot: is_taken for slot, (_, _, is_taken) in winners.items()})
+        applied_at = timezone.now()
+        upsert(
+            MealClock,
+            [
+                MealClock(customer_id=slot[0], date=slot[1], meal_type=slot[2], written_at=ts, applied_at=applied_at)
+                for slot, (ts, _, _) in winners.items()
+            ],
+            unique_fields=['customer', 'date', 'meal_type'],
+            update_fields=['written_at', 'applied_at']
+        )
+
+    applied = {index for _, index, _ in winners.values()}
+    keys = []
+    for index, key in pending:
+        status = APPLIED if index in applied else STALE
+        results[index] = {'index': index, 'key': key, 'status': status}
+        keys.append(IdempotencyKey(user_id=user_id, key=key, status=status))
+    # A concurrent replay of the same keys fails here and rolls back
+    IdempotencyKey.objects.bulk_create(keys)
+
+    # Repeats within the batch report what their first occurrence did
+    first = {result['key']: result for result in results if result is not None}
+    for index, key in repeats:
+        original = first[key]
+        results[index] = {
+            'index': index,
+            'key': key,
+            'status': 'duplicate',
+            'original_status': original.get('original_status', original['status']),
+        }
+    return results, meal_months
+
+
+def purge_idempotency_keys():
+    """Delete keys older than the retention; returns how many went"""
+    cutoff = timezone.now() - timedelta(days=settings.OPS_KEY_RETENTION_DAYS)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
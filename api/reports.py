@@ -0,0 +1,328 @@
+# api/reports.py
+"""Monthly report engine.
+
+A report is built in two stages: ``collect_month_summary`` reads the
+customer's packed month (one query) into a compact summary dict, and a
+renderer turns that summary into PDF, CSV or JSON bytes. Rendered
+reports are cached by data version, so each (customer, month, format)
+is rendered once per change.
+"""
+import calendar
+import csv
+import hashlib
+import io
+import json
+from calendar import monthrange
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+# PDF imports
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle
+
+from .models import Invoice, MealMonth
+
+# Bump when a report layout changes so cached copies are not served
+REPORT_LAYOUT_VERSION = 4
+
+
+def load_meal_month(customer, year, month_num):
+    """Return the packed row for a month, or an empty unsaved one"""
+    month_start = date(year, month_num, 1)
+    return (
+        MealMonth.objects.filter(customer=customer, month=month_start).first()
+        or MealMonth(customer=customer, month=month_start)
+    )
+
+
+def load_invoice(customer, year, month_num):
+    """Return the stored invoice for a month, if billing has run for it"""
+    return Invoice.objects.filter(customer=customer, month=date(year, month_num, 1)).first()
+
+
+def data_updated_at(customer, meal_month, invoice=None):
+    """When a report's inputs last changed"""
+    stamps = [customer.updated_at, meal_month.updated_at, invoice.updated_at if invoice else None]
+    return max(stamp for stamp in stamps if stamp)
+
+
+def report_validators(customer, meal_month, output='pdf', invoice=None):
+    """Return (etag, last_modified) identifying one version of a monthly report.
+
+    A report only depends on the customer row, that month's meals and its
+    invoice, so their modification stamps plus the MealMonth change
+    counter are enough.
+    """
+    key = ':'.join([
+        str(REPORT_LAYOUT_VERSION),
+        output,
+        str(customer.pk),
+        meal_month.month.strftime('%Y-%m'),
+        customer.updated_at.isoformat(),
+        str(meal_month.version),
+        invoice.updated_at.isoformat() if invoice else '',
+    ])
+    etag = '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+    return etag, data_updated_at(customer, meal_month, invoice)
+
+
+# ----------------------------
+# Data collection
+# ----------------------------
+
+def collect_month_summary(customer, year, month_num, meal_month=None, invoice=None):
+    """Summarise one customer-month from its packed row and stored invoice"""
+    # Calculate date range for the selected month
+    _, last_day = monthrange(year, month_num)
+    start_date = date(year, month_num, 1)
+    end_date = date(year, month_num, last_day)
+
+    # If customer joined after month start, adjust start date
+    if customer.joining_date > start_date:
+        start_date = customer.joining_date
+
+    # The whole month is a single packed row
+    if meal_month is None:
+        meal_month = load_meal_month(customer, year, month_num)
+
+    active_days = max(0, (end_date - start_date).days + 1)
+
+    lunches_missed = meal_month.missed_count('L', start_date.day, end_date.day) if active_days else 0
+    dinners_missed = meal_month.missed_count('D', start_date.day, end_date.day) if active_days else 0
+
+    lunches_taken = active_days - lunches_missed
+    dinners_taken = active_days - dinners_missed
+    total_meals_taken = lunches_taken + dinners_taken
+    total_possible_meals = active_days * 2
+
+    completion_rate = total_meals_taken / total_possible_meals * 100 if total_possible_meals > 0 else 0
+
+    # A billed month shows what was invoiced; open months a provisional amount
+    if invoice is not None:
+        amount_payable = invoice.amount_payable
+    else:
+        amount_payable = Invoice.prorate(customer.fee, total_meals_taken, total_possible_meals)
+
+    days = [
+        (
+            date(year, month_num, day),
+            meal_month.is_taken(date(year, month_num, day), 'L'),
+            meal_month.is_taken(date(year, month_num, day), 'D'),
+        )
+        for day in range(start_date.day, end_date.day + 1)
+    ] if active_days else []
+
+    return {
+        'customer': {
+            'id': customer.id,
+            'name': customer.name,
+            'joining_date': customer.joining_date,
+            'fee': float(customer.fee),
+        },
+        'year': year,
+        'month': month_num,
+        'start_date': start_date,
+        'end_date': end_date,
+        'active_days': active_days,
+        'lunches_taken': lunches_taken,
+        'dinners_taken': dinners_taken,
+        'lunches_missed': lunches_missed,
+        'dinners_missed': dinners_missed,
+        'total_meals_taken': total_meals_taken,
+        'total_possible_meals': total_possible_meals,
+        'completion_rate': completion_rate,
+        'amount_payable': amount_payable,
+        'invoiced': invoice is not None,
+        'updated_at': data_updated_at(customer, meal_month, invoice),
+        'days': days,
+    }
+
+
+# ----------------------------
+# Renderers
+# ----------------------------
+
+def render_pdf(summary):
+    """Render a month summary as the printable ReportLab report"""
+    customer = summary['customer']
+    active_days = summary['active_days']
+
+    # Create PDF in memory
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+
+    # PDF content
+    y_position = 750
+
+    # Title
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(200, y_position, "Tiffin Service Monthly Report")
+    y_position -= 30
+
+    # Customer Information
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(50, y_position, f"Customer: {customer['name']}")
+    y_position -= 20
+    pdf.setFont("Helvetica", 12)
+    pdf.drawString(50, y_position, f"Month: {calendar.month_name[summary['month']]} {summary['year']}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Joining Date: {customer['joining_date'].strftime('%d %B %Y')}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Monthly Fee: ₹{customer['fee']:.2f}")
+    y_position -= 40
+
+    # Summary Statistics
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(50, y_position, "Monthly Summary")
+    y_position -= 30
+
+    pdf.setFont("Helvetica", 12)
+    pdf.drawString(50, y_position, f"Active Days in Month: {active_days}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Lunches Taken: {summary['lunches_taken']} / {active_days}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Dinners Taken: {summary['dinners_taken']} / {active_days}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Total Meals Taken: {summary['total_meals_taken']} / {summary['total_possible_meals']}")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Meal Completion Rate: {summary['completion_rate']:.1f}%")
+    y_position -= 20
+    pdf.drawString(50, y_position, f"Amount Payable: ₹{summary['amount_payable']}")
+    y_position -= 40
+
+    # Daily Meal Table
+    pdf.setFont("Helvetica-Bold", 14)
+    pdf.drawString(50, y_position, "Daily Meal Status")
+    y_position -= 30
+
+    table_data = [['Date', 'Day', 'Lunch', 'Dinner', 'Status']]
+    for day, lunch, dinner in summary['days']:
+        table_data.append([
+            day.strftime('%d-%m-%Y'),
+            calendar.day_name[day.weekday()][:3],
+            "✓" if lunch else "✗",
+            "✓" if dinner else "✗",
+            "Present" if lunch or dinner else "Absent"
+        ])
+
+    # Create and style table
+    table = Table(table_data, colWidths=[80, 50, 50, 50, 60])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    # Draw table
+    table.wrapOn(pdf, 400, 200)
+    table.drawOn(pdf, 50, y_position - (len(table_data) * 20) - 20)
+
+    # Footer
+    pdf.setFont("Helvetica-Oblique", 10)
+    # Not the render date: cached copies are served until the data changes
+    pdf.drawString(50, 50, f"Data as of {timezone.localtime(summary['updated_at']).strftime('%d %B %Y, %H:%M')}")
+    pdf.drawString(50, 35, "Signature: ________________________")
+
+    pdf.showPage()
+    pdf.save()
+
+    pdf_data = buffer.getvalue()
+    buffer.close()
+    return pdf_data
+
+
+def render_csv(summary):
+    """Render a month summary as one CSV row per day"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['date', 'day', 'lunch', 'dinner'])
+    for day, lunch, dinner in summary['days']:
+        writer.writerow([
+            day.isoformat(),
+            calendar.day_name[day.weekday()][:3],
+            int(lunch),
+            int(dinner)
+        ])
+    return buffer.getvalue().encode()
+
+
+def render_json(summary):
+    """Render a month summary as compact JSON for the mobile app"""
+    customer = summary['customer']
+    payload = {
+        'success': True,
+        'customer': {
+            **customer,
+            'joining_date': customer['joining_date'].isoformat(),
+        },
+        'month': f"{summary['year']}-{summary['month']:02d}",
+        'start_date': summary['start_date'].isoformat(),
+        'end_date': summary['end_date'].isoformat(),
+        'statistics': {
+            'active_days': summary['active_days'],
+            'lunches_taken': summary['lunches_taken'],
+            'dinners_taken': summary['dinners_taken'],
+            'lunches_missed': summary['lunches_missed'],
+            'dinners_missed': summary['dinners_missed'],
+            'total_meals_taken': summary['total_meals_taken'],
+            'total_possible_meals': summary['total_possible_meals'],
+            'completion_rate': round(summary['completion_rate'], 2),
+            'amount_payable': float(summary['amount_payable']),
+            'invoiced': summary['invoiced'],
+        },
+        # One "LD" pair per day from start_date: 1 = taken, 0 = missed
+        'days': ''.join(f"{int(lunch)}{int(dinner)}" for _, lunch, dinner in summary['days']),
+    }
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+# output name -> (renderer, content type, file extension)
+RENDERERS = {
+    'pdf': (render_pdf, 'application/pdf', 'pdf'),
+    'csv': (render_csv, 'text/csv', 'csv'),
+    'json': (render_json, 'application/json', 'json'),
+}
+
+
+def render_report(customer, year, month_num, output='pdf', meal_month=None, invoice=None):
+    """Collect a month summary and render it in the requested output format"""
+    renderer = RENDERERS[output][0]
+    return renderer(collect_month_summary(customer, year, month_num, meal_month, invoice))
+
+
+def cached_report(customer, year, month_num, output='pdf', meal_month=None, invoice=None):
+    """Return report bytes for a month, rendering only on a cache miss.
+
+    Callers that already loaded the month's inputs pass both ``meal_month``
+    and ``invoice``; otherwise both are loaded here.
+    """
+    if meal_month is None:
+        meal_month = load_meal_month(customer, year, month_num)
+        invoice = load_invoice(customer, year, month_num)
+    etag, _ = report_validators(customer, meal_month, output, invoice)
+
+    cache = caches['reports']
+    cache_key = f"report:{etag[1:-1]}"
+    data = cache.get(cache_key)
+    if data is None:
+        data = render_report(customer, year, month_num, output, meal_month, invoice)
+        if len(data) <= report_cache_item_limit():
+            cache.set(cache_key, data)
+    return data
+
+
+def report_cache_item_limit():
+    """Largest report worth caching: a full cache of these fits the byte budget."""
+    return settings.REPORT_CACHE_MAX_BYTES // settings.REPORT_CACHE_MAX_ENTRIES
@@ -0,0 +1,113 @@
+# api/sync.py
+"""Delta sync for the mobile client.
+
+A sync token is a signed timestamp. ``changes_since`` returns every
+customer and meal row of an owner written after it, plus the tombstones
+of rows deleted after it, and a new token. Clients apply deletions first,
+then upserts; a row deleted and re-created between two syncs then ends up
+present, as it is on the server.
+
+Each new token is set ``SYNC_OVERLAP_SECONDS`` in the past, so a write
+whose transaction commits after a sync started is still picked up by the
+next sync. The overlap means clients may see a row twice, which upserts
+make harmless. Tokens older than the tombstone retention can't be served
+incrementally and get a full snapshot instead. Full snapshots include
+the misses moved to the meal archive; archiving itself changes nothing
+a client can see, so it writes no tombstones.
+"""
+from datetime import datetime, timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .archive import archived_meal_rows
+from .models import Customer, DailyMeal, Tombstone
+
+TOKEN_SALT = 'api.sync'
+
+
+def make_token(moment):
+    return signing.dumps(moment.isoformat(), salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """Return the timestamp inside a sync token; raise ValueError if it's not ours"""
+    try:
+        return datetime.fromisoformat(signing.loads(token, salt=TOKEN_SALT))
+    except (signing.BadSignature, TypeError):
+        raise ValueError('Invalid sync token')
+
+
+def record_meal_deletion(customer, day, meal_type):
+    record_meal_deletions(customer.user_id, [(customer.pk, day, meal_type)])
+
+
+def record_meal_deletions(user_id, keys):
+    """Tombstone many deleted (customer_id, date, meal_type) rows of one owner"""
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, kind=Tombstone.MEAL, customer_id=customer_id, date=day, meal_type=meal_type)
+        for customer_id, day, meal_type in keys
+    ])
+
+
+def record_customer_deletion(customer):
+    # The customer's meals go with it, so one tombstone covers them all
+    Tombstone.objects.create(user_id=customer.user_id, kind=Tombstone.CUSTOMER, customer_id=customer.pk)
+
+
+def purge_tombstones():
+    """Delete tombstones older than the retention; returns how many went"""
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
+
+
+def changes_since(user_id, token=None):
+    """Everything that changed for one owner since ``token`` (all data if None)"""
+    now = timezone.now()
+    since = read_token(token) if token else None
+
+    # Older tombstones may have been purged, so only a full snapshot is safe
+    full = since is None or since < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+    if full:
+        since = None
+
+    customers = Customer.objects.filter(user_id=user_id)
+    meals = DailyMeal.objects.filter(customer__user_id=user_id)
+    if since is not None:
+        customers = customers.filter(updated_at__gt=since)
+        meals = meals.filter(updated_at__gt=since)
+
+    deleted_customers = []
+    deleted_meals = []
+    if since is not None:
+        for tombstone in Tombstone.objects.filter(user_id=user_id, deleted_at__gt=since):
+            if tombstone.kind == Tombstone.CUSTOMER:
+                deleted_customers.append(tombstone.customer_id)
+            else:
+                deleted_meals.append({
+                    'customer_id': tombstone.customer_id,
+                    'date': tombstone.date.isoformat(),
+                    'meal_type': tombstone.meal_type,
+                })
+
+    meals = meals.order_by('customer_id', 'date', 'meal_type').values_list(
+        'customer_id', 'date', 'meal_type', 'is_taken'
+    )
+    if full:
+        customer_ids = set(customers.values_list('id', flat=True))
+        meals = chain(
+            (row for row in archived_meal_rows(user_id) if row[0] in customer_ids),
+            meals
+        )
+
+    return {
+        'full': full,
+        'token': make_token(now - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)),
+        'customers': customers.order_by('id'),
+        'meals': meals,
+        'deleted_customers': deleted_customers,
+        'deleted_meals': deleted_meals,
+    }
@@ -1,3 +1,1036 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import runpy
+import sqlite3
+import tempfile
+import zlib
+from contextlib import ExitStack
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import jobs, reports
+from .authentication import user_cache
+from .billing import run_billing
+from .db import apply_sqlite_pragmas
+from .meals import store_meals
+from .middleware import REDACTED, JournalWriter, redact, redact_query
+from .models import Customer, DailyMeal, Invoice, KitchenDay, MealMonth, ReportJob
+from .throttling import hashing_slot
+
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+
+def scratch_caches(directory):
+    """settings.CACHES with the shared caches as file caches under ``directory``"""
+    return {
+        **settings.CACHES,
+        **{
+            alias: {**settings.CACHES[alias], 'BACKEND': FILE_CACHE, 'LOCATION': os.path.join(directory, alias)}
+            for alias in ('api', 'throttle', 'throttle_slots', 'reports')
+        },
+    }
+
+
+# Write paths invalidate caches in on_commit hooks, so tests run against
+# real commits; a fast hasher keeps user creation cheap
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class APITestCase(TransactionTestCase):
+    def setUp(self):
+        # Never touch the caches and archives of a real deployment
+        scratch = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(CACHES=scratch_caches(scratch), MEDIA_ROOT=scratch))
+        self.today = date.today()
+        self.owner = User.objects.create_user('owner', password='owner-password')
+        self.api = APIClient()
+        self.api.force_authenticate(self.owner)
+        self.customer = Customer.objects.create(
+            user=self.owner,
+            name='Asha',
+            fee=Decimal('3000.00'),
+            joining_date=self.today - timedelta(days=60)
+        )
+
+    def post(self, url, data):
+        return self.api.post(url, data, format='json')
+
+    def mark(self, day, slot, value=False, customer=None):
+        response = self.post('/api/mark_tiffin/', {
+            'customer_id': (customer or self.customer).id, 'slot': slot, 'value': value, 'date': day.isoformat()
+        })
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def last_month(self, day):
+        return (self.today.replace(day=1) - timedelta(days=1)).replace(day=day)
+
+
+class CustomerStatsTests(APITestCase):
+    def stats(self):
+        response = self.api.get(f'/api/customer/{self.customer.id}/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_absence_marked_ahead_does_not_count_yet(self):
+        before = self.stats()
+        tomorrow = self.today + timedelta(days=1)
+        self.post('/api/update_specific_date/', {
+            'customer_id': self.customer.id, 'date': tomorrow.isoformat(), 'lunch': False, 'dinner': False
+        })
+
+        after = self.stats()
+        self.assertEqual(after['lunches_taken'], before['lunches_taken'])
+        self.assertEqual(after['lunches_missed'], 0)
+        self.assertEqual(after['amount_payable_to_date'], before['amount_payable_to_date'])
+        possible = after['total_lunch_possible'] + after['total_dinner_possible']
+        self.assertEqual(
+            after['amount_payable_to_date'],
+            float(Invoice.prorate(self.customer.fee, possible, possible))
+        )
+
+    def test_absence_today_counts(self):
+        self.post('/api/mark_tiffin/', {
+            'customer_id': self.customer.id, 'slot': 'lunch', 'value': False, 'date': self.today.isoformat()
+        })
+
+        stats = self.stats()
+        self.assertEqual(stats['lunches_missed'], 1)
+        self.assertEqual(stats['lunches_taken'], stats['total_lunch_possible'] - 1)
+        self.assertEqual(stats['dinners_missed'], 0)
+
+    def test_stats_are_served_from_the_customer_row(self):
+        self.stats()
+        Customer.objects.filter(pk=self.customer.pk).update(lunches_missed_this_month=4)
+        caches['api'].clear()
+        self.assertEqual(self.stats()['lunches_missed'], 4)
+
+    def test_rollover_counts_absences_marked_ahead(self):
+        tomorrow = self.today + timedelta(days=1)
+
+        class Tomorrow(date):
+            @classmethod
+            def today(cls):
+                return tomorrow
+
+        self.post('/api/update_specific_date/', {
+            'customer_id': self.customer.id, 'date': tomorrow.isoformat(), 'lunch': False, 'dinner': True
+        })
+        with mock.patch('api.models.date', Tomorrow):
+            self.assertEqual(Customer.roll_over_counters(), 1)
+            self.customer.refresh_from_db()
+            self.assertEqual((self.customer.counted_through, self.customer.lunches_missed_this_month), (tomorrow, 1))
+
+            # Unmarking it on the day takes the counter back to zero, not below
+            with transaction.atomic():
+                self.customer.apply_missed_delta(tomorrow, lunch=MealMonth.record(self.customer, tomorrow, 'L', True))
+            self.customer.refresh_from_db()
+            self.assertEqual(self.customer.lunches_missed_this_month, 0)
+            self.assertEqual(Customer.roll_over_counters(), 0)
+
+
+class ReportTests(APITestCase):
+    def pdf(self, **headers):
+        return self.api.get(f'/api/customer/{self.customer.id}/pdf/?month={self.today:%Y-%m}', **headers)
+
+    def test_unchanged_report_is_not_modified(self):
+        first = self.pdf()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.pdf(HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.post('/api/mark_tiffin/', {
+            'customer_id': self.customer.id, 'slot': 'dinner', 'value': False, 'date': self.today.isoformat()
+        })
+        changed = self.pdf(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_cached_pdf_is_stamped_with_the_data_time(self):
+        # The page stream is ASCII85 over Flate
+        content = self.pdf().content
+        stream = content[content.index(b'stream\n') + 7:content.index(b'~>endstream')]
+        text = zlib.decompress(base64.a85decode(stream))
+
+        self.customer.refresh_from_db()
+        stamp = timezone.localtime(self.customer.updated_at).strftime('%d %B %Y, %H:%M')
+        self.assertIn(f'Data as of {stamp}'.encode(), text)
+        self.assertNotIn(b'Report generated on', text)
+
+    def test_reports_over_their_byte_share_are_not_cached(self):
+        with mock.patch('api.reports.render_report', wraps=reports.render_report) as render:
+            size = len(self.pdf().content)
+            self.pdf()
+            self.assertEqual(render.call_count, 1)
+
+            self.mark(self.today, 'lunch')
+            with self.settings(REPORT_CACHE_MAX_BYTES=size // 2 * settings.REPORT_CACHE_MAX_ENTRIES):
+                self.pdf()
+                self.pdf()
+            self.assertEqual(render.call_count, 3)
+
+
+class MealHistoryTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.post('/api/mark_tiffin/', {
+            'customer_id': self.customer.id, 'slot': 'lunch', 'value': False,
+            'date': (self.today - timedelta(days=2)).isoformat()
+        })
+        self.url = f'/api/customer/{self.customer.id}/meal-history/'
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_stream_by_query_and_by_accept_header(self):
+        by_query = self.lines(self.api.get(self.url + '?stream=1'))
+        by_header = self.lines(self.api.get(self.url, HTTP_ACCEPT='application/x-ndjson'))
+        self.assertEqual(by_query, by_header)
+        # Statistics line, then one line per day from joining to today, newest first
+        self.assertEqual(len(by_query), 1 + 61)
+        missed = [day for day in by_query[1:] if not day['lunch']]
+        self.assertEqual([day['date'] for day in missed], [(self.today - timedelta(days=2)).isoformat()])
+
+    def test_pages_follow_the_cursor(self):
+        dates = []
+        cursor = ''
+        while True:
+            page = self.api.get(f'{self.url}?limit=25{cursor}').json()
+            dates += [day['date'] for day in page['daily_meals']]
+            if not page['pagination']['next_cursor']:
+                break
+            cursor = f"&cursor={page['pagination']['next_cursor']}"
+        self.assertEqual(len(dates), 61)
+        self.assertEqual(dates, sorted(dates, reverse=True))
+
+
+class JWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        self.token = APIClient()
+        self.token.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.owner).access_token}')
+
+    def test_deactivation_saved_elsewhere_is_seen_after_the_ttl(self):
+        self.assertEqual(self.token.get('/api/hello/').status_code, 200)
+
+        # Another process deactivates the user without signals reaching this one
+        User.objects.filter(pk=self.owner.pk).update(is_active=False)
+        user_cache.clear()  # the entry's TTL ran out
+
+        self.assertEqual(self.token.get('/api/hello/').status_code, 401)
+        self.assertEqual(self.token.post('/api/add_customer/', {'name': 'x', 'fee': 1}).status_code, 401)
+
+    def test_deactivation_in_this_process_is_immediate(self):
+        self.assertEqual(self.token.get('/api/hello/').status_code, 200)
+        self.owner.is_active = False
+        self.owner.save()
+        self.assertEqual(self.token.get('/api/hello/').status_code, 401)
+
+
+class OwnerCacheTests(APITestCase):
+    def hello(self):
+        response = self.api.get('/api/hello/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_write_invalidates_cached_reads(self):
+        self.assertEqual(len(self.hello()['customers']), 1)
+        self.post('/api/add_customer/', {'name': 'Ravi', 'fee': '2500'})
+        self.assertEqual(len(self.hello()['customers']), 2)
+
+    def test_process_local_versions_are_refused_with_several_workers(self):
+        settings_file = Path(settings.BASE_DIR) / 'backend' / 'settings.py'
+        with mock.patch.dict(os.environ, {'API_CACHE_BACKEND': 'locmem', 'WEB_CONCURRENCY': '4'}):
+            with self.assertRaises(ImproperlyConfigured):
+                runpy.run_path(str(settings_file))
+
+    def test_single_worker_defaults_to_the_local_cache(self):
+        settings_file = Path(settings.BASE_DIR) / 'backend' / 'settings.py'
+        environ = {k: v for k, v in os.environ.items() if k not in ('API_CACHE_BACKEND', 'WEB_CONCURRENCY')}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            caches_setting = runpy.run_path(str(settings_file))['CACHES']
+        self.assertEqual(caches_setting['api']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    })
+    def test_single_worker_on_the_local_cache_answers_304(self):
+        url = f'/api/customer/{self.customer.id}/meal-history/'
+        first = self.api.get(url)
+        self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+
+class MealMonthTests(APITestCase):
+    def test_sync_and_async_day_walks_agree(self):
+        start = self.today - timedelta(days=50)
+        for offset, slot in ((1, 'lunch'), (20, 'dinner'), (45, 'lunch'), (45, 'dinner')):
+            self.post('/api/mark_tiffin/', {
+                'customer_id': self.customer.id, 'slot': slot, 'value': False,
+                'date': (self.today - timedelta(days=offset)).isoformat()
+            })
+
+        async def walk():
+            return [entry async for entry in MealMonth.aiter_days(self.customer, start, self.today)]
+
+        days = list(MealMonth.iter_days(self.customer, start, self.today))
+        self.assertEqual(days, async_to_sync(walk)())
+        self.assertEqual(len(days), 51)
+        self.assertEqual(days[45], (self.today - timedelta(days=45), False, False))
+        self.assertEqual(days[20], (self.today - timedelta(days=20), True, False))
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/customer/{self.customer.id}/meal-history/'
+
+    def test_revalidation_after_a_write_returns_the_new_data(self):
+        first = self.api.get(self.url)
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.post('/api/mark_tiffin/', {
+            'customer_id': self.customer.id, 'slot': 'lunch', 'value': False, 'date': self.today.isoformat()
+        })
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    @override_settings(WEB_CONCURRENCY=2, CACHES={
+        **settings.CACHES,
+        'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    })
+    def test_process_local_versions_never_answer_304(self):
+        first = self.api.get(self.url)
+        # A write through another worker: this process's owner version never moves
+        MealMonth.record(self.customer, self.today, 'L', False)
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=first.get('ETag', '"none"'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['daily_meals'][0]['lunch'])
+
+
+class KitchenCounterTests(APITestCase):
+    def test_first_rows_created_concurrently_are_added_to(self):
+        day = self.today + timedelta(days=1)
+        other = Customer.objects.create(user=self.owner, name='Ravi', fee=Decimal('2500.00'))
+        insert = KitchenDay.objects.bulk_create
+        month_insert = MealMonth.objects.bulk_create
+
+        # Another transaction commits the day's first miss between this
+        # one's read and its insert
+        def racing_insert(rows, **kwargs):
+            KitchenDay.objects.create(user=self.owner, date=day, lunches_missed=1)
+            return insert(rows, **kwargs)
+
+        def racing_month_insert(rows, **kwargs):
+            MealMonth.objects.create(customer=self.customer, month=day.replace(day=1), missed=MealMonth.bit(day, 'D'))
+            return month_insert(rows, **kwargs)
+
+        with mock.patch.object(KitchenDay.objects, 'bulk_create', racing_insert), \
+                mock.patch.object(MealMonth.objects, 'bulk_create', racing_month_insert):
+            with transaction.atomic():
+                store_meals(self.owner.id, {
+                    (self.customer.id, day, 'L'): False,
+                    (other.id, day, 'L'): False,
+                })
+
+        counters = KitchenDay.objects.get(user=self.owner, date=day)
+        self.assertEqual((counters.lunches_missed, counters.dinners_missed), (3, 0))
+        month = MealMonth.objects.get(customer=self.customer, month=day.replace(day=1))
+        self.assertFalse(month.is_taken(day, 'D'))
+        self.assertFalse(month.is_taken(day, 'L'))
+
+
+class DashboardTests(APITestCase):
+    def hello(self, day):
+        caches['api'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(f'/api/hello/?date={day.isoformat()}')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_one_query_whatever_the_number_of_customers(self):
+        day = self.today - timedelta(days=3)
+        self.mark(day, 'lunch')
+        payload, few = self.hello(day)
+        self.assertEqual(payload, {
+            'customers': [{'id': self.customer.id, 'name': 'Asha', 'lunch': False, 'dinner': True}],
+            'date': day.isoformat(),
+        })
+
+        Customer.objects.bulk_create([
+            Customer(user=self.owner, name=f'Customer {n}', fee=Decimal('2000.00')) for n in range(5)
+        ])
+        payload, many = self.hello(day)
+        self.assertEqual(len(payload['customers']), 6)
+        self.assertEqual(many, few)
+
+
+class MealMonthBitmapTests(APITestCase):
+    def test_lunch_and_dinner_bits_count_per_day_range(self):
+        month = self.today.replace(day=1)
+        row = MealMonth(customer=self.customer, month=month)
+        for day, meal_type in ((1, 'L'), (3, 'L'), (3, 'D'), (28, 'D')):
+            row.missed |= MealMonth.bit(month.replace(day=day), meal_type)
+
+        self.assertFalse(row.is_taken(month.replace(day=3), 'L'))
+        self.assertTrue(row.is_taken(month.replace(day=2), 'L'))
+        self.assertEqual(row.missed_count('L', 1, 31), 2)
+        self.assertEqual(row.missed_count('L', 2, 31), 1)
+        self.assertEqual(row.missed_count('D', 1, 27), 1)
+        self.assertEqual(row.missed_count('D', 1, 31), 2)
+
+    def test_writes_keep_the_bitmap_in_step_with_the_misses(self):
+        day = self.today - timedelta(days=4)
+        self.mark(day, 'dinner')
+        row = MealMonth.objects.get(customer=self.customer, month=day.replace(day=1))
+        self.assertFalse(row.is_taken(day, 'D'))
+        self.assertTrue(row.is_taken(day, 'L'))
+
+        self.mark(day, 'dinner', True)
+        row.refresh_from_db()
+        self.assertEqual(row.missed, 0)
+
+
+class BulkMarkingTests(APITestCase):
+    def test_valid_entries_apply_and_bad_ones_are_reported(self):
+        other_owner = User.objects.create_user('other')
+        stranger = Customer.objects.create(user=other_owner, name='Stranger', fee=Decimal('1000.00'))
+        ravi = Customer.objects.create(
+            user=self.owner, name='Ravi', fee=Decimal('2500.00'), joining_date=self.customer.joining_date
+        )
+        day = self.today - timedelta(days=1)
+
+        response = self.post('/api/mark_tiffin/bulk/', {'entries': [
+            {'customer_id': self.customer.id, 'slot': 'lunch', 'value': False, 'date': day.isoformat()},
+            {'customer_id': ravi.id, 'slot': 'dinner', 'value': False, 'date': day.isoformat()},
+            {'customer_id': ravi.id, 'slot': 'dinner', 'value': True, 'date': day.isoformat()},
+            {'customer_id': ravi.id, 'slot': 'supper', 'value': False},
+            {'customer_id': stranger.id, 'slot': 'lunch', 'value': False},
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertFalse(payload['success'])
+        self.assertEqual(payload['updated'], 2)
+        self.assertEqual([result['success'] for result in payload['results']], [True, True, True, False, False])
+        self.assertEqual(payload['results'][4]['error'], 'Customer not found')
+        # The later entry for Ravi's dinner won
+        self.assertEqual(
+            list(DailyMeal.objects.values_list('customer_id', 'date', 'meal_type')),
+            [(self.customer.id, day, 'L')]
+        )
+        self.assertFalse(DailyMeal.objects.filter(customer=stranger).exists())
+
+    def test_empty_batch_is_refused(self):
+        self.assertEqual(self.post('/api/mark_tiffin/bulk/', {'entries': []}).status_code, 400)
+
+    def test_backends_without_conflict_targets_update_existing_rows(self):
+        # MySQL can't name the unique columns of an upsert
+        day = self.today - timedelta(days=1)
+        DailyMeal.objects.create(customer=self.customer, date=day, meal_type='L', is_taken=True)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            response = self.post('/api/mark_tiffin/bulk/', {'entries': [
+                {'customer_id': self.customer.id, 'slot': slot, 'value': False, 'date': day.isoformat()}
+                for slot in ('lunch', 'dinner')
+            ]})
+
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(
+            sorted(DailyMeal.objects.values_list('meal_type', 'is_taken')), [('D', False), ('L', False)]
+        )
+        row = MealMonth.objects.get(customer=self.customer, month=day.replace(day=1))
+        self.assertEqual(row.missed, MealMonth.bit(day, 'L') | MealMonth.bit(day, 'D'))
+
+
+class ReportJobTests(APITestCase):
+    def test_queued_report_is_pending_until_a_worker_runs_it(self):
+        submitted = self.post(f'/api/customer/{self.customer.id}/report-jobs/', {'month': f'{self.today:%Y-%m}'})
+        self.assertEqual(submitted.status_code, 202)
+        job_id = submitted.json()['job_id']
+
+        self.assertEqual(self.api.get(f'/api/report-jobs/{job_id}/').json()['status'], ReportJob.PENDING)
+        self.assertEqual(self.api.get(f'/api/report-jobs/{job_id}/result/').status_code, 409)
+
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+        self.assertEqual(self.api.get(f'/api/report-jobs/{job_id}/').json()['status'], ReportJob.DONE)
+        result = self.api.get(f'/api/report-jobs/{job_id}/result/')
+        self.assertEqual(result.status_code, 200)
+        self.assertTrue(result.content.startswith(b'%PDF'))
+
+    def test_bad_month_is_refused(self):
+        response = self.post(f'/api/customer/{self.customer.id}/report-jobs/', {'month': 'October'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ReportJob.objects.exists())
+
+
+class ReportOutputTests(APITestCase):
+    def report(self, output):
+        response = self.api.get(f'/api/customer/{self.customer.id}/pdf/?month={self.today:%Y-%m}&output={output}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_csv_and_json_describe_the_same_days(self):
+        self.mark(self.today, 'lunch')
+        csv_rows = self.report('csv').content.decode().splitlines()
+        payload = json.loads(self.report('json').content)
+
+        statistics = payload['statistics']
+        self.assertEqual(csv_rows[0], 'date,day,lunch,dinner')
+        self.assertEqual(len(csv_rows) - 1, statistics['active_days'])
+        self.assertEqual(len(payload['days']), 2 * statistics['active_days'])
+        self.assertEqual(statistics['lunches_missed'], 1)
+        offset = (self.today - date.fromisoformat(payload['start_date'])).days
+        self.assertEqual(payload['days'][2 * offset:2 * offset + 2], '01')
+        self.assertEqual(csv_rows[1 + offset], f"{self.today.isoformat()},{self.today:%a},0,1")
+
+    def test_unknown_output_is_refused(self):
+        response = self.api.get(f'/api/customer/{self.customer.id}/pdf/?output=xlsx')
+        self.assertEqual(response.status_code, 400)
+
+
+class BillingTests(APITestCase):
+    def test_month_end_run_prorates_from_joining_day(self):
+        first = self.last_month(1)
+        month_end = self.today.replace(day=1) - timedelta(days=1)
+        Customer.objects.filter(pk=self.customer.pk).update(joining_date=self.last_month(11))
+        with transaction.atomic():
+            store_meals(self.owner.id, {
+                (self.customer.id, self.last_month(3), 'L'): False,  # before joining
+                (self.customer.id, self.last_month(12), 'L'): False,
+                (self.customer.id, self.last_month(12), 'D'): False,
+            })
+
+        self.assertEqual(run_billing(first.year, first.month), 1)
+        invoice = Invoice.objects.get(customer=self.customer, month=first)
+        active_days = month_end.day - 10
+        self.assertEqual(invoice.active_days, active_days)
+        self.assertEqual((invoice.lunches_taken, invoice.dinners_taken), (active_days - 1, active_days - 1))
+        self.assertEqual(
+            invoice.amount_payable, Invoice.prorate(Decimal('3000.00'), 2 * active_days - 2, 2 * active_days)
+        )
+
+        # A rerun rewrites the invoice instead of adding another
+        self.customer.fee = Decimal('3100.00')
+        self.customer.save()
+        run_billing(first.year, first.month)
+        self.assertEqual(Invoice.objects.get(customer=self.customer, month=first).fee, Decimal('3100.00'))
+        self.assertEqual(Invoice.objects.count(), 1)
+
+    def test_only_closed_months_are_billed(self):
+        for month in (self.today, self.today.replace(day=28) + timedelta(days=5)):
+            with self.assertRaises(ValueError):
+                run_billing(month.year, month.month)
+            with self.assertRaises(CommandError):
+                call_command('run_billing', month=f'{month:%Y-%m}', stdout=io.StringIO())
+        self.assertFalse(Invoice.objects.exists())
+
+    def test_backends_without_conflict_targets_rewrite_invoices(self):
+        first = self.last_month(1)
+        run_billing(first.year, first.month)
+        self.customer.fee = Decimal('3100.00')
+        self.customer.save()
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            run_billing(first.year, first.month)
+        self.assertEqual(list(Invoice.objects.values_list('fee', flat=True)), [Decimal('3100.00')])
+
+    def test_prorate_rounds_to_paise(self):
+        self.assertEqual(Invoice.prorate(Decimal('100.00'), 1, 3), Decimal('33.33'))
+        self.assertEqual(Invoice.prorate(Decimal('100.00'), 2, 3), Decimal('66.67'))
+
+
+class DatabaseTuningTests(TransactionTestCase):
+    def test_tuned_pragmas_apply_to_a_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = sqlite3.connect(os.path.join(directory, 'tuned.sqlite3'))
+            try:
+                cursor = database.cursor()
+                apply_sqlite_pragmas(cursor, settings.SQLITE_TUNED_PRAGMAS)
+                self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0].lower(), 'wal')
+                self.assertEqual(
+                    cursor.execute('PRAGMA cache_size').fetchone()[0], settings.SQLITE_TUNED_PRAGMAS['cache_size']
+                )
+                self.assertEqual(
+                    cursor.execute('PRAGMA busy_timeout').fetchone()[0], settings.SQLITE_TUNED_PRAGMAS['busy_timeout']
+                )
+            finally:
+                database.close()
+
+
+class RequestJournalTests(TransactionTestCase):
+    def test_credentials_are_redacted(self):
+        self.assertEqual(
+            redact({'username': 'asha', 'Password': 'x', 'nested': [{'refresh': 'y', 'keep': 1}]}),
+            {'username': 'asha', 'Password': REDACTED, 'nested': [{'refresh': REDACTED, 'keep': 1}]}
+        )
+        self.assertEqual(redact_query('month=2026-10&token=abc'), 'month=2026-10&token=%5Bredacted%5D')
+
+    def test_writer_appends_one_line_per_record(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'requests.jsonl')
+            writer = JournalWriter(path, flush_interval=0.01)
+            for status in (200, 304):
+                writer.write({'path': '/api/hello/', 'status': status})
+            writer.close()
+
+            with open(path, encoding='utf-8') as journal:
+                records = [json.loads(line) for line in journal]
+        self.assertEqual([record['status'] for record in records], [200, 304])
+        self.assertEqual(writer.dropped, 0)
+
+
+class BenchmarkTests(APITestCase):
+    def test_seeded_tenants_are_consistent_and_benchmarkable(self):
+        call_command(
+            'seed_benchmark_data', owners=2, customers=3, days=40, prefix='bench', seed=1, stdout=io.StringIO()
+        )
+        owner = User.objects.get(username='bench-0')
+        self.assertEqual(Customer.objects.filter(user__username__startswith='bench-').count(), 6)
+        self.assertFalse(DailyMeal.objects.filter(is_taken=True).exists())
+        for customer in Customer.objects.filter(user=owner):
+            misses = set(customer.meals.values_list('date', 'meal_type'))
+            walked = {
+                (day, meal_type)
+                for day, lunch, dinner in MealMonth.iter_days(customer, customer.joining_date, self.today)
+                for meal_type, taken in (('L', lunch), ('D', dinner))
+                if not taken
+            }
+            self.assertEqual(misses, walked)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('run_benchmarks', owner='bench-0', repeat=1, output=output, stdout=io.StringIO())
+            with open(output, encoding='utf-8') as report_file:
+                report = json.load(report_file)
+        self.assertEqual(report['data']['owner_customers'], 3)
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['status'], [200], name)
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SyncTests(APITestCase):
+    def sync(self, token=None):
+        response = self.api.get('/api/sync/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_changes_and_tombstones_since_the_last_token(self):
+        day = self.today - timedelta(days=2)
+        self.mark(day, 'lunch')
+        snapshot = self.sync()
+        self.assertTrue(snapshot['full'])
+        self.assertEqual([customer['id'] for customer in snapshot['customers']], [self.customer.id])
+        self.assertEqual(snapshot['meals'], [
+            {'customer_id': self.customer.id, 'date': day.isoformat(), 'meal_type': 'L', 'is_taken': False}
+        ])
+
+        nothing = self.sync(snapshot['token'])
+        self.assertFalse(nothing['full'])
+        self.assertEqual((nothing['customers'], nothing['meals'], nothing['deleted_meals']), ([], [], []))
+
+        self.mark(day, 'lunch', True)
+        self.mark(day, 'dinner')
+        delta = self.sync(nothing['token'])
+        self.assertEqual(delta['deleted_meals'], [
+            {'customer_id': self.customer.id, 'date': day.isoformat(), 'meal_type': 'L'}
+        ])
+        self.assertEqual([meal['meal_type'] for meal in delta['meals']], ['D'])
+
+        self.post(f'/api/delete_customer/{self.customer.id}/', {})
+        self.assertEqual(self.sync(delta['token'])['deleted_customers'], [self.customer.id])
+
+    def test_forged_token_is_refused(self):
+        self.assertEqual(self.api.get('/api/sync/', {'since': 'not-a-token'}).status_code, 400)
+
+
+class ExceptionOnlyStorageTests(APITestCase):
+    def test_only_misses_are_stored(self):
+        day = self.today - timedelta(days=1)
+        self.mark(day, 'lunch')
+        self.mark(day, 'dinner', True)
+        self.assertEqual(list(DailyMeal.objects.values_list('meal_type', 'is_taken')), [('L', False)])
+
+        self.mark(day, 'lunch', True)
+        self.assertFalse(DailyMeal.objects.exists())
+
+    def test_compaction_drops_legacy_taken_rows_only(self):
+        day = self.today - timedelta(days=1)
+        self.mark(day, 'lunch')
+        DailyMeal.objects.create(customer=self.customer, date=day, meal_type='D', is_taken=True)
+
+        call_command('compact_meals', chunk_size=1, stdout=io.StringIO())
+        self.assertEqual(list(DailyMeal.objects.values_list('meal_type', 'is_taken')), [('L', False)])
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.day = self.last_month(5)
+        self.mark(self.day, 'lunch')
+        call_command('archive_meals', before=f'{self.today:%Y-%m}', stdout=io.StringIO())
+
+    def test_archived_misses_are_read_through(self):
+        self.assertFalse(DailyMeal.objects.exists())
+
+        hello = self.api.get(f'/api/hello/?date={self.day.isoformat()}').json()
+        self.assertEqual(hello['customers'], [{'id': self.customer.id, 'name': 'Asha', 'lunch': False, 'dinner': True}])
+        calendar = self.api.get(f'/api/customer/{self.customer.id}/calendar/?month={self.day:%Y-%m}').json()
+        self.assertEqual(calendar['months'][0]['days'][4], '2')
+        self.assertEqual(self.api.get('/api/sync/').json()['meals'], [
+            {'customer_id': self.customer.id, 'date': self.day.isoformat(), 'meal_type': 'L', 'is_taken': False}
+        ])
+
+        run_billing(self.day.year, self.day.month)
+        invoice = Invoice.objects.get(customer=self.customer)
+        self.assertEqual(invoice.lunches_taken, invoice.active_days - 1)
+
+    def test_archived_months_are_read_only(self):
+        response = self.post('/api/mark_tiffin/', {
+            'customer_id': self.customer.id, 'slot': 'lunch', 'value': True, 'date': self.day.isoformat()
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('archived', response.json()['error'])
+
+
+class CalendarTests(APITestCase):
+    def calendar(self, query):
+        response = self.api.get(f'/api/customer/{self.customer.id}/calendar/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['months']
+
+    def test_month_packs_one_digit_per_day(self):
+        first = self.today.replace(day=1)
+        self.mark(first, 'lunch')
+        self.mark(self.today, 'dinner')
+
+        month = self.calendar(f'month={self.today:%Y-%m}')[0]
+        expected = ''
+        for offset in range(len(month['days'])):
+            day = first + timedelta(days=offset)
+            if day > self.today:
+                expected += '-'
+            else:
+                expected += str((day != first) + 2 * (day != self.today))
+        self.assertEqual(month['days'], expected)
+        self.assertEqual(month['totals']['lunches_missed'], 1)
+        self.assertEqual(month['totals']['dinners_missed'], 1)
+        self.assertEqual(month['totals']['active_days'], self.today.day)
+
+    def test_year_lists_every_month(self):
+        months = self.calendar(f'year={self.today.year}')
+        self.assertEqual([month['month'] for month in months], [f'{self.today.year}-{n:02d}' for n in range(1, 13)])
+        self.assertEqual(
+            self.api.get(f'/api/customer/{self.customer.id}/calendar/?year=2026&month=2026-01').status_code, 400
+        )
+
+
+class TransferTests(APITestCase):
+    def export(self, client):
+        response = client.get('/api/export/')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_export_imports_into_another_account(self):
+        self.mark(self.today - timedelta(days=3), 'lunch')
+        self.mark(self.today - timedelta(days=1), 'dinner')
+        exported = self.export(self.api)
+
+        other = User.objects.create_user('other')
+        client = APIClient()
+        client.force_authenticate(other)
+        response = client.post('/api/import/', {'file': SimpleUploadedFile('export.csv', exported)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.json()['customers_created'], response.json()['meals_written']), (1, 2)
+        )
+
+        copy = Customer.objects.get(user=other)
+        self.assertNotEqual(copy.id, self.customer.id)
+        self.assertEqual(
+            set(copy.meals.values_list('date', 'meal_type')),
+            set(self.customer.meals.values_list('date', 'meal_type'))
+        )
+        # Same file once the ids are remapped back
+        self.assertEqual(
+            self.export(client).replace(f'meal,{copy.id},'.encode(), b'').replace(f'customer,{copy.id},'.encode(), b''),
+            exported.replace(f'meal,{self.customer.id},'.encode(), b'').replace(
+                f'customer,{self.customer.id},'.encode(), b''
+            )
+        )
+
+    def test_backends_without_returned_keys_still_remap_meals(self):
+        day = self.today - timedelta(days=2)
+        lines = (
+            'record,customer,name,joining_date,fee,date,meal_type,is_taken\n'
+            f'customer,501,Ravi,{self.customer.joining_date.isoformat()},2500.00,,,\n'
+            f'customer,502,Meena,{self.customer.joining_date.isoformat()},2000.00,,,\n'
+            f'meal,502,,,,{day.isoformat()},D,false\n'
+        )
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response = self.api.post(
+                '/api/import/', {'file': SimpleUploadedFile('customers.csv', lines.encode())}, format='multipart'
+            )
+        self.assertEqual((response.json()['customers_created'], response.json()['meals_written']), (2, 1))
+        meena = Customer.objects.get(user=self.owner, name='Meena')
+        self.assertEqual(list(meena.meals.values_list('date', 'meal_type')), [(day, 'D')])
+
+    def test_bad_lines_are_reported_and_skipped(self):
+        lines = (
+            'record,customer,name,joining_date,fee,date,meal_type,is_taken\n'
+            f'meal,{self.customer.id},,,,{self.today.isoformat()},L,false\n'
+            f'meal,{self.customer.id},,,,not-a-date,L,false\n'
+            'meal,999999,,,,2026-01-01,L,false\n'
+        )
+        response = self.api.post(
+            '/api/import/', {'file': SimpleUploadedFile('meals.csv', lines.encode())}, format='multipart'
+        )
+        payload = response.json()
+        self.assertFalse(payload['success'])
+        self.assertEqual(payload['meals_written'], 1)
+        self.assertEqual([error['line'] for error in payload['errors']], [3, 4])
+
+
+class AdminTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('admin', password='admin-password')
+        self.client.force_login(self.admin)
+        self.mark(self.today, 'lunch')
+
+    def test_changelists_render(self):
+        for model in ('customer', 'dailymeal', 'invoice'):
+            self.assertEqual(self.client.get(f'/admin/api/{model}/').status_code, 200, model)
+
+    def test_meals_are_read_only(self):
+        meal = DailyMeal.objects.get()
+        url = f'/admin/api/dailymeal/{meal.pk}/change/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.post(url, {'is_taken': 'on'}).status_code, 403)
+        self.assertEqual(self.client.get('/admin/api/dailymeal/add/').status_code, 403)
+        self.assertEqual(self.client.post(f'/admin/api/dailymeal/{meal.pk}/delete/', {'post': 'yes'}).status_code, 403)
+        self.assertFalse(DailyMeal.objects.get().is_taken)
+
+    def test_large_tables_show_the_estimate_unless_filtered(self):
+        with mock.patch('api.admin.estimated_row_count', return_value=10 ** 6):
+            unfiltered = self.client.get('/admin/api/dailymeal/')
+            filtered = self.client.get(f'/admin/api/dailymeal/?customer__id__exact={self.customer.id}')
+        self.assertEqual(unfiltered.context['cl'].result_count, 10 ** 6)
+        self.assertEqual(filtered.context['cl'].result_count, 1)
+
+
+class ReplayTests(APITestCase):
+    def replay(self, *operations):
+        response = self.post('/api/ops/replay/', {'ops': list(operations)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def op(self, key, value, ts=None, slot='lunch', day=None):
+        return {
+            'key': key, 'ts': (ts or timezone.now()).isoformat(), 'op': 'mark_tiffin',
+            'customer_id': self.customer.id, 'date': (day or self.today).isoformat(), 'slot': slot, 'value': value,
+        }
+
+    def lunch_taken(self):
+        return not DailyMeal.objects.filter(customer=self.customer, date=self.today, meal_type='L').exists()
+
+    def test_keys_apply_once(self):
+        first = self.replay(self.op('a', False))
+        self.assertEqual(first['results'][0]['status'], 'applied')
+        self.mark(self.today, 'lunch', True)
+
+        again = self.replay(self.op('a', False), self.op('a', False))
+        self.assertEqual(
+            [(result['status'], result['original_status']) for result in again['results']],
+            [('duplicate', 'applied'), ('duplicate', 'applied')]
+        )
+        self.assertTrue(self.lunch_taken())
+
+    def test_latest_timestamp_wins_within_a_batch(self):
+        now = timezone.now()
+        results = self.replay(
+            self.op('new', False, now - timedelta(minutes=1)),
+            self.op('old', True, now - timedelta(minutes=5)),
+        )['results']
+        self.assertEqual([result['status'] for result in results], ['applied', 'stale'])
+        self.assertFalse(self.lunch_taken())
+
+    def test_writes_older_than_an_online_write_are_stale(self):
+        queued_at = timezone.now() - timedelta(hours=1)
+        self.mark(self.today, 'lunch')
+        results = self.replay(self.op('late', True, queued_at))['results']
+        self.assertEqual(results[0]['status'], 'stale')
+        self.assertFalse(self.lunch_taken())
+
+    def test_backends_without_conflict_targets_move_the_slot_clock(self):
+        now = timezone.now()
+        self.replay(self.op('first', False, now - timedelta(minutes=10)))
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            results = self.replay(self.op('second', True, now - timedelta(minutes=5)))['results']
+        self.assertEqual(results[0]['status'], 'applied')
+        self.assertTrue(self.lunch_taken())
+        # The clock moved to the second write, so the first is stale if sent again
+        stale = self.replay(self.op('third', False, now - timedelta(minutes=7)))['results']
+        self.assertEqual(stale[0]['status'], 'stale')
+
+    def test_bad_operations_are_errors(self):
+        payload = self.replay({'key': 'x', 'ts': 'yesterday', 'op': 'mark_tiffin'}, self.op('ok', False))
+        self.assertFalse(payload['success'])
+        self.assertEqual([result['status'] for result in payload['results']], ['error', 'applied'])
+
+
+class AuthThrottleTests(APITestCase):
+    def login(self, username='owner', password='wrong-password'):
+        return self.api.post('/api/login/', {'username': username, 'password': password}, format='json')
+
+    def test_repeated_failures_for_one_username_get_429(self):
+        for _ in range(settings.AUTH_THROTTLE_RATES['username'][0]):
+            self.assertEqual(self.login().status_code, 401)
+        refused = self.login(password='owner-password')
+        self.assertEqual(refused.status_code, 429)
+        self.assertGreater(int(refused['Retry-After']), 0)
+        # Other usernames from the same address still get through
+        self.assertEqual(self.login(username='someone-else').status_code, 401)
+
+    def test_forwarded_for_header_does_not_make_a_new_client(self):
+        burst = settings.AUTH_THROTTLE_RATES['ip'][0]
+        statuses = [
+            self.api.post(
+                '/api/login/', {'username': f'user-{n}', 'password': 'wrong-password'}, format='json',
+                HTTP_X_FORWARDED_FOR=f'203.0.113.{n}', REMOTE_ADDR='198.51.100.7'
+            ).status_code
+            for n in range(burst + 1)
+        ]
+        self.assertEqual(statuses, [401] * burst + [429])
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_trusted_proxy_forwards_the_client_address(self):
+        burst = settings.AUTH_THROTTLE_RATES['ip'][0]
+        for n in range(burst + 1):
+            response = self.api.post(
+                '/api/login/', {'username': f'user-{n}', 'password': 'wrong-password'}, format='json',
+                HTTP_X_FORWARDED_FOR=f'203.0.113.{n}', REMOTE_ADDR='198.51.100.7'
+            )
+            self.assertEqual(response.status_code, 401)
+
+    def test_busy_hashing_slots_refuse_at_once(self):
+        with ExitStack() as stack:
+            for _ in range(settings.AUTH_HASH_SLOTS):
+                stack.enter_context(hashing_slot())
+            refused = self.login(password='owner-password')
+        self.assertEqual(refused.status_code, 429)
+        self.assertEqual(refused['Retry-After'], str(settings.AUTH_HASH_RETRY_AFTER))
+        self.assertEqual(self.login(password='owner-password').status_code, 200)
+
+    def test_bucket_culling_keeps_the_slot_leases(self):
+        throttle = {**settings.CACHES['throttle'], 'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 1}}
+        with override_settings(CACHES={**settings.CACHES, 'throttle': throttle}), ExitStack() as stack:
+            for _ in range(settings.AUTH_HASH_SLOTS):
+                stack.enter_context(hashing_slot())
+            # Each login adds two buckets, so the throttle cache culls everything repeatedly
+            statuses = {
+                self.api.post(
+                    '/api/login/', {'username': f'user-{n}', 'password': 'wrong-password'}, format='json',
+                    REMOTE_ADDR=f'198.51.100.{n}'
+                ).status_code
+                for n in range(10)
+            }
+        self.assertEqual(statuses, {429})
+
+
+class CounterUpkeepTests(APITestCase):
+    """Every write path keeps DailyMeal, MealMonth, KitchenDay and the Customer counters in step"""
+
+    def assertCountersConsistent(self):
+        month = self.today.replace(day=1)
+        for customer in Customer.objects.filter(user=self.owner):
+            misses = set(customer.meals.filter(is_taken=False).values_list('date', 'meal_type'))
+            walked = {
+                (day, meal_type)
+                for day, lunch, dinner in MealMonth.iter_days(
+                    customer, customer.joining_date, self.today + timedelta(days=40)
+                )
+                for meal_type, taken in (('L', lunch), ('D', dinner))
+                if not taken
+            }
+            self.assertEqual(misses, walked, customer.name)
+
+            # Counters counted through an earlier day are recounted when read
+            if customer.counted_through == self.today:
+                row = MealMonth.objects.filter(customer=customer, month=month).first() or MealMonth(month=month)
+                self.assertEqual(
+                    (customer.lunches_missed_this_month, customer.dinners_missed_this_month),
+                    Customer.counted_misses(row.missed, customer.joining_date, self.today),
+                    customer.name
+                )
+
+        recorded = set(
+            KitchenDay.objects.filter(user=self.owner).exclude(lunches_missed=0, dinners_missed=0)
+            .values_list('date', 'lunches_missed', 'dinners_missed')
+        )
+        KitchenDay.rebuild([self.owner.id])
+        rebuilt = set(KitchenDay.objects.filter(user=self.owner).values_list('date', 'lunches_missed', 'dinners_missed'))
+        self.assertEqual(recorded, rebuilt)
+
+    def test_every_write_path_keeps_the_counters_in_step(self):
+        ravi = Customer.objects.create(
+            user=self.owner, name='Ravi', fee=Decimal('2500.00'), joining_date=self.customer.joining_date
+        )
+        tomorrow = self.today + timedelta(days=1)
+
+        # store_meal
+        self.mark(self.today, 'lunch')
+        self.mark(self.last_month(7), 'dinner')
+        self.post('/api/update_specific_date/', {
+            'customer_id': self.customer.id, 'date': tomorrow.isoformat(), 'lunch': False, 'dinner': False
+        })
+        self.mark(self.today, 'lunch', True)
+        self.assertCountersConsistent()
+
+        # store_meals
+        self.post('/api/mark_tiffin/bulk/', {'entries': [
+            {'customer_id': ravi.id, 'slot': 'lunch', 'value': False, 'date': self.today.isoformat()},
+            {'customer_id': ravi.id, 'slot': 'dinner', 'value': False, 'date': tomorrow.isoformat()},
+            {'customer_id': self.customer.id, 'slot': 'dinner', 'value': True, 'date': tomorrow.isoformat()},
+        ]})
+        self.assertCountersConsistent()
+
+        # import
+        lines = (
+            'record,customer,name,joining_date,fee,date,meal_type,is_taken\n'
+            f'meal,{ravi.id},,,,{self.today.isoformat()},D,false\n'
+            f'meal,{self.customer.id},,,,{self.last_month(9)},L,false\n'
+        )
+        self.api.post('/api/import/', {'file': SimpleUploadedFile('meals.csv', lines.encode())}, format='multipart')
+        self.assertCountersConsistent()
+
+        # replay
+        self.post('/api/ops/replay/', {'ops': [{
+            'key': 'k1', 'ts': timezone.now().isoformat(), 'op': 'update_specific_date',
+            'customer_id': ravi.id, 'date': self.today.isoformat(), 'lunch': True, 'dinner': False,
+        }]})
+        self.assertCountersConsistent()
+
+        # delete
+        self.post(f'/api/delete_customer/{ravi.id}/', {})
+        self.assertCountersConsistent()
+
+        forecast = self.api.get(f'/api/kitchen/?date={tomorrow.isoformat()}&days=1').json()['forecast'][0]
+        self.assertEqual(forecast['lunch']['recorded_missed'], 1)
+        self.assertEqual(forecast['dinner']['recorded_missed'], 0)
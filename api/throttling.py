@@ -0,0 +1,157 @@
+# api/throttling.py
+"""CPU protection for the endpoints that hash passwords.
+
+A PBKDF2 hash (login, signup, /api/token/) costs far more CPU than any
+other request, so a burst of them can starve the rest of the API. Two
+layers guard those endpoints:
+
+* Token buckets in the "throttle" cache, one per client IP
+  (``AuthIPThrottle``) and one per submitted username
+  (``AuthUsernameThrottle``). A bucket holds up to ``burst`` tokens and
+  refills at ``per_minute``. Each attempt takes one token, whether it
+  succeeds or not.
+* A concurrency gate (``hashing_slot``). Only ``AUTH_HASH_SLOTS`` hashes
+  run at once, so hashing can use only a fixed share of the workers. A
+  slot is a key in the "throttle_slots" cache, taken with ``add()`` and
+  leased for ``AUTH_HASH_LEASE_SECONDS`` in case a worker dies holding
+  it. A request that finds every slot busy is refused at once rather than
+  parking a worker until one frees up. The leases have a cache of their
+  own because a flood of buckets makes the "throttle" cache cull, which
+  would drop leases too.
+
+Both layers refuse with 429 and a ``Retry-After`` header, through DRF's
+Throttled. With the "file" cache backend the limits are shared by every
+worker process; with "locmem" each process has its own. Bucket updates
+are read-modify-write, not atomic, so concurrent requests can slip a few
+attempts past a bucket. Likewise ``add()`` is atomic on locmem, within
+one process, but on the file backend it is a check then a write, so two
+processes can occasionally take the same slot and run one hash more than
+``AUTH_HASH_SLOTS``. That's fine for load shedding, which is all these
+are for.
+"""
+import hashlib
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+THROTTLE_CACHE_ALIAS = 'throttle'
+SLOT_CACHE_ALIAS = 'throttle_slots'
+
+
+class TokenBucket:
+    """``burst`` tokens, refilled continuously at ``per_minute``; state lives in the cache"""
+
+    def __init__(self, key, burst, per_minute):
+        self.key = key
+        self.burst = burst
+        self.rate = per_minute / 60.0
+
+    def take(self, now=None):
+        """Take a token; returns 0 on success, else the seconds until one is available"""
+        cache = caches[THROTTLE_CACHE_ALIAS]
+        now = time.time() if now is None else now
+        tokens, updated = cache.get(self.key, (self.burst, now))
+        tokens = min(self.burst, tokens + max(0.0, now - updated) * self.rate)
+
+        if tokens >= 1:
+            wait = 0
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate if self.rate else None
+        # Kept until the bucket would be full again; a missing bucket is a full one
+        timeout = max(1, round((self.burst - tokens) / self.rate)) if self.rate else None
+        cache.set(self.key, (tokens, now), timeout)
+        return wait
+
+
+class AuthThrottle(BaseThrottle):
+    """Token bucket per ``scope`` and identity (see ``AUTH_THROTTLE_RATES``)"""
+    scope = None
+
+    def get_identity(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        if not settings.AUTH_THROTTLE_ENABLED:
+            return True
+        identity = self.get_identity(request)
+        if not identity:
+            return True
+
+        burst, per_minute = settings.AUTH_THROTTLE_RATES[self.scope]
+        digest = hashlib.sha1(identity.encode()).hexdigest()
+        bucket = TokenBucket(f'auth:{self.scope}:{digest}', burst, per_minute)
+        self.wait_seconds = bucket.take()
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AuthIPThrottle(AuthThrottle):
+    scope = 'ip'
+
+    def get_identity(self, request):
+        # REMOTE_ADDR, or X-Forwarded-For as far back as NUM_PROXIES trusted
+        # proxies (settings.REST_FRAMEWORK), never the raw client header
+        return self.get_ident(request)
+
+
+class AuthUsernameThrottle(AuthThrottle):
+    scope = 'username'
+
+    def get_identity(self, request):
+        try:
+            username = request.data.get('username')
+        except AttributeError:
+            return None
+        if not isinstance(username, str):
+            return None
+        return username.strip().lower()
+
+
+AUTH_THROTTLES = [AuthIPThrottle, AuthUsernameThrottle]
+
+
+def _slot_key(number):
+    return f'auth:hash-slot:{number}'
+
+
+@contextmanager
+def hashing_slot():
+    """Hold one of the AUTH_HASH_SLOTS slots; raises Throttled if all are busy"""
+    if not settings.AUTH_THROTTLE_ENABLED:
+        yield
+        return
+
+    cache = caches[SLOT_CACHE_ALIAS]
+    token = uuid.uuid4().hex
+    for number in range(settings.AUTH_HASH_SLOTS):
+        key = _slot_key(number)
+        if cache.add(key, token, settings.AUTH_HASH_LEASE_SECONDS):
+            break
+    else:
+        raise Throttled(wait=settings.AUTH_HASH_RETRY_AFTER)
+
+    try:
+        yield
+    finally:
+        # Only free the slot if our lease hasn't expired and been taken over
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def hashing_gate(view_func):
+    """Run a view (or a view method) inside ``hashing_slot``"""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with hashing_slot():
+            return view_func(*args, **kwargs)
+    return wrapper
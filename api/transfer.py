@@ -0,0 +1,255 @@
+# api/transfer.py
+"""CSV export and import of an owner's customers and meals.
+
+One file carries both, one record per line::
+
+    record,customer,name,joining_date,fee,date,meal_type,is_taken
+    customer,12,Asha,2026-01-05,3000.00,,,
+    meal,12,,,,2026-02-03,L,false
+
+Customers come first. Only misses are exported; a meal not listed was
+taken, as in DailyMeal. The ``customer`` column holds the exporting
+account's customer id. On import, customer lines create new customers
+and meal lines naming one of them are remapped to it; any other id must
+be an existing customer of the importing owner, so meals can also be
+imported on their own.
+
+Both directions stream: the export reads with chunked iterators and
+yields the CSV in blocks, and the import validates and writes
+``batch_size`` lines at a time, each batch in its own transaction. A bad
+line is reported with its line number and skipped; it never aborts the
+import.
+"""
+import csv
+import io
+import time
+from datetime import date
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from .archive import archive_cutoff, archived_meal_rows
+from .models import Customer, DailyMeal
+from .meals import store_meals
+
+COLUMNS = ['record', 'customer', 'name', 'joining_date', 'fee', 'date', 'meal_type', 'is_taken']
+# Bytes of CSV gathered before a block is handed to the response
+EXPORT_BLOCK_SIZE = 64 * 1024
+# Errors listed in an import report; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+BOOLEANS = {'true': True, 't': True, '1': True, 'false': False, 'f': False, '0': False, '': False}
+
+
+def export_csv(user_id, chunk_size=2000):
+    """Yield an owner's data as CSV text in blocks of about EXPORT_BLOCK_SIZE"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+
+    customers = Customer.objects.filter(user_id=user_id).order_by('id').values_list(
+        'id', 'name', 'joining_date', 'fee'
+    )
+    customer_ids = set()
+    for customer_id, name, joining_date, fee in customers.iterator(chunk_size=chunk_size):
+        customer_ids.add(customer_id)
+        writer.writerow(['customer', customer_id, name, joining_date.isoformat(), fee, '', '', ''])
+        if buffer.tell() >= EXPORT_BLOCK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    meals = DailyMeal.objects.filter(customer__user_id=user_id).order_by(
+        'customer_id', 'date', 'meal_type'
+    ).values_list('customer_id', 'date', 'meal_type', 'is_taken')
+    for customer_id, day, meal_type, is_taken in chain(
+        (row for row in archived_meal_rows(user_id) if row[0] in customer_ids),
+        meals.iterator(chunk_size=chunk_size)
+    ):
+        # Rows left from before exception-only storage say nothing a missing row doesn't
+        if is_taken:
+            continue
+        writer.writerow(['meal', customer_id, '', '', '', day.isoformat(), meal_type, 'false'])
+        if buffer.tell() >= EXPORT_BLOCK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+class ImportReport:
+    """What an import did: counts, throughput and the lines that failed"""
+
+    def __init__(self):
+        self.lines = 0
+        self.customers = 0
+        self.meals = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def as_dict(self):
+        return {
+            'lines': self.lines,
+            'customers_created': self.customers,
+            'meals_written': self.meals,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 3),
+            'lines_per_second': round(self.lines / self.seconds) if self.seconds else None,
+        }
+
+
+class CSVImporter:
+    """Import CSV lines (see the module docstring) for one owner"""
+
+    def __init__(self, user_id, batch_size=1000):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.report = ImportReport()
+        self.customer_ids = {}  # exported id -> created customer id
+        self.rejected_customers = set()  # exported ids whose line failed
+        self.owned = set(Customer.objects.filter(user_id=user_id).values_list('id', flat=True))
+        self.pending_customers = []
+        self.pending_meals = []
+
+    def run(self, lines):
+        reader = csv.DictReader(lines)
+        missing = set(COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+
+        for row in reader:
+            self.report.lines += 1
+            line = reader.line_num
+            try:
+                record = row['record']
+                if record == 'customer':
+                    self.pending_customers.append((line, row['customer'], self.parse_customer(row)))
+                elif record == 'meal':
+                    # Meals may name customers still waiting to be created
+                    if self.pending_customers:
+                        self.flush_customers()
+                    self.pending_meals.append((line, self.parse_meal(row)))
+                else:
+                    raise ValueError("record must be 'customer' or 'meal'")
+            except ValidationError as e:
+                self.reject(line, row, '; '.join(e.messages))
+                continue
+            except (ValueError, TypeError, KeyError) as e:
+                self.reject(line, row, str(e) or 'Invalid value')
+                continue
+
+            if len(self.pending_customers) >= self.batch_size:
+                self.flush_customers()
+            if len(self.pending_meals) >= self.batch_size:
+                self.flush_meals()
+
+        self.flush_customers()
+        self.flush_meals()
+        return self.report.finish()
+
+    def reject(self, line, row, message):
+        if row.get('record') == 'customer':
+            self.rejected_customers.add(row.get('customer'))
+        self.report.error(line, message)
+
+    def parse_customer(self, row):
+        # The model fields' own validation, so bad lines fail here and not in the batch insert
+        fields = Customer._meta
+        fee = fields.get_field('fee').clean(row['fee'] or '0', None)
+        if fee < 0:
+            raise ValueError('fee must not be negative')
+        return Customer(
+            user_id=self.user_id,
+            name=fields.get_field('name').clean((row['name'] or '').strip(), None),
+            joining_date=fields.get_field('joining_date').clean(row['joining_date'] or date.today(), None),
+            fee=fee,
+            counted_through=date.today(),
+        )
+
+    def parse_meal(self, row):
+        source_id = row['customer']
+        if source_id in self.customer_ids:
+            customer_id = self.customer_ids[source_id]
+        elif source_id in self.rejected_customers:
+            raise ValueError("The customer's own line was rejected")
+        else:
+            customer_id = int(source_id)
+            if customer_id not in self.owned:
+                raise ValueError('Customer not found')
+        if row['meal_type'] not in ('L', 'D'):
+            raise ValueError("meal_type must be 'L' or 'D'")
+        is_taken = BOOLEANS.get((row['is_taken'] or '').strip().lower())
+        if is_taken is None:
+            raise ValueError("is_taken must be 'true' or 'false'")
+        return customer_id, date.fromisoformat(row['date']), row['meal_type'], is_taken
+
+    def flush_customers(self):
+        if not self.pending_customers:
+            return
+        batch, self.pending_customers = self.pending_customers, []
+        created = [customer for _, _, customer in batch]
+        try:
+            with transaction.atomic():
+                if connection.features.can_return_rows_from_bulk_insert:
+                    Customer.objects.bulk_create(created)
+                else:
+                    # MySQL's bulk insert doesn't return the new primary keys,
+                    # which the meal lines are remapped to
+                    for customer in created:
+                        customer.save(force_insert=True)
+        except Exception as e:
+            for line, source_id, _ in batch:
+                self.rejected_customers.add(source_id)
+                self.report.error(line, f'Batch failed: {e}')
+            return
+        for (_, source_id, _), customer in zip(batch, created):
+            self.customer_ids[source_id] = customer.pk
+            self.owned.add(customer.pk)
+        self.report.customers += len(created)
+
+    def flush_meals(self):
+        if not self.pending_meals:
+            return
+        batch, self.pending_meals = self.pending_meals, []
+
+        # Archived months are read-only here too
+        archived_before = archive_cutoff(self.user_id, {key[1] for _, key in batch})
+        changes = {}
+        lines = []
+        for line, (customer_id, day, meal_type, is_taken) in batch:
+            if archived_before is not None and day < archived_before:
+                self.report.error(line, 'Month is archived')
+                continue
+            # A later line for the same meal wins
+            changes[(customer_id, day, meal_type)] = is_taken
+            lines.append(line)
+        if not changes:
+            return
+
+        try:
+            with transaction.atomic():
+                meal_months = store_meals(self.user_id, changes)
+                Customer.refresh_counters_from(meal_months)
+        except Exception as e:
+            for line in lines:
+                self.report.error(line, f'Batch failed: {e}')
+            return
+        self.report.meals += len(lines)
+
+
+def import_csv(user_id, lines, batch_size=1000):
+    """Import CSV text lines for an owner; returns an ImportReport"""
+    return CSVImporter(user_id, batch_size=batch_size).run(lines)
@@ -1,6 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# ASGI deployments can serve the read-heavy endpoints natively async
+if settings.ASYNC_READ_VIEWS:
+    from . import async_views as read_views
+else:
+    read_views = views
+
 urlpatterns = [
     # Home & Authentication
     path('', views.home, name='home'),
@@ -9,19 +16,37 @@ urlpatterns = [
     
     # Customer CRUD
     path('add_customer/', views.add_customer, name='add_customer'),
-    path('hello/', views.hello, name='hello'),
-    path('customer/<int:id>/', views.customer_detail, name='customer_detail'),
+    path('hello/', read_views.hello, name='hello'),
+    path('customer/<int:id>/', read_views.customer_detail, name='customer_detail'),
     path('edit_customer/<int:id>/', views.edit_customer, name='edit_customer'),
     path('delete_customer/<int:customer_id>/', views.delete_customer, name='delete_customer'),
     
     # Meal Management
     path('mark_tiffin/', views.mark_tiffin, name='mark_tiffin'),
+    path('mark_tiffin/bulk/', views.mark_tiffin_bulk, name='mark_tiffin_bulk'),
     path('update_specific_date/', views.update_specific_date, name='update_specific_date'),
     
     # Stats & Reports
-    path('customer/<int:id>/stats/', views.customer_stats, name='customer_stats'),
-    path('customer/<int:customer_id>/meal-history/', views.customer_meal_history, name='customer_meal_history'),
-    path('customer/<int:customer_id>/date-status/', views.get_date_status, name='get_date_status'),
+    path('customer/<int:id>/stats/', read_views.customer_stats, name='customer_stats'),
+    path('customer/<int:customer_id>/meal-history/', read_views.customer_meal_history, name='customer_meal_history'),
+    path('customer/<int:customer_id>/date-status/', read_views.get_date_status, name='get_date_status'),
+    path('customer/<int:customer_id>/calendar/', read_views.customer_calendar, name='customer_calendar'),
     path('customer/<int:customer_id>/pdf/', views.generate_customer_pdf, name='generate_customer_pdf'),
     path('customer/<int:customer_id>/download-pdf/', views.download_customer_pdf, name='download_customer_pdf'),
+    
+    # Background Reports
+    path('customer/<int:customer_id>/report-jobs/', views.submit_report_job, name='submit_report_job'),
+    path('report-jobs/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('report-jobs/<int:job_id>/result/', views.report_job_result, name='report_job_result'),
+    
+    # Delta Sync
+    path('sync/', views.sync_changes, name='sync_changes'),
+    path('ops/replay/', views.replay_ops, name='replay_ops'),
+    
+    # Import & Export
+    path('export/', views.export_data, name='export_data'),
+    path('import/', views.import_data, name='import_data'),
+    
+    # Kitchen
+    path('kitchen/', views.kitchen_forecast, name='kitchen_forecast'),
 ]
\ No newline at end of file
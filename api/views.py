@@ -1,33 +1,33 @@
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from datetime import date, datetime, timedelta
 from django.views.decorators.http import require_GET
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 import json
-from django.db import transaction
-from django.db.models import Q, Count
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Count, Exists, OuterRef
 from django.contrib.auth import authenticate
 from calendar import monthrange
-import calendar
-import io  # ADD THIS IMPORT
-from decimal import Decimal  # ADD THIS IMPORT
 
-from .models import Customer, DailyMeal
+from .models import Customer, DailyMeal, Invoice, KitchenDay, MealMonth, ReportJob
+from .meals import store_meal, store_meals
+from . import archive, jobs, kitchen, ops, sync, transfer
+from .reports import RENDERERS, cached_report, load_invoice, load_meal_month, report_validators
 from django.contrib.auth.models import User
 
-# PDF imports
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from django.http import HttpResponse
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from functools import wraps
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from .authentication import SAFE_METHODS, FastJWTAuthentication
+from .caching import bump_owner_version, owner_cached, owner_conditional
+from .throttling import AUTH_THROTTLES, hashing_gate
 import jwt
 
 
@@ -56,10 +56,10 @@ def jwt_login_required(view_func):
             else:
                 token = auth_header
             
-            # Decode and verify token
-            jwt_auth = JWTAuthentication()
+            # Decode and verify token; reads trust the claims, writes use the user cache
+            jwt_auth = FastJWTAuthentication()
             validated_token = jwt_auth.get_validated_token(token)
-            user = jwt_auth.get_user(validated_token)
+            user = jwt_auth.get_user(validated_token, write=request.method not in SAFE_METHODS)
             
             if user and user.is_authenticated:
                 request.user = user
@@ -96,6 +96,227 @@ def calculate_total_possible_meals(customer):
         "total_meals": active_days * 2
     }
 
+def parse_report_params(request):
+    """Read ?month=YYYY-MM (default: current month) and ?output=pdf|csv|json"""
+    month = request.GET.get('month')
+    if month:
+        year, month_num = map(int, month.split('-'))
+        date(year, month_num, 1)  # reject impossible months early
+    else:
+        today = date.today()
+        year, month_num = today.year, today.month
+    
+    output = request.GET.get('output', 'pdf')
+    if output not in RENDERERS:
+        raise ValueError(f"output must be one of: {', '.join(RENDERERS)}")
+    
+    return year, month_num, output
+
+def customer_report_response(request, customer, year, month_num, output='pdf'):
+    """Serve a monthly report from the report cache, answering conditional GETs with 304"""
+    _, content_type, extension = RENDERERS[output]
+    meal_month = load_meal_month(customer, year, month_num)
+    invoice = load_invoice(customer, year, month_num)
+    etag, last_modified = report_validators(customer, meal_month, output, invoice)
+    
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp())
+    )
+    if response is None:
+        data = cached_report(customer, year, month_num, output, meal_month, invoice)
+        response = HttpResponse(data, content_type=content_type)
+        if output != 'json':
+            response['Content-Disposition'] = f'attachment; filename="{customer.name}_{year}_{month_num}_report.{extension}"'
+    
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+HISTORY_PAGE_SIZE = 366
+HISTORY_MAX_PAGE_SIZE = 1000
+
+def parse_history_range(request, customer):
+    """Read ?start_date= (default: joining date) and ?end_date= (default: today)"""
+    start_date_str = request.GET.get('start_date')
+    end_date_str = request.GET.get('end_date', date.today().isoformat())
+    
+    if start_date_str:
+        start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    else:
+        start_date = customer.joining_date
+        
+    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    return start_date, end_date
+
+class NDJSONRenderer(BaseRenderer):
+    """Lets ``Accept: application/x-ndjson`` through content negotiation.
+
+    The stream itself bypasses rendering; this only renders the error
+    responses, as a single JSON line.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data) + '\n').encode()
+
+def wants_history_stream(request):
+    return request.GET.get('stream') in ('1', 'true') or \
+        'application/x-ndjson' in request.headers.get('Accept', '')
+
+def history_page(request, start_date, end_date):
+    """Resolve ?limit= and ?cursor= to (limit, page_start, page_end, next_cursor)"""
+    limit = min(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    
+    cursor_str = request.GET.get('cursor')
+    page_end = end_date
+    if cursor_str:
+        page_end = min(end_date, datetime.strptime(cursor_str, '%Y-%m-%d').date())
+    page_start = max(start_date, page_end - timedelta(days=limit - 1))
+    
+    next_cursor = None
+    if page_start > start_date:
+        next_cursor = (page_start - timedelta(days=1)).isoformat()
+    
+    return limit, page_start, page_end, next_cursor
+
+def serialize_history_day(day, lunch, dinner):
+    return {
+        'date': day.isoformat(),
+        'lunch': lunch,
+        'dinner': dinner,
+        'is_weekend': day.weekday() >= 5
+    }
+
+def history_misses(customer, start_date, end_date):
+    """Misses stored for a history range; aggregate with missed_by_meal()"""
+    return DailyMeal.objects.filter(
+        customer=customer,
+        date__gte=start_date,
+        date__lte=end_date,
+        is_taken=False
+    )
+
+def missed_by_meal():
+    return {
+        'lunches': Count('id', filter=Q(meal_type='L')),
+        'dinners': Count('id', filter=Q(meal_type='D'))
+    }
+
+def summarize_history(missed, start_date, end_date):
+    total_days = max(0, (end_date - start_date).days + 1)
+    total_lunches = total_days - missed['lunches']
+    total_dinners = total_days - missed['dinners']
+    total_possible_meals = total_days * 2
+    
+    return {
+        'lunches_taken': total_lunches,
+        'dinners_taken': total_dinners,
+        'total_meals_taken': total_lunches + total_dinners,
+        'total_possible_meals': total_possible_meals,
+        'completion_rate': round(((total_lunches + total_dinners) / total_possible_meals * 100), 2) if total_possible_meals > 0 else 0
+    }
+
+def add_misses(missed, archived):
+    return {meal: missed[meal] + archived[meal] for meal in ('lunches', 'dinners')}
+
+def meal_history_statistics(customer, start_date, end_date):
+    """Statistics for a whole history range from one aggregate over the stored misses"""
+    missed = history_misses(customer, start_date, end_date).aggregate(**missed_by_meal())
+    # Archived months have no DailyMeal rows left, so the two never overlap
+    missed = add_misses(missed, archive.archived_miss_counts(customer, start_date, end_date))
+    return summarize_history(missed, start_date, end_date)
+
+def stream_meal_history(customer, start_date, end_date, statistics):
+    """NDJSON lines: one header with customer and statistics, then one per day"""
+    yield json.dumps({
+        'success': True,
+        'customer': serialize_customer(customer),
+        'statistics': statistics
+    }) + '\n'
+    for day, lunch, dinner in MealMonth.iter_days(customer, start_date, end_date):
+        yield json.dumps(serialize_history_day(day, lunch, dinner)) + '\n'
+
+def parse_calendar_range(request):
+    """Read ?year=YYYY or ?month=YYYY-MM (default: current month) as (first_month, last_month)"""
+    year = request.GET.get('year')
+    month = request.GET.get('month')
+    if year and month:
+        raise ValueError('Pass either year or month, not both')
+    if year:
+        return date(int(year), 1, 1), date(int(year), 12, 1)
+    if month:
+        year, month_num = map(int, month.split('-'))
+        first_month = date(year, month_num, 1)
+        return first_month, first_month
+    first_month = date.today().replace(day=1)
+    return first_month, first_month
+
+def calendar_months(customer, first_month, last_month):
+    """(month, missed bits) rows for a calendar: one indexed range query"""
+    return MealMonth.objects.filter(
+        customer=customer,
+        month__gte=first_month,
+        month__lte=last_month
+    ).values_list('month', 'missed')
+
+def calendar_payload(customer, first_month, last_month, missed_by_month):
+    """A calendar with one compact entry per month.
+
+    ``days`` has one character per day: a digit that is 1 for lunch taken
+    plus 2 for dinner taken (so '3' is both, '0' neither), or '-' for days
+    before the customer joined or still to come. ``weekends`` lists the
+    month's Saturdays and Sundays by day number.
+    """
+    today = date.today()
+    months = []
+    month = first_month
+    while month <= last_month:
+        month_end = month.replace(day=monthrange(month.year, month.month)[1])
+        row = MealMonth(missed=missed_by_month.get(month, 0))
+        first_day = max(customer.joining_date, month)
+        last_day = min(today, month_end)
+        
+        days = []
+        weekends = []
+        day = month
+        while day <= month_end:
+            if day.weekday() >= 5:
+                weekends.append(day.day)
+            if first_day <= day <= last_day:
+                days.append(str(row.is_taken(day, 'L') + 2 * row.is_taken(day, 'D')))
+            else:
+                days.append('-')
+            day += timedelta(days=1)
+        
+        active_days = max(0, (last_day - first_day).days + 1)
+        lunches_missed = row.missed_count('L', first_day.day, last_day.day) if active_days else 0
+        dinners_missed = row.missed_count('D', first_day.day, last_day.day) if active_days else 0
+        months.append({
+            'month': month.strftime('%Y-%m'),
+            'days': ''.join(days),
+            'weekends': weekends,
+            'totals': {
+                'active_days': active_days,
+                'lunches_taken': active_days - lunches_missed,
+                'dinners_taken': active_days - dinners_missed,
+                'lunches_missed': lunches_missed,
+                'dinners_missed': dinners_missed,
+            }
+        })
+        month = month_end + timedelta(days=1)
+    
+    return {
+        'success': True,
+        'customer': serialize_customer(customer),
+        'months': months
+    }
+
 def serialize_customer(customer):
     return {
         'id': customer.id,
@@ -104,26 +325,76 @@ def serialize_customer(customer):
         'fee': float(customer.fee),
     }
 
-def update_monthly_cache(customer, target_date):
-    """Update cached monthly statistics"""
+def customer_stats_payload(customer, last_invoice):
+    """Current-month statistics from the Customer counters (see Customer.current_counters)"""
     today = date.today()
+    start_of_month = today.replace(day=1)
+
+    effective_start = max(customer.joining_date, start_of_month)
+    active_days = max(0, (today - effective_start).days + 1)
+
+    total_lunch_possible = active_days
+    total_dinner_possible = active_days
+
+    # The counters cover the same days, so absences marked ahead don't count yet
+    lunch_missed = customer.lunches_missed_this_month
+    dinner_missed = customer.dinners_missed_this_month
+
+    lunches_taken = max(0, total_lunch_possible - lunch_missed)
+    dinners_taken = max(0, total_dinner_possible - dinner_missed)
+
+    return {
+        "success": True,
+        "month": today.strftime("%Y-%m"),
+        "lunches_taken": int(lunches_taken),
+        "dinners_taken": int(dinners_taken),
+        "lunches_missed": int(lunch_missed),
+        "dinners_missed": int(dinner_missed),
+        "total_lunch_possible": int(total_lunch_possible),
+        "total_dinner_possible": int(total_dinner_possible),
+        "amount_payable_to_date": float(Invoice.prorate(
+            customer.fee,
+            lunches_taken + dinners_taken,
+            total_lunch_possible + total_dinner_possible
+        )),
+        "last_invoice": {
+            "month": last_invoice.month.strftime("%Y-%m"),
+            "amount_payable": float(last_invoice.amount_payable),
+        } if last_invoice else None,
+    }
+
+def meal_status(meals):
+    """(lunch_taken, dinner_taken) from one day's DailyMeal rows"""
+    lunch = True
+    dinner = True
     
-    if target_date.year == today.year and target_date.month == today.month:
-        month_start = today.replace(day=1)
-        
-        stats = DailyMeal.objects.filter(
-            customer=customer,
-            date__gte=month_start,
-            date__lte=today
-        ).aggregate(
-            lunches=Count('id', filter=Q(meal_type='L', is_taken=True)),
-            dinners=Count('id', filter=Q(meal_type='D', is_taken=True))
-        )
-        
-        customer.lunches_this_month = stats['lunches'] or 0
-        customer.dinners_this_month = stats['dinners'] or 0
-        customer.current_month = today.strftime('%Y-%m')
-        customer.save()
+    for meal in meals:
+        if meal.meal_type == 'L':
+            lunch = meal.is_taken
+        elif meal.meal_type == 'D':
+            dinner = meal.is_taken
+    
+    return lunch, dinner
+
+def serialize_day_status(customer, lunch, dinner):
+    return {
+        'id': customer.id,
+        'name': customer.name,
+        'lunch': lunch,
+        'dinner': dinner
+    }
+
+def annotate_meal_status(queryset, target_date):
+    """Annotate customers with missed lunch/dinner flags for one date"""
+    missed = DailyMeal.objects.filter(
+        customer=OuterRef('pk'),
+        date=target_date,
+        is_taken=False
+    )
+    return queryset.annotate(
+        lunch_missed=Exists(missed.filter(meal_type='L')),
+        dinner_missed=Exists(missed.filter(meal_type='D'))
+    )
 
 # ----------------------------
 # Authentication APIs (JWT)
@@ -131,6 +402,8 @@ def update_monthly_cache(customer, target_date):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(AUTH_THROTTLES)
+@hashing_gate
 def signup(request):
     """User registration with JWT token response"""
     try:
@@ -166,6 +439,8 @@ def signup(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(AUTH_THROTTLES)
+@hashing_gate
 def login_view(request):
     """User login with JWT token response"""
     try:
@@ -191,6 +466,14 @@ def login_view(request):
     except Exception as e:
         return Response({"error": str(e)}, status=400)
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """/api/token/ with the same protection as login_view"""
+    throttle_classes = AUTH_THROTTLES
+
+    @hashing_gate
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
 # ----------------------------
 # Home & Customer List
 # ----------------------------
@@ -206,12 +489,23 @@ def home(request):
             "signup": "POST /api/signup/",
             "login": "POST /api/login/",
             "add_customer": "POST /api/add_customer/",
-            "list_customers": "GET /api/hello/",
+            "list_customers": "GET /api/hello/?date=YYYY-MM-DD",
             "customer_detail": "GET /api/customer/<id>/",
+            "mark_tiffin_bulk": "POST /api/mark_tiffin/bulk/",
             "update_status": "POST /api/update_specific_date/",
             "date_status": "GET /api/customer/<id>/date-status/?date=YYYY-MM-DD",
-            "generate_pdf": "GET /api/customer/<id>/pdf/?month=YYYY-MM",
-            "download_pdf": "GET /api/customer/<id>/download-pdf/?month=YYYY-MM",
+            "meal_history": "GET /api/customer/<id>/meal-history/?start_date=&end_date=&limit=&cursor=&stream=1",
+            "calendar": "GET /api/customer/<id>/calendar/?year=YYYY or ?month=YYYY-MM",
+            "generate_pdf": "GET /api/customer/<id>/pdf/?month=YYYY-MM&output=pdf|csv|json",
+            "download_pdf": "GET /api/customer/<id>/download-pdf/?month=YYYY-MM&output=pdf|csv|json",
+            "submit_report": "POST /api/customer/<id>/report-jobs/",
+            "report_status": "GET /api/report-jobs/<job_id>/",
+            "report_result": "GET /api/report-jobs/<job_id>/result/",
+            "sync": "GET /api/sync/?since=<token>",
+            "replay_ops": "POST /api/ops/replay/",
+            "kitchen": "GET /api/kitchen/?date=YYYY-MM-DD&days=N",
+            "export": "GET /api/export/",
+            "import": "POST /api/import/ (multipart CSV file)",
             "jwt_token": "POST /api/token/",
             "jwt_refresh": "POST /api/token/refresh/",
             "jwt_verify": "POST /api/token/verify/"
@@ -220,33 +514,32 @@ def home(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@owner_cached
 def hello(request):
-    """Get all customers with today's status"""
+    """Get all customers with their status for a date (defaults to today)"""
     try:
-        today = date.today()
-        customers = Customer.objects.filter(user=request.user)
-        
-        result = []
-        for customer in customers:
-            meals = DailyMeal.objects.filter(customer=customer, date=today)
-            
-            lunch = True
-            dinner = True
-            
-            for meal in meals:
-                if meal.meal_type == 'L':
-                    lunch = meal.is_taken
-                elif meal.meal_type == 'D':
-                    dinner = meal.is_taken
-            
-            result.append({
-                'id': customer.id,
-                'name': customer.name,
-                'lunch': lunch,
-                'dinner': dinner
-            })
+        date_str = request.GET.get('date')
+        if date_str:
+            target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        else:
+            target_date = date.today()
+
+        customers = Customer.objects.filter(user_id=request.user.id)
+        archived = archive.archived_day_statuses(request.user.id, target_date)
+        
+        if archived is None:
+            # One query for the whole dashboard instead of one per customer
+            result = [
+                serialize_day_status(customer, not customer.lunch_missed, not customer.dinner_missed)
+                for customer in annotate_meal_status(customers, target_date).only('id', 'name')
+            ]
+        else:
+            result = [
+                serialize_day_status(customer, *archived.get(customer.id, (True, True)))
+                for customer in customers.only('id', 'name')
+            ]
         
-        return Response({"customers": result})
+        return Response({"customers": result, "date": target_date.isoformat()})
         
     except Exception as e:
         return Response({'error': str(e)}, status=400)
@@ -267,16 +560,10 @@ def add_customer(request):
             name=data.get('name'),
             joining_date=data.get('joining_date', date.today()),
             fee=data.get('fee', 0.0),
-            current_month=date.today().strftime('%Y-%m')
+            counted_through=date.today()
         )
         
-        # Create today's meal records
-        today = date.today()
-        DailyMeal.objects.bulk_create([
-            DailyMeal(customer=customer, date=today, meal_type='L', is_taken=True),
-            DailyMeal(customer=customer, date=today, meal_type='D', is_taken=True)
-        ])
-        
+        bump_owner_version(request.user.id)
         return Response({'success': True, 'id': customer.id})
         
     except Exception as e:
@@ -287,7 +574,7 @@ def add_customer(request):
 def edit_customer(request, id):
     """Edit customer details"""
     try:
-        customer = get_object_or_404(Customer, id=id, user=request.user)
+        customer = get_object_or_404(Customer, id=id, user_id=request.user.id)
         data = request.data
         
         customer.name = data.get('name', customer.name)
@@ -296,13 +583,17 @@ def edit_customer(request, id):
         joining_date_str = data.get('joining_date')
         if joining_date_str:
             customer.joining_date = datetime.strptime(joining_date_str, '%Y-%m-%d').date()
+            # The counters start at the joining date; recount them on the next read
+            customer.counted_through = None
         
         # Update fee if provided
         fee = data.get('fee')
         if fee is not None:
             customer.fee = fee
             
-        customer.save()
+        # Leave the counters alone; write paths update them with F() deltas
+        customer.save(update_fields=['name', 'joining_date', 'fee', 'counted_through', 'updated_at'])
+        bump_owner_version(request.user.id)
         return Response({'success': True})
         
     except Exception as e:
@@ -312,8 +603,12 @@ def edit_customer(request, id):
 @permission_classes([IsAuthenticated])
 def delete_customer(request, customer_id):
     """Delete a customer"""
-    customer = get_object_or_404(Customer, id=customer_id, user=request.user)
-    customer.delete()
+    customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
+    with transaction.atomic():
+        sync.record_customer_deletion(customer)
+        KitchenDay.forget_customer(customer)
+        customer.delete()
+    bump_owner_version(request.user.id)
 
     return Response({"success": True, "message": "Customer deleted"})
 
@@ -323,24 +618,18 @@ def delete_customer(request, customer_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@owner_cached
 def customer_detail(request, id):
     """Get customer details with today's status"""
     try:
-        customer = get_object_or_404(Customer, id=id, user=request.user)
+        customer = get_object_or_404(Customer, id=id, user_id=request.user.id)
         data = serialize_customer(customer)
         
         # Add today's status
         today = date.today()
         meals = DailyMeal.objects.filter(customer=customer, date=today)
         
-        lunch = True
-        dinner = True
-        
-        for meal in meals:
-            if meal.meal_type == 'L':
-                lunch = meal.is_taken
-            elif meal.meal_type == 'D':
-                dinner = meal.is_taken
+        lunch, dinner = meal_status(meals)
         
         data['today_status'] = {
             'lunch': lunch,
@@ -355,47 +644,16 @@ def customer_detail(request, id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@owner_cached
 def customer_stats(request, id):
     """Get customer statistics for current month"""
     try:
-        customer = get_object_or_404(Customer, id=id, user=request.user)
-        today = date.today()
-
-        days_in_month = monthrange(today.year, today.month)[1]
-        start_of_month = today.replace(day=1)
-
-        effective_start = max(customer.joining_date, start_of_month)
-        active_days = max(0, (today - effective_start).days + 1)
-
-        total_lunch_possible = active_days
-        total_dinner_possible = active_days
+        customer = get_object_or_404(Customer, id=id, user_id=request.user.id)
+        # Closed months are billed by run_billing; show the latest invoice
+        last_invoice = customer.invoices.order_by('-month').first()
+        customer.current_counters()
 
-        missed_stats = DailyMeal.objects.filter(
-            customer=customer,
-            date__gte=start_of_month,
-            date__lte=today,
-            is_taken=False
-        ).aggregate(
-            lunch_missed=Count('id', filter=Q(meal_type='L')),
-            dinner_missed=Count('id', filter=Q(meal_type='D'))
-        )
-
-        lunch_missed = missed_stats.get("lunch_missed") or 0
-        dinner_missed = missed_stats.get("dinner_missed") or 0
-
-        lunches_taken = total_lunch_possible - lunch_missed
-        dinners_taken = total_dinner_possible - dinner_missed
-
-        return Response({
-            "success": True,
-            "month": today.strftime("%Y-%m"),
-            "lunches_taken": int(lunches_taken),
-            "dinners_taken": int(dinners_taken),
-            "lunches_missed": int(lunch_missed),
-            "dinners_missed": int(dinner_missed),
-            "total_lunch_possible": int(total_lunch_possible),
-            "total_dinner_possible": int(total_dinner_possible),
-        })
+        return Response(customer_stats_payload(customer, last_invoice))
 
     except Exception as e:
         return Response({'error': str(e)}, status=400)
@@ -415,25 +673,101 @@ def mark_tiffin(request):
         value = data.get('value', True)
         date_str = data.get('date', date.today().isoformat())
         
-        customer = get_object_or_404(Customer, id=customer_id, user=request.user)
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         meal_type = 'L' if slot == 'lunch' else 'D'
+        is_taken = DailyMeal._meta.get_field('is_taken').to_python(value)
         
-        DailyMeal.objects.update_or_create(
-            customer=customer,
-            date=target_date,
-            meal_type=meal_type,
-            defaults={'is_taken': value}
-        )
+        with transaction.atomic():
+            delta = store_meal(customer, target_date, meal_type, is_taken)
+            
+            if meal_type == 'L':
+                customer.apply_missed_delta(target_date, lunch=delta)
+            else:
+                customer.apply_missed_delta(target_date, dinner=delta)
         
-        update_monthly_cache(customer, target_date)
+        bump_owner_version(request.user.id)
         
         return Response({'success': True})
         
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=400)
 
+MAX_BULK_ENTRIES = 500
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_tiffin_bulk(request):
+    """Mark tiffin status for many customers and slots in one request"""
+    try:
+        data = request.data
+        entries = data.get('entries') if isinstance(data, dict) else data
+        
+        if not isinstance(entries, list) or not entries:
+            return Response({'success': False, 'error': 'A non-empty list of entries is required'}, status=400)
+        if len(entries) > MAX_BULK_ENTRIES:
+            return Response({'success': False, 'error': f'At most {MAX_BULK_ENTRIES} entries per request'}, status=400)
+        
+        is_taken_field = DailyMeal._meta.get_field('is_taken')
+        
+        # Validate every entry before touching the database
+        results = []
+        parsed = []
+        for index, entry in enumerate(entries):
+            try:
+                slot = entry.get('slot')
+                if slot not in ('lunch', 'dinner'):
+                    raise ValueError("slot must be 'lunch' or 'dinner'")
+                parsed.append((
+                    index,
+                    int(entry.get('customer_id')),
+                    datetime.strptime(entry.get('date', date.today().isoformat()), '%Y-%m-%d').date(),
+                    'L' if slot == 'lunch' else 'D',
+                    is_taken_field.to_python(entry.get('value', True)),
+                ))
+                results.append({'index': index, 'success': True})
+            except Exception as e:
+                results.append({'index': index, 'success': False, 'error': str(e)})
+        
+        # One ownership query for the whole batch
+        owned = set(
+            Customer.objects.filter(
+                user_id=request.user.id,
+                id__in={customer_id for _, customer_id, _, _, _ in parsed}
+            ).values_list('id', flat=True)
+        )
+        
+        archived_before = archive.archive_cutoff(
+            request.user.id, {target_date for _, _, target_date, _, _ in parsed}
+        )
+        
+        # Later entries for the same slot win, so each row is written once
+        changes = {}
+        for index, customer_id, target_date, meal_type, value in parsed:
+            if customer_id not in owned:
+                results[index] = {'index': index, 'success': False, 'error': 'Customer not found'}
+                continue
+            if archived_before is not None and target_date < archived_before:
+                results[index] = {'index': index, 'success': False, 'error': 'Month is archived'}
+                continue
+            changes[(customer_id, target_date, meal_type)] = value
+        
+        if changes:
+            with transaction.atomic():
+                meal_months = store_meals(request.user.id, changes)
+                Customer.refresh_counters_from(meal_months)
+            bump_owner_version(request.user.id)
+        
+        return Response({
+            'success': all(result['success'] for result in results),
+            'updated': len(changes),
+            'results': results
+        })
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_specific_date(request):
@@ -445,38 +779,18 @@ def update_specific_date(request):
         lunch = data.get("lunch", True)
         dinner = data.get("dinner", True)
 
-        customer = Customer.objects.get(id=customer_id, user=request.user)
+        customer = Customer.objects.get(id=customer_id, user_id=request.user.id)
         target_date = datetime.strptime(date_str, "%Y-%m-%d").date()
 
-        # Lunch
-        if lunch:
-            DailyMeal.objects.filter(
-                customer=customer,
-                date=target_date,
-                meal_type="L"
-            ).delete()
-        else:
-            DailyMeal.objects.update_or_create(
-                customer=customer,
-                date=target_date,
-                meal_type="L",
-                defaults={"is_taken": False},
+        with transaction.atomic():
+            # Taken meals are stored as "no row"
+            customer.apply_missed_delta(
+                target_date,
+                lunch=store_meal(customer, target_date, "L", bool(lunch)),
+                dinner=store_meal(customer, target_date, "D", bool(dinner)),
             )
 
-        # Dinner
-        if dinner:
-            DailyMeal.objects.filter(
-                customer=customer,
-                date=target_date,
-                meal_type="D"
-            ).delete()
-        else:
-            DailyMeal.objects.update_or_create(
-                customer=customer,
-                date=target_date,
-                meal_type="D",
-                defaults={"is_taken": False},
-            )
+        bump_owner_version(request.user.id)
 
         return Response({
             "success": True,
@@ -490,10 +804,11 @@ def update_specific_date(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@owner_cached
 def get_date_status(request, customer_id):
     """Get meal status for a specific date"""
     try:
-        customer = get_object_or_404(Customer, id=customer_id, user=request.user)
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
         date_str = request.GET.get('date')
         
         if not date_str:
@@ -504,16 +819,12 @@ def get_date_status(request, customer_id):
         
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
-        meals = DailyMeal.objects.filter(customer=customer, date=target_date)
-        
-        lunch = True
-        dinner = True
-        
-        for meal in meals:
-            if meal.meal_type == 'L':
-                lunch = meal.is_taken
-            elif meal.meal_type == 'D':
-                dinner = meal.is_taken
+        archived = archive.archived_day_status(customer, target_date)
+        if archived is not None:
+            lunch, dinner = archived
+        else:
+            meals = DailyMeal.objects.filter(customer=customer, date=target_date)
+            lunch, dinner = meal_status(meals)
         
         return Response({
             'success': True,
@@ -528,70 +839,65 @@ def get_date_status(request, customer_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer])
+@owner_conditional
 def customer_meal_history(request, customer_id):
-    """Get meal history for a customer"""
+    """Get meal history for a customer, newest first.
+
+    Pages are keyed on date: pass the returned ``next_cursor`` back as
+    ``?cursor=`` to continue. ``?stream=1`` (or ``Accept:
+    application/x-ndjson``) streams the whole range as NDJSON instead.
+    """
     try:
-        customer = get_object_or_404(Customer, id=customer_id, user=request.user)
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
         
-        # Get date range
-        start_date_str = request.GET.get('start_date')
-        end_date_str = request.GET.get('end_date', date.today().isoformat())
+        start_date, end_date = parse_history_range(request, customer)
+        statistics = meal_history_statistics(customer, start_date, end_date)
         
-        if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        else:
-            start_date = customer.joining_date
-            
-        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-        
-        # Get meals in date range
-        meals = DailyMeal.objects.filter(
-            customer=customer,
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('-date', 'meal_type')
-        
-        # Group by date
-        daily_data = {}
-        for meal in meals:
-            date_key = meal.date.isoformat()
-            if date_key not in daily_data:
-                daily_data[date_key] = {
-                    'date': date_key,
-                    'lunch': True,
-                    'dinner': True,
-                    'is_weekend': meal.date.weekday() >= 5
-                }
-            
-            if meal.meal_type == 'L':
-                daily_data[date_key]['lunch'] = meal.is_taken
-            elif meal.meal_type == 'D':
-                daily_data[date_key]['dinner'] = meal.is_taken
-        
-        daily_meals = list(daily_data.values())
+        if wants_history_stream(request):
+            return StreamingHttpResponse(
+                stream_meal_history(customer, start_date, end_date, statistics),
+                content_type='application/x-ndjson'
+            )
         
-        # Calculate stats
-        total_days = (end_date - start_date).days + 1
-        total_lunches = sum(1 for day in daily_meals if day['lunch'])
-        total_dinners = sum(1 for day in daily_meals if day['dinner'])
-        total_possible_meals = total_days * 2
+        limit, page_start, page_end, next_cursor = history_page(request, start_date, end_date)
+        daily_meals = [
+            serialize_history_day(day, lunch, dinner)
+            for day, lunch, dinner in MealMonth.iter_days(customer, page_start, page_end)
+        ]
         
         return Response({
             'success': True,
             'customer': serialize_customer(customer),
             'daily_meals': daily_meals,
-            'statistics': {
-                'lunches_taken': total_lunches,
-                'dinners_taken': total_dinners,
-                'total_meals_taken': total_lunches + total_dinners,
-                'total_possible_meals': total_possible_meals,
-                'completion_rate': round(((total_lunches + total_dinners) / total_possible_meals * 100), 2) if total_possible_meals > 0 else 0
+            'statistics': statistics,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor
             }
         })
         
     except Exception as e:
         return Response({'success': False, 'error': str(e)}, status=400)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@owner_cached
+def customer_calendar(request, customer_id):
+    """Lunch/dinner flags for a whole month or year, for calendar screens.
+
+    Reads the packed MealMonth rows, so a year is one query over at most
+    twelve rows. See calendar_payload for the encoding.
+    """
+    try:
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
+        first_month, last_month = parse_calendar_range(request)
+        missed = dict(calendar_months(customer, first_month, last_month))
+        return Response(calendar_payload(customer, first_month, last_month, missed))
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
 # ----------------------------
 # PDF Generation
 # ----------------------------
@@ -599,179 +905,12 @@ def customer_meal_history(request, customer_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generate_customer_pdf(request, customer_id):
-    """Generate PDF report for a customer for selected month - DRF API version"""
+    """Monthly report for a customer - DRF API version (?output=pdf|csv|json)"""
     try:
-        customer = get_object_or_404(Customer, id=customer_id, user=request.user)
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
         
-        # Get month from query parameters (default to current month)
-        month = request.GET.get('month')
-        if month:
-            year, month_num = map(int, month.split('-'))
-        else:
-            today = date.today()
-            year, month_num = today.year, today.month
-        
-        # Calculate date range for the selected month
-        _, last_day = monthrange(year, month_num)
-        start_date = date(year, month_num, 1)
-        end_date = date(year, month_num, last_day)
-        
-        # If customer joined after month start, adjust start date
-        if customer.joining_date > start_date:
-            start_date = customer.joining_date
-        
-        # Get all meals for the month
-        meals = DailyMeal.objects.filter(
-            customer=customer,
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('date', 'meal_type')
-        
-        # Organize data by date
-        meal_dict = {}
-        for meal in meals:
-            date_key = meal.date
-            if date_key not in meal_dict:
-                meal_dict[date_key] = {'lunch': True, 'dinner': True}
-            
-            if meal.meal_type == 'L':
-                meal_dict[date_key]['lunch'] = meal.is_taken
-            elif meal.meal_type == 'D':
-                meal_dict[date_key]['dinner'] = meal.is_taken
-        
-        # Calculate statistics
-        active_days = (end_date - start_date).days + 1
-        
-        # Calculate taken and missed meals
-        lunches_taken = sum(1 for day_data in meal_dict.values() if day_data['lunch'])
-        dinners_taken = sum(1 for day_data in meal_dict.values() if day_data['dinner'])
-        
-        lunches_missed = active_days - lunches_taken
-        dinners_missed = active_days - dinners_taken
-        
-        # Calculate total fee for the month - FIXED
-        total_meals_taken = lunches_taken + dinners_taken
-        total_possible_meals = active_days * 2
-        
-        # Fix the Decimal calculation error
-        if total_possible_meals > 0:
-            # Convert to float for calculation
-            proportion_taken = total_meals_taken / total_possible_meals
-            amount_payable = float(proportion_taken * float(customer.fee))
-        else:
-            amount_payable = 0.0
-        
-        # Create PDF in memory
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=letter)
-        
-        # PDF content
-        y_position = 750
-        
-        # Title
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(200, y_position, "Tiffin Service Monthly Report")
-        y_position -= 30
-        
-        # Customer Information
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(50, y_position, f"Customer: {customer.name}")
-        y_position -= 20
-        pdf.setFont("Helvetica", 12)
-        pdf.drawString(50, y_position, f"Month: {calendar.month_name[month_num]} {year}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Joining Date: {customer.joining_date.strftime('%d %B %Y')}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Monthly Fee: ₹{float(customer.fee):.2f}")
-        y_position -= 40
-        
-        # Summary Statistics
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(50, y_position, "Monthly Summary")
-        y_position -= 30
-        
-        pdf.setFont("Helvetica", 12)
-        pdf.drawString(50, y_position, f"Active Days in Month: {active_days}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Lunches Taken: {lunches_taken} / {active_days}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Dinners Taken: {dinners_taken} / {active_days}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Total Meals Taken: {total_meals_taken} / {total_possible_meals}")
-        y_position -= 20
-        
-        # Fix completion rate calculation
-        completion_rate = (total_meals_taken / total_possible_meals * 100) if total_possible_meals > 0 else 0
-        pdf.drawString(50, y_position, f"Meal Completion Rate: {completion_rate:.1f}%")
-        y_position -= 20
-        
-        pdf.drawString(50, y_position, f"Amount Payable: ₹{amount_payable:.2f}")
-        y_position -= 40
-        
-        # Daily Meal Table
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(50, y_position, "Daily Meal Status")
-        y_position -= 30
-        
-        # Create table data
-        table_data = [['Date', 'Day', 'Lunch', 'Dinner', 'Status']]
-        
-        # Add rows for each day
-        current_date = start_date
-        while current_date <= end_date:
-            day_name = calendar.day_name[current_date.weekday()]
-            meal_status = meal_dict.get(current_date, {'lunch': True, 'dinner': True})
-            
-            lunch_status = "✓" if meal_status['lunch'] else "✗"
-            dinner_status = "✓" if meal_status['dinner'] else "✗"
-            
-            day_status = "Present" if meal_status['lunch'] or meal_status['dinner'] else "Absent"
-            
-            table_data.append([
-                current_date.strftime('%d-%m-%Y'),
-                day_name[:3],
-                lunch_status,
-                dinner_status,
-                day_status
-            ])
-            
-            current_date += timedelta(days=1)
-        
-        # Create and style table
-        table = Table(table_data, colWidths=[80, 50, 50, 50, 60])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        # Draw table
-        table.wrapOn(pdf, 400, 200)
-        table.drawOn(pdf, 50, y_position - (len(table_data) * 20) - 20)
-        
-        # Footer
-        pdf.setFont("Helvetica-Oblique", 10)
-        pdf.drawString(50, 50, f"Report generated on {date.today().strftime('%d %B %Y')}")
-        pdf.drawString(50, 35, "Signature: ________________________")
-        
-        pdf.showPage()
-        pdf.save()
-        
-        # Get PDF value from buffer
-        buffer.seek(0)
-        pdf_data = buffer.getvalue()
-        buffer.close()
-        
-        # Create HTTP response
-        response = HttpResponse(pdf_data, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{customer.name}_{year}_{month_num}_report.pdf"'
-        return response
+        year, month_num, output = parse_report_params(request)
+        return customer_report_response(request, customer, year, month_num, output)
         
     except Exception as e:
         # Return JSON error for debugging
@@ -780,173 +919,213 @@ def generate_customer_pdf(request, customer_id):
 @require_GET
 @jwt_login_required 
 def download_customer_pdf(request, customer_id):
-    """PDF download view (regular Django view with JWT auth)"""
+    """Report download view (regular Django view with JWT auth)"""
+    try:
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
+        
+        year, month_num, output = parse_report_params(request)
+        return customer_report_response(request, customer, year, month_num, output)
+        
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+# ----------------------------
+# Background Report Jobs
+# ----------------------------
+
+def serialize_report_job(job):
+    return {
+        'job_id': job.id,
+        'customer_id': job.customer_id,
+        'month': job.month,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def submit_report_job(request, customer_id):
+    """Queue a monthly PDF report instead of rendering it in the request"""
     try:
-        customer = get_object_or_404(Customer, id=customer_id, user=request.user)
+        customer = get_object_or_404(Customer, id=customer_id, user_id=request.user.id)
         
-        # Get month from query parameters
-        month = request.GET.get('month')
+        month = request.data.get('month') or request.GET.get('month')
         if month:
-            year, month_num = map(int, month.split('-'))
+            datetime.strptime(month, '%Y-%m')
         else:
-            today = date.today()
-            year, month_num = today.year, today.month
-        
-        # Calculate date range for the selected month
-        _, last_day = monthrange(year, month_num)
-        start_date = date(year, month_num, 1)
-        end_date = date(year, month_num, last_day)
-        
-        # If customer joined after month start, adjust start date
-        if customer.joining_date > start_date:
-            start_date = customer.joining_date
-        
-        # Get all meals for the month
-        meals = DailyMeal.objects.filter(
-            customer=customer,
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('date', 'meal_type')
-        
-        # Organize data by date
-        meal_dict = {}
-        for meal in meals:
-            date_key = meal.date
-            if date_key not in meal_dict:
-                meal_dict[date_key] = {'lunch': True, 'dinner': True}
-            
-            if meal.meal_type == 'L':
-                meal_dict[date_key]['lunch'] = meal.is_taken
-            elif meal.meal_type == 'D':
-                meal_dict[date_key]['dinner'] = meal.is_taken
-        
-        # Calculate statistics
-        active_days = (end_date - start_date).days + 1
-        
-        # Calculate taken and missed meals
-        lunches_taken = sum(1 for day_data in meal_dict.values() if day_data['lunch'])
-        dinners_taken = sum(1 for day_data in meal_dict.values() if day_data['dinner'])
-        
-        lunches_missed = active_days - lunches_taken
-        dinners_missed = active_days - dinners_taken
-        
-        # Calculate total fee for the month - FIXED
-        total_meals_taken = lunches_taken + dinners_taken
-        total_possible_meals = active_days * 2
-        
-        # Fix the Decimal calculation error
-        if total_possible_meals > 0:
-            # Convert to float for calculation
-            proportion_taken = total_meals_taken / total_possible_meals
-            amount_payable = float(proportion_taken * float(customer.fee))
+            month = date.today().strftime('%Y-%m')
+        
+        job = ReportJob.objects.create(user=request.user, customer=customer, month=month)
+        transaction.on_commit(jobs.dispatch)
+        
+        return Response({'success': True, **serialize_report_job(job)}, status=202)
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_status(request, job_id):
+    """Poll the status of a queued report"""
+    job = get_object_or_404(ReportJob.objects.defer('result'), id=job_id, user_id=request.user.id)
+    return Response({'success': True, **serialize_report_job(job)})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_result(request, job_id):
+    """Download the PDF of a finished report job"""
+    job = get_object_or_404(ReportJob.objects.select_related('customer'), id=job_id, user_id=request.user.id)
+    
+    if job.status != ReportJob.DONE:
+        return Response({'success': False, **serialize_report_job(job)}, status=409)
+    
+    year, month_num = job.month.split('-')
+    response = HttpResponse(bytes(job.result), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{job.customer.name}_{int(year)}_{int(month_num)}_report.pdf"'
+    return response
+
+# ----------------------------
+# Delta Sync
+# ----------------------------
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """Customers and meals changed since ?since=<token>, plus the next token.
+
+    Without a token, or with one past the tombstone retention, the whole
+    dataset is returned with ``full: true`` and the client should replace
+    its local copy. Otherwise apply ``deleted_*`` first, then upsert.
+    """
+    try:
+        changes = sync.changes_since(request.user.id, request.GET.get('since'))
+        
+        return Response({
+            'success': True,
+            'full': changes['full'],
+            'token': changes['token'],
+            'customers': [serialize_customer(customer) for customer in changes['customers']],
+            'meals': [
+                {
+                    'customer_id': customer_id,
+                    'date': day.isoformat(),
+                    'meal_type': meal_type,
+                    'is_taken': is_taken
+                }
+                for customer_id, day, meal_type, is_taken in changes['meals']
+            ],
+            'deleted_customers': changes['deleted_customers'],
+            'deleted_meals': changes['deleted_meals'],
+        })
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def replay_ops(request):
+    """Apply meal writes queued offline, each exactly once (see api.ops).
+
+    Takes ``{"ops": [...]}`` in the order the client queued them and
+    returns one result per operation. Nothing is written if the batch
+    fails as a whole.
+    """
+    try:
+        data = request.data
+        operations = data.get('ops') if isinstance(data, dict) else data
+        
+        if not isinstance(operations, list) or not operations:
+            return Response({'success': False, 'error': 'A non-empty list of ops is required'}, status=400)
+        if len(operations) > ops.MAX_REPLAY_OPS:
+            return Response({'success': False, 'error': f'At most {ops.MAX_REPLAY_OPS} ops per request'}, status=400)
+        
+        try:
+            with transaction.atomic():
+                results, meal_months = ops.replay(request.user.id, operations)
+                Customer.refresh_counters_from(meal_months)
+        except IntegrityError:
+            return Response({
+                'success': False,
+                'error': 'These operations are being replayed by another request; retry'
+            }, status=409)
+        
+        if meal_months:
+            bump_owner_version(request.user.id)
+        
+        return Response({
+            'success': all(result['status'] != 'error' for result in results),
+            'results': results
+        })
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+# ----------------------------
+# Import & Export
+# ----------------------------
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_data(request):
+    """Stream every customer and missed meal of the owner as CSV (see api.transfer)"""
+    response = StreamingHttpResponse(transfer.export_csv(request.user.id), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="tiffin-export-{date.today().isoformat()}.csv"'
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_data(request):
+    """Import customers and meals from an uploaded CSV in the export's format.
+
+    Send it as a multipart ``file`` field. Lines are written in batches;
+    the response counts what was written and lists the lines that failed.
+    """
+    try:
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'success': False, 'error': 'Upload the CSV as a file field named "file"'}, status=400)
+        
+        # Undecodable bytes become line errors rather than stopping the import halfway
+        lines = (line.decode('utf-8-sig', errors='replace') for line in upload)
+        report = transfer.import_csv(request.user.id, lines)
+        
+        if report.customers or report.meals:
+            bump_owner_version(request.user.id)
+        return Response({'success': report.error_count == 0, **report.as_dict()})
+        
+    except Exception as e:
+        return Response({'success': False, 'error': str(e)}, status=400)
+
+# ----------------------------
+# Kitchen
+# ----------------------------
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@owner_cached
+def kitchen_forecast(request):
+    """Lunches and dinners to cook on ?date= (default: today) and the following days.
+
+    ``?days=`` sets how many days are forecast. See api.kitchen for how
+    the expected misses are estimated.
+    """
+    try:
+        date_str = request.GET.get('date')
+        if date_str:
+            target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
         else:
-            amount_payable = 0.0
-        
-        # Create PDF
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=letter)
-        
-        # PDF content
-        y_position = 750
-        
-        # Title
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(200, y_position, "Tiffin Service Monthly Report")
-        y_position -= 30
-        
-        # Customer Information
-        pdf.setFont("Helvetica-Bold", 12)
-        pdf.drawString(50, y_position, f"Customer: {customer.name}")
-        y_position -= 20
-        pdf.setFont("Helvetica", 12)
-        pdf.drawString(50, y_position, f"Month: {calendar.month_name[month_num]} {year}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Joining Date: {customer.joining_date.strftime('%d %B %Y')}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Monthly Fee: ₹{float(customer.fee):.2f}")
-        y_position -= 40
-        
-        # Summary Statistics
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(50, y_position, "Monthly Summary")
-        y_position -= 30
-        
-        pdf.setFont("Helvetica", 12)
-        pdf.drawString(50, y_position, f"Active Days in Month: {active_days}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Lunches Taken: {lunches_taken} / {active_days}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Dinners Taken: {dinners_taken} / {active_days}")
-        y_position -= 20
-        pdf.drawString(50, y_position, f"Total Meals Taken: {total_meals_taken} / {total_possible_meals}")
-        y_position -= 20
-        
-        # Fix completion rate calculation
-        completion_rate = (total_meals_taken / total_possible_meals * 100) if total_possible_meals > 0 else 0
-        pdf.drawString(50, y_position, f"Meal Completion Rate: {completion_rate:.1f}%")
-        y_position -= 20
-        
-        pdf.drawString(50, y_position, f"Amount Payable: ₹{amount_payable:.2f}")
-        y_position -= 40
-        
-        # Daily Meal Table
-        pdf.setFont("Helvetica-Bold", 14)
-        pdf.drawString(50, y_position, "Daily Meal Status")
-        y_position -= 30
-        
-        # Create table data
-        table_data = [['Date', 'Day', 'Lunch', 'Dinner', 'Status']]
-        
-        # Add rows for each day
-        current_date = start_date
-        while current_date <= end_date:
-            day_name = calendar.day_name[current_date.weekday()]
-            meal_status = meal_dict.get(current_date, {'lunch': True, 'dinner': True})
-            
-            lunch_status = "✓" if meal_status['lunch'] else "✗"
-            dinner_status = "✓" if meal_status['dinner'] else "✗"
-            day_status = "Present" if meal_status['lunch'] or meal_status['dinner'] else "Absent"
-            
-            table_data.append([
-                current_date.strftime('%d-%m-%Y'),
-                day_name[:3],
-                lunch_status,
-                dinner_status,
-                day_status
-            ])
-            
-            current_date += timedelta(days=1)
-        
-        table = Table(table_data, colWidths=[80, 50, 50, 50, 60])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        table.wrapOn(pdf, 400, 200)
-        table.drawOn(pdf, 50, y_position - (len(table_data) * 20) - 20)
-        
-        # Footer
-        pdf.setFont("Helvetica-Oblique", 10)
-        pdf.drawString(50, 50, f"Report generated on {date.today().strftime('%d %B %Y')}")
-        pdf.drawString(50, 35, "Signature: ________________________")
-        
-        pdf.showPage()
-        pdf.save()
-        
-        pdf_data = buffer.getvalue()
-        buffer.close()
-        
-        response = HttpResponse(pdf_data, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{customer.name}_{year}_{month_num}_report.pdf"'
-        return response
+            target_date = date.today()
+        
+        days = int(request.GET.get('days', kitchen.FORECAST_DAYS))
+        if not 1 <= days <= kitchen.MAX_FORECAST_DAYS:
+            raise ValueError(f'days must be between 1 and {kitchen.MAX_FORECAST_DAYS}')
+        
+        return Response({
+            'success': True,
+            'forecast': kitchen.forecast(request.user.id, target_date, days)
+        })
         
     except Exception as e:
-        return JsonResponse({'success': False, 'error': str(e)}, status=400)
\ No newline at end of file
+        return Response({'success': False, 'error': str(e)}, status=400)
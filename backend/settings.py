@@ -1,6 +1,7 @@
 from pathlib import Path
 import os
 from decouple import config, Csv
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 from datetime import timedelta
 
@@ -50,6 +51,12 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Per-process cache of authenticated users (api.authentication).
+# A user deactivated through another process is refused within
+# JWT_USER_CACHE_TTL seconds, on reads and writes alike.
+JWT_USER_CACHE_SIZE = config("JWT_USER_CACHE_SIZE", default=1024, cast=int)
+JWT_USER_CACHE_TTL = config("JWT_USER_CACHE_TTL", default=60, cast=int)
+
 # -------------------------
 # Application definition
 # -------------------------
@@ -72,7 +79,10 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "api.middleware.ThresholdGZipMiddleware",
+    "api.middleware.RequestJournalMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.http.ConditionalGetMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -100,6 +110,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "backend.wsgi.application"
+ASGI_APPLICATION = "backend.asgi.application"
+
+# Serve hello, customer details/stats, date status and meal history from
+# api.async_views; only worthwhile when running under an ASGI server
+ASYNC_READ_VIEWS = config("ASYNC_READ_VIEWS", default=False, cast=bool)
 
 # -------------------------
 # Database
@@ -110,6 +125,23 @@ WSGI_APPLICATION = "backend.wsgi.application"
 # Get database URL from environment or use default SQLite
 DATABASE_URL = config('DATABASE_URL', default='sqlite:///db.sqlite3')
 
+# Connection tuning profile: "default" keeps Django's stock behaviour,
+# "tuned" enables persistent connections and the SQLite pragmas below
+DB_PROFILE = config('DB_PROFILE', default='default')
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+
+# Applied to every new SQLite connection by api.db when the profile is "tuned"
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT_MS', default=5000, cast=int),
+    # Negative cache_size is in KiB
+    'cache_size': -config('SQLITE_CACHE_KB', default=20000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_BYTES', default=128 * 1024 * 1024, cast=int),
+    'temp_store': 'MEMORY',
+}
+SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS if DB_PROFILE == 'tuned' else {}
+
 # Configure databases
 if DATABASE_URL.startswith('sqlite'):
     # SQLite for development
@@ -119,6 +151,16 @@ if DATABASE_URL.startswith('sqlite'):
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    if DB_PROFILE == 'tuned':
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'OPTIONS': {
+                # Take the write lock at BEGIN so writers queue on busy_timeout
+                # instead of failing with "database is locked" on lock upgrade
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': SQLITE_TUNED_PRAGMAS['busy_timeout'] / 1000,
+            },
+        })
 elif DATABASE_URL.startswith('mysql'):
     # MySQL for PythonAnywhere
     DATABASES = {
@@ -135,10 +177,19 @@ elif DATABASE_URL.startswith('mysql'):
             }
         }
     }
+    if DB_PROFILE == 'tuned':
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        })
 else:
     # Use dj_database_url for other databases (PostgreSQL, etc.)
     DATABASES = {
-        'default': dj_database_url.config(default=DATABASE_URL)
+        'default': dj_database_url.config(
+            default=DATABASE_URL,
+            conn_max_age=DB_CONN_MAX_AGE if DB_PROFILE == 'tuned' else 0,
+            conn_health_checks=DB_PROFILE == 'tuned',
+        )
     }
 
 # Remove MongoDB and database routers - we're using single database
@@ -188,17 +239,151 @@ MEDIA_ROOT = BASE_DIR / "media"
 # -------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-    'rest_framework_simplejwt.authentication.JWTAuthentication',
+    'api.authentication.FastJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',  # Enable browsable API in dev
-    ],
+    ] + ([
+        'rest_framework.renderers.BrowsableAPIRenderer',  # Browsable API in dev only
+    ] if DEBUG else []),
+    # Reverse proxies in front of the app. Client IPs (the auth throttling)
+    # come from REMOTE_ADDR when 0, else from X-Forwarded-For that many
+    # hops back; left unset, DRF would trust the whole client-sent header
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
 
+# -------------------------
+# Caches
+# -------------------------
+# Per-owner API read cache (api.caching). "locmem" is the fastest, but it is
+# private to each process, and the owner versions in it must be shared by
+# every worker, or a write through one worker leaves the others serving
+# stale reads. So it is only allowed for a single worker (WEB_CONCURRENCY,
+# which gunicorn also reads); set "file" when running more.
+API_CACHE_BACKEND = config("API_CACHE_BACKEND", default="locmem")
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", default=1, cast=int)
+if API_CACHE_BACKEND == "locmem" and WEB_CONCURRENCY > 1:
+    raise ImproperlyConfigured(
+        "API_CACHE_BACKEND=locmem keeps owner versions per process; "
+        "use \"file\" when running more than one worker"
+    )
+API_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "api",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "api",
+    },
+}
+
+REPORT_CACHE_MAX_ENTRIES = config("REPORT_CACHE_MAX_ENTRIES", default=2000, cast=int)
+# Total bytes the rendered reports may take; a report bigger than its share
+# (REPORT_CACHE_MAX_BYTES / REPORT_CACHE_MAX_ENTRIES) is rendered on every
+# request instead of cached.
+REPORT_CACHE_MAX_BYTES = config("REPORT_CACHE_MAX_BYTES", default=128 * 1024 * 1024, cast=int)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "api": {
+        **API_CACHE_BACKENDS[API_CACHE_BACKEND],
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": config("API_CACHE_MAX_ENTRIES", default=5000, cast=int),
+            "CULL_FREQUENCY": 4,
+        },
+    },
+    # Auth token buckets (api.throttling); shared between worker processes
+    # only with the "file" backend, like the API cache. One bucket per IP
+    # and per username, so a flood fills it: past MAX_ENTRIES the oldest
+    # buckets are culled and those clients start again with a full bucket
+    "throttle": {
+        **API_CACHE_BACKENDS[API_CACHE_BACKEND],
+        "LOCATION": "throttle" if API_CACHE_BACKEND == "locmem" else BASE_DIR / "cache" / "throttle",
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": config("THROTTLE_CACHE_MAX_ENTRIES", default=50000, cast=int),
+        },
+    },
+    # Hashing slot leases (api.throttling.hashing_slot), kept apart from the
+    # buckets so a flood can't cull them. It only ever holds AUTH_HASH_SLOTS
+    # keys, far below MAX_ENTRIES, so it never culls
+    "throttle_slots": {
+        **API_CACHE_BACKENDS[API_CACHE_BACKEND],
+        "LOCATION": "throttle_slots" if API_CACHE_BACKEND == "locmem" else BASE_DIR / "cache" / "throttle_slots",
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+        },
+    },
+    # Rendered monthly reports, keyed by data version so entries never go stale.
+    # File-based so every worker process shares it. MAX_ENTRIES bounds the
+    # entry count and api/reports.py caps each entry's size, so disk use
+    # stays under REPORT_CACHE_MAX_BYTES.
+    "reports": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / "cache" / "reports",
+        "TIMEOUT": 60 * 60 * 24 * 30,
+        "OPTIONS": {
+            "MAX_ENTRIES": REPORT_CACHE_MAX_ENTRIES,
+        },
+    },
+}
+
+# -------------------------
+# Background Report Jobs
+# -------------------------
+# Worker threads started inside the web process to render queued reports.
+# Leave at 0 when running `python manage.py run_report_worker` separately.
+REPORT_JOB_THREADS = config("REPORT_JOB_THREADS", default=0, cast=int)
+
+# -------------------------
+# Delta Sync
+# -------------------------
+# Deletion tombstones older than this are purged (purge_tombstones); clients
+# with an older sync token get a full snapshot instead of a delta
+SYNC_TOMBSTONE_DAYS = config("SYNC_TOMBSTONE_DAYS", default=90, cast=int)
+# How far behind "now" each new sync token starts, to cover writes still
+# in flight when the sync ran
+SYNC_OVERLAP_SECONDS = config("SYNC_OVERLAP_SECONDS", default=60, cast=int)
+
+# -------------------------
+# Offline Replay
+# -------------------------
+# Idempotency keys of replayed operations are kept this long
+# (purge_idempotency_keys); a client must not retry a batch older than this
+OPS_KEY_RETENTION_DAYS = config("OPS_KEY_RETENTION_DAYS", default=30, cast=int)
+
+# -------------------------
+# Auth Throttling
+# -------------------------
+# Login, signup and /api/token/ run a full password hash (api.throttling).
+# Each client IP and each username gets a token bucket: (burst, refills per minute)
+AUTH_THROTTLE_ENABLED = config("AUTH_THROTTLE_ENABLED", default=True, cast=bool)
+AUTH_THROTTLE_RATES = {
+    "ip": (
+        config("AUTH_THROTTLE_IP_BURST", default=20, cast=int),
+        config("AUTH_THROTTLE_IP_PER_MINUTE", default=10, cast=float),
+    ),
+    "username": (
+        config("AUTH_THROTTLE_USERNAME_BURST", default=5, cast=int),
+        config("AUTH_THROTTLE_USERNAME_PER_MINUTE", default=2, cast=float),
+    ),
+}
+# Hashes allowed to run at once (per process with the locmem cache). Keep it
+# below the worker count so other requests always have workers left.
+AUTH_HASH_SLOTS = config("AUTH_HASH_SLOTS", default=2, cast=int)
+# A slot is freed after this long even if its worker never released it
+AUTH_HASH_LEASE_SECONDS = config("AUTH_HASH_LEASE_SECONDS", default=10, cast=int)
+# Retry-After sent when every slot is busy
+AUTH_HASH_RETRY_AFTER = config("AUTH_HASH_RETRY_AFTER", default=1, cast=int)
+
 # -------------------------
 # CORS Configuration
 # -------------------------
@@ -315,5 +500,18 @@ LOGGING = {
     },
 }
 
+# -------------------------
+# Response Compression
+# -------------------------
+# Responses shorter than this are sent uncompressed (api.middleware)
+GZIP_MIN_LENGTH = config("GZIP_MIN_LENGTH", default=1024, cast=int)
+
+# -------------------------
+# Request Journal
+# -------------------------
+# One JSON line per request (api.middleware), replayable with replay_requests
+REQUEST_JOURNAL_ENABLED = config("REQUEST_JOURNAL_ENABLED", default=False, cast=bool)
+REQUEST_JOURNAL_PATH = config("REQUEST_JOURNAL_PATH", default=str(BASE_DIR / "logs" / "requests.jsonl"))
+
 # Create logs directory if it doesn't exist
 os.makedirs(BASE_DIR / 'logs', exist_ok=True)
\ No newline at end of file